@@ -1,10 +1,12 @@
 import sys
 import logging
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtGui import QIcon
 from src.utils import check_model_files
 from src.gui.main_window import MainWindow
 from src.database.init import init_db
+from src.database.vector_db import VectorDB
 from src.config import setup_logging, LOGGER_LEVEL
 
 def initialize_app():
@@ -21,11 +23,27 @@ def initialize_app():
         )
         return False
 
+def refit_projection():
+    """命令行重新拟合 PCA 投影并重新投影向量索引，不启动界面"""
+    logger = logging.getLogger(__name__)
+    try:
+        init_db()
+        VectorDB().refit_projection()
+        logger.info("PCA 投影重新拟合完成")
+        return 0
+    except Exception as e:
+        logger.exception("PCA 投影重新拟合失败")
+        print(f"PCA 投影重新拟合失败：{str(e)}")
+        return 1
+
 def main():
     # 初始化日志
     setup_logging(LOGGER_LEVEL)
     logger = logging.getLogger(__name__)
 
+    if '--refit-projection' in sys.argv:
+        return refit_projection()
+
     # 创建应用实例
     app = QApplication(sys.argv)
     
@@ -63,4 +81,6 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    # 打包后的程序使用多进程解码时需要
+    multiprocessing.freeze_support()
     sys.exit(main())
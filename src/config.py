@@ -71,6 +71,12 @@ CURRENT_OS = get_os()
 # 缓存配置
 CACHE_DIR = get_path(config.get('Cache', 'cache_dir', fallback='./data/cache'))
 LOGGER_LEVEL = config.get('Cache', 'logger_level', fallback='INFO')
+# 搜索结果缩略图，索引时生成，按内容哈希命名保存在缓存目录中
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, 'thumbnails')
+# 缩略图的最大边长（像素）
+THUMBNAIL_CACHE_SIZE = config.getint('Cache', 'thumbnail_size', fallback=256)
+# 缩略图格式 webp/jpeg，当前 Pillow 不支持 webp 时使用 jpeg
+THUMBNAIL_CACHE_FORMAT = config.get('Cache', 'thumbnail_format', fallback='webp').strip().lower()
 
 # 模型配置
 DEVICE = get_device()
@@ -80,18 +86,83 @@ MODEL_NAME = get_path(config.get('Model', 'model_name', fallback='./models/chine
 DB_NAME = config.get('Database', 'db_name', fallback='media_search.db')
 DB_DIR = get_path(config.get('Database', 'db_dir', fallback='./data/db'))
 DB_PATH = os.path.join(DB_DIR, DB_NAME)
+DB_WRITE_BATCH_ROWS = config.getint('Database', 'write_batch_rows', fallback=5000)
+DB_WRITE_FLUSH_INTERVAL = config.getfloat('Database', 'write_flush_interval', fallback=0.5)
 
 # 向量数据库配置
 VECTOR_DB_NAME = config.get('VectorDB', 'vector_db_name', fallback='media_search_vector_db')
 VECTOR_DB_DIR = get_path(config.get('VectorDB', 'vector_db_dir', fallback='./data/db'))
 VECTOR_DB_PATH = os.path.join(VECTOR_DB_DIR, VECTOR_DB_NAME)
+VECTOR_WRITE_CHUNK_SIZE = config.getint('VectorDB', 'write_chunk_size', fallback=4096)
+# 向量存储后端 chroma:Chroma HNSW 近似搜索 numpy:内存映射矩阵精确搜索
+VECTOR_DB_BACKEND = config.get('VectorDB', 'backend', fallback='chroma').strip().lower()
+VECTOR_NUMPY_PATH = os.path.join(VECTOR_DB_DIR, VECTOR_DB_NAME + '_numpy')
+# numpy 后端每次矩阵乘法计算的行数
+VECTOR_SEARCH_BLOCK_ROWS = config.getint('VectorDB', 'search_block_rows', fallback=65536)
+# numpy 后端已删除的行超过该比例时压缩矩阵文件
+VECTOR_COMPACT_RATIO = config.getfloat('VectorDB', 'compact_ratio', fallback=0.2)
+# numpy 后端搜索矩阵的存储格式 float32 / float16 / int8
+VECTOR_NUMPY_STORAGE = config.get('VectorDB', 'storage', fallback='float32').strip().lower()
+# 压缩存储时按原始向量重排的候选数量倍数
+VECTOR_RERANK_FACTOR = config.getint('VectorDB', 'rerank_factor', fallback=4)
+# numpy 后端索引类型 flat:精确搜索 ivf:倒排文件近似搜索
+VECTOR_INDEX_TYPE = config.get('VectorDB', 'index_type', fallback='flat').strip().lower()
+# IVF 聚类数，0 表示按 sqrt(向量数) 自动确定
+VECTOR_IVF_LISTS = config.getint('VectorDB', 'ivf_lists', fallback=0)
+# IVF 查询时探测的倒排列表数
+VECTOR_IVF_NPROBE = config.getint('VectorDB', 'ivf_nprobe', fallback=16)
+# IVF 训练使用的最大样本数
+VECTOR_IVF_TRAIN_SAMPLE = config.getint('VectorDB', 'ivf_train_sample', fallback=100000)
+# numpy 后端 PCA 投影后的搜索维度，0 表示不投影
+VECTOR_PROJECTION_DIMS = config.getint('VectorDB', 'projection_dims', fallback=0)
 
 # 媒体文件配置
 IMAGE_EXTENSIONS = config.get('Media', 'image_extensions', fallback='.jpg,.jpeg,.png,.gif,.bmp').split(',')
 VIDEO_EXTENSIONS = config.get('Media', 'video_extensions', fallback='.mp4,.avi,.mov,.mkv,.wmv,.flv,.avi,.rmvb,.webm').split(',')
 VIDEO_FRAME_INTERVAL = config.get('Media', 'video_frame_interval', fallback=0.5)
-MAX_SEARCH_RESULT_SIZE = config.getint('Media', 'max_search_result_size', fallback=200)
+VIDEO_SAMPLE_MODE = config.get('Media', 'video_sample_mode', fallback='auto').strip().lower()
+VIDEO_SEEK_MIN_INTERVAL = config.getint('Media', 'video_seek_min_interval', fallback=60)
+VIDEO_SAMPLE_STRATEGY = config.get('Media', 'video_sample_strategy', fallback='fixed').strip().lower()
+VIDEO_PROBE_FPS = config.getfloat('Media', 'video_probe_fps', fallback=2.0)
+VIDEO_SCENE_THRESHOLD = config.getfloat('Media', 'video_scene_threshold', fallback=0.25)
+VIDEO_MIN_FRAMES = config.getint('Media', 'video_min_frames', fallback=16)
+VIDEO_MAX_FRAMES = config.getint('Media', 'video_max_frames', fallback=300)
+VIDEO_FRAMES_PER_MINUTE = config.getfloat('Media', 'video_frames_per_minute', fallback=6.0)
+VIDEO_MAX_GAP_SECONDS = config.getfloat('Media', 'video_max_gap_seconds', fallback=60.0)
+# 最多可翻页到的结果数量，0 表示不限制
+MAX_SEARCH_RESULT_SIZE = config.getint('Media', 'max_search_result_size', fallback=0)
+# 首次查询的近邻数量，翻页超出已取回的结果时按倍数增加
+SEARCH_INITIAL_K = config.getint('Media', 'search_initial_k', fallback=40)
 BATCH_SIZE = config.getint('Media', 'batch_size', fallback=32)
+QUERY_CACHE_SIZE = config.getint('Media', 'query_cache_size', fallback=256)
+# 搜索结果按文件合并，同一视频的多个帧只显示为一个结果
+SEARCH_GROUP_RESULTS = config.getboolean('Media', 'group_results', fallback=True)
+# 合并后每个视频结果保留的最佳时间点数量
+SEARCH_FRAMES_PER_RESULT = config.getint('Media', 'frames_per_result', fallback=3)
+# 过滤条件匹配的文件不超过该数量时，只对这些文件的向量做精确扫描，否则把条件下推到向量查询
+SEARCH_FILTER_EXACT_MAX = config.getint('Media', 'filter_exact_max', fallback=5000)
+
+# 索引流水线配置
+INDEX_DECODE_WORKERS = config.getint('Indexing', 'decode_workers', fallback=min(4, os.cpu_count() or 1))
+INDEX_PERSIST_WORKERS = config.getint('Indexing', 'persist_workers', fallback=1)
+INDEX_QUEUE_SIZE = config.getint('Indexing', 'queue_size', fallback=128)
+# 并行扫描目录的线程数
+INDEX_SCAN_WORKERS = config.getint('Indexing', 'scan_workers', fallback=8)
+# 解码模式 thread:线程内解码 process:多进程解码预处理
+INDEX_DECODE_MODE = config.get('Indexing', 'decode_mode', fallback='thread').strip().lower()
+INDEX_DECODE_PROCESSES = config.getint('Indexing', 'decode_processes', fallback=0) or (os.cpu_count() or 1)
+# 按文件内容哈希缓存特征向量，重复或移动的文件不再重新提取特征
+INDEX_EMBEDDING_CACHE = config.getboolean('Indexing', 'embedding_cache', fallback=True)
+# 内容哈希读取文件头尾各多少字节，0 表示读取整个文件
+INDEX_HASH_SAMPLE_BYTES = config.getint('Indexing', 'hash_sample_bytes', fallback=1024 * 1024)
+
+# 实时监听配置
+WATCH_ENABLED = config.getboolean('Watch', 'enabled', fallback=False)
+# auto:优先使用 inotify，不可用时轮询 inotify:仅 Linux polling:定期扫描
+WATCH_MODE = config.get('Watch', 'mode', fallback='auto').strip().lower()
+WATCH_POLL_INTERVAL = config.getfloat('Watch', 'poll_interval', fallback=30.0)
+WATCH_DEBOUNCE_SECONDS = config.getfloat('Watch', 'debounce_seconds', fallback=2.0)
+WATCH_MAX_DELAY_SECONDS = config.getfloat('Watch', 'max_delay_seconds', fallback=30.0)
 
 # 界面配置
 WINDOW_TITLE = config.get('Window', 'title', fallback='LocalMediaSearch')
@@ -99,6 +170,10 @@ WINDOW_MIN_WIDTH = config.getint('Window', 'min_width', fallback=800)
 WINDOW_MIN_HEIGHT = config.getint('Window', 'min_height', fallback=600)
 RESULTS_PER_ROW = config.getint('Window', 'results_per_row', fallback=4)
 THUMBNAIL_SIZE = config.getint('Window', 'thumbnail_size', fallback=200)
+# 结果缩略图的内存缓存上限（MB），多次搜索之间共用
+THUMBNAIL_MEMORY_CACHE_MB = config.getint('Window', 'thumbnail_memory_cache_mb', fallback=64)
+# 后台加载缩略图的线程数
+THUMBNAIL_LOADER_THREADS = config.getint('Window', 'thumbnail_loader_threads', fallback=4)
 
 # 创建必要的目录
 os.makedirs(DB_DIR, exist_ok=True)
@@ -111,5 +186,5 @@ print(f"- OS: {CURRENT_OS}")
 print(f"- Device: {DEVICE}")
 print(f"- Model: {MODEL_NAME}")
 print(f"- Database path: {DB_PATH}")
-print(f"- VectorDB path: {VECTOR_DB_PATH}")
+print(f"- VectorDB path: {VECTOR_NUMPY_PATH if VECTOR_DB_BACKEND == 'numpy' else VECTOR_DB_PATH}")
 print(f"- Cache directory: {CACHE_DIR}")
@@ -1,6 +1,6 @@
 from PIL import Image
-from typing import Union, List
-from src.config import MODEL_NAME, DEVICE, CACHE_DIR
+from typing import Union, List, Tuple
+from src.config import MODEL_NAME, DEVICE, CACHE_DIR, BATCH_SIZE
 from transformers import ChineseCLIPProcessor, ChineseCLIPModel
 import cv2
 import torch
@@ -9,6 +9,10 @@ import logging
 
 log = logging.getLogger(__name__)
 
+# 图片归一化参数
+IMAGE_MEAN = [0.48145466, 0.4578275, 0.40821073]
+IMAGE_STD = [0.26862954, 0.26130258, 0.27577711]
+
 class FeatureExtractor:
     """特征提取器"""
     _instance = None
@@ -30,8 +34,8 @@ class FeatureExtractor:
                 MODEL_NAME,
                 cache_dir=CACHE_DIR,
                 local_files_only=True,
-                image_mean=[0.48145466, 0.4578275, 0.40821073],
-                image_std=[0.26862954, 0.26130258, 0.27577711]
+                image_mean=IMAGE_MEAN,
+                image_std=IMAGE_STD
             )
             
             self.model = ChineseCLIPModel.from_pretrained(
@@ -42,12 +46,22 @@ class FeatureExtractor:
             ).to(DEVICE)
             
             self.model.eval()
+            # 特征向量维度
+            self.feature_dim = self.model.config.projection_dim
+            # 预处理后的像素张量形状 (C, H, W)
+            crop_size = self.processor.image_processor.crop_size
+            self.pixel_shape = (3, crop_size['height'], crop_size['width'])
             log.info("初始化完成")
             
         except Exception as e:
             log.exception("模型初始化失败")
             raise e
 
+    def load_image(image_path: str) -> Image.Image:
+        """读取并解码图片为 RGB"""
+        with Image.open(image_path) as image:
+            return image.convert('RGB')
+
     def extract_image_features(self, image_path: str) -> np.ndarray:
         """使用ChineseCLIP从图片文件提取特征"""
         if not image_path:
@@ -58,32 +72,81 @@ class FeatureExtractor:
             image = Image.open(image_path).convert('RGB')
             
             if not image:
-                log.warning("无法加载图像 image_path:", image_path)
+                log.warning(f"无法加载图像 image_path: {image_path}")
                 return None
 
-            # 使用processor处理图片
-            inputs = self.processor(
-                images=image,
-                return_tensors="pt",
-                padding=True
-            ).to(DEVICE)
-            
-            # 提取特征
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-                # 归一化
-                image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
-            
-            return image_features.cpu().numpy()[0]
+            return self.extract_images_features([image])[0]
             
         except Exception as e:
             log.exception("图像提取特征错误")
             raise e
 
+    def extract_image_features_batch(self, image_paths: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量提取图片特征，每次前向计算最多 BATCH_SIZE 张图片
+        :return: (特征矩阵 [N, D], 是否成功 [N])，失败的行为全 0
+        """
+        features = np.zeros((len(image_paths), self.feature_dim), dtype=np.float32)
+        valid = np.zeros(len(image_paths), dtype=bool)
+
+        for start in range(0, len(image_paths), BATCH_SIZE):
+            # 每次只加载一个批次的图片，内存占用不随输入列表长度增长；单个文件加载失败不影响整个批次
+            batch_images = []
+            batch_indexes = []
+            for i in range(start, min(start + BATCH_SIZE, len(image_paths))):
+                try:
+                    batch_images.append(FeatureExtractor.load_image(image_paths[i]))
+                    batch_indexes.append(i)
+                except Exception as e:
+                    log.warning(f"无法加载图像 {image_paths[i]}: {e}")
+            if not batch_images:
+                continue
+            try:
+                features[batch_indexes] = self.extract_images_features(batch_images)
+                valid[batch_indexes] = True
+            except Exception as e:
+                # 批次失败时逐张重试，找出有问题的图片
+                log.warning(f"批量提取图像特征失败，逐张重试: {e}")
+                for image, i in zip(batch_images, batch_indexes):
+                    try:
+                        features[i] = self.extract_images_features([image])[0]
+                        valid[i] = True
+                    except Exception as e:
+                        log.warning(f"图像提取特征错误 {image_paths[i]}: {e}")
+
+        return features, valid
+
+    def extract_images_features(self, images: List[Image.Image]) -> np.ndarray:
+        """对一批已加载的图片做一次前向计算，返回归一化特征矩阵 [N, D]"""
+        # 使用processor处理图片
+        inputs = self.processor(
+            images=images,
+            return_tensors="pt",
+            padding=True
+        )
+        return self._encode_pixel_values(inputs['pixel_values'])
+
+    def preprocess_images(self, images: List[Image.Image]) -> np.ndarray:
+        """缩放、裁剪并归一化图片，返回像素张量 [N, C, H, W]，不调用模型"""
+        return self.processor(images=images, return_tensors="np")['pixel_values']
+
+    def extract_pixel_features(self, pixel_values: np.ndarray) -> np.ndarray:
+        """对已预处理的像素张量 [N, C, H, W] 提取归一化特征矩阵 [N, D]"""
+        return self._encode_pixel_values(torch.from_numpy(pixel_values))
+
+    def _encode_pixel_values(self, pixel_values: torch.Tensor) -> np.ndarray:
+        """视觉模型前向计算"""
+        with torch.no_grad():
+            image_features = self.model.get_image_features(pixel_values=pixel_values.to(DEVICE))
+            # 归一化
+            image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
+
+        return image_features.cpu().numpy()
+
     def extract_text_features(self, text: Union[str, List[str]]) -> np.ndarray:
         """从文本中提取特征向量"""
         try:
-            log.info(f"Processing text: {text}")
+            log.debug(f"Processing text: {text}")
             
             if isinstance(text, str):
                 text = [text]
@@ -118,20 +181,7 @@ class FeatureExtractor:
             # 转换为PIL Image
             pil_image = Image.fromarray(frame_rgb)
             
-            # 使用processor处理图片
-            inputs = self.processor(
-                images=pil_image,
-                return_tensors="pt",
-                padding=True
-            ).to(DEVICE)
-            
-            # 提取特征
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-                # 归一化
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            
-            return image_features.cpu().numpy()[0]
+            return self.extract_images_features([pil_image])[0]
             
         except Exception as e:
             log.exception("视频帧提取特征错误")
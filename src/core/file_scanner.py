@@ -1,22 +1,190 @@
 import os
-from src.config import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+import queue
+import threading
+import concurrent.futures
+import time
+import logging
+from src.config import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, INDEX_SCAN_WORKERS
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Tuple
+
+log = logging.getLogger(__name__)
+
+# 扫描时直接按文件名判断扩展名，不创建 Path 对象
+_MEDIA_EXTENSIONS = frozenset(ext.strip().lower() for ext in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS)
+
+# 扫描结束标记
+_DONE = object()
+
+# 修改时间距扫描开始不足该时间（纳秒）的目录不缓存状态，避免同一时间精度内的后续修改被漏掉
+_RACY_MTIME_NS = 2 * 1000 ** 3
+
+
+def _is_media_name(name: str) -> bool:
+    """根据文件名判断是否为支持的媒体类型"""
+    dot = name.rfind('.')
+    return dot > 0 and name[dot:].lower() in _MEDIA_EXTENSIONS
+
+
+class DirectoryScanner:
+    """
+    流式并行目录扫描器
+    线程池并行 scandir 各子目录，边扫描边返回文件，调用方无需等待整个目录树扫描完成；
+    目录按 (st_dev, st_ino) 去重，跟随符号链接时不会陷入循环。
+    提供上次扫描的目录状态时，修改时间未变化的目录不再列出，只继续检查其已知的子目录。
+    """
+
+    def __init__(self, directory: str, workers: int = INDEX_SCAN_WORKERS, with_stat: bool = False, dir_states: dict = None):
+        """
+        :param workers: 扫描线程数
+        :param with_stat: 为 True 时返回 (文件路径, (大小, 修改时间纳秒, inode))，stat 在扫描线程中完成
+        :param dir_states: 上次扫描的目录状态 {dir_path: (mtime_ns, entry_count)}
+        """
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.with_stat = with_stat
+        self._cached_states = dir_states or {}
+        self._children = {}
+        for dir_path in self._cached_states:
+            self._children.setdefault(os.path.dirname(dir_path), []).append(dir_path)
+        # 已发现的文件数，扫描过程中持续增加
+        self.found = 0
+        # 整个目录树是否已扫描完成
+        self.finished = False
+        # 本次扫描到的所有目录状态，修改时间为 None 表示不可缓存
+        self.dir_states = {}
+        # 修改时间未变化而跳过列出的目录
+        self.skipped_dirs = set()
+        # 无法列出的目录，其中的文件状态未知
+        self.failed_dirs = set()
+
+    def __iter__(self) -> Iterator:
+        results = queue.Queue()
+        stop_event = threading.Event()
+        seen = set()
+        lock = threading.Lock()
+        pending = 0
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='DirectoryScanner')
+
+        def submit(path: str) -> None:
+            nonlocal pending
+            if stop_event.is_set():
+                return
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                log.warning(f"无法访问目录 {path}: {e}")
+                return
+            with lock:
+                key = (st.st_dev, st.st_ino)
+                if key in seen:
+                    return
+                seen.add(key)
+                pending += 1
+            try:
+                executor.submit(scan, path, st.st_mtime_ns)
+            except RuntimeError:
+                # 迭代已停止，线程池已关闭
+                with lock:
+                    pending -= 1
+
+        def scan(path: str, mtime_ns: int) -> None:
+            nonlocal pending
+            try:
+                if not stop_event.is_set():
+                    cached = self._cached_states.get(path)
+                    if cached is not None and cached[0] == mtime_ns:
+                        # 目录的直接条目没有增删，只需检查子目录
+                        self.dir_states[path] = cached
+                        self.skipped_dirs.add(path)
+                        for subdir in self._children.get(path, ()):
+                            submit(subdir)
+                        return
+                    files, subdirs, entry_count = self._scan_dir(path)
+                    if entry_count is None:
+                        self.failed_dirs.add(path)
+                        self.dir_states[path] = (None, None)
+                    else:
+                        racy = scan_started - mtime_ns < _RACY_MTIME_NS
+                        self.dir_states[path] = (None if racy else mtime_ns, entry_count)
+                    for subdir in subdirs:
+                        submit(subdir)
+                    if files:
+                        results.put(files)
+            except Exception as e:
+                log.exception(f"扫描目录异常 {path}")
+            finally:
+                with lock:
+                    pending -= 1
+                    if pending == 0:
+                        results.put(_DONE)
+
+        scan_started = time.time_ns()
+        try:
+            submit(self.directory)
+            with lock:
+                if pending == 0:
+                    results.put(_DONE)
+            while True:
+                files = results.get()
+                if files is _DONE:
+                    break
+                self.found += len(files)
+                yield from files
+            self.finished = True
+        finally:
+            # 调用方提前停止迭代时取消剩余的扫描任务
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _scan_dir(self, path: str) -> Tuple[list, List[str], int]:
+        """列出一个目录，返回其中的媒体文件、子目录与条目总数，无法列出时条目总数为 None"""
+        files = []
+        subdirs = []
+        entry_count = 0
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    entry_count += 1
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                        elif _is_media_name(entry.name) and entry.is_file():
+                            if self.with_stat:
+                                st = entry.stat()
+                                files.append((entry.path, (st.st_size, st.st_mtime_ns, st.st_ino or os.stat(entry.path).st_ino)))
+                            else:
+                                files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError as e:
+            log.warning(f"无法列出目录 {path}: {e}")
+            return files, subdirs, None
+        return files, subdirs, entry_count
+
 
 class FileScanner:
     """文件扫描器"""
 
     def scan_directory(directory: str) -> List[str]:
         """扫描目录并返回支持的媒体文件列表"""
-        media_files = []
-        
-        for root, _, files in os.walk(directory):
-            for file in files:
-                file_path = Path(root) / file
-                if FileScanner.is_supported_file(file_path):
-                    media_files.append(str(file_path))
+        return list(DirectoryScanner(directory))
+
+    def iter_directory(directory: str, with_stat: bool = False, dir_states: dict = None) -> DirectoryScanner:
+        """流式扫描目录，边扫描边返回支持的媒体文件"""
+        return DirectoryScanner(directory, with_stat=with_stat, dir_states=dir_states)
+
+    def file_stat(file_path: str) -> Tuple[int, int, int]:
+        """获取文件的 (大小, 修改时间纳秒, inode)，文件无法访问时返回 None"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_ino
 
-        return media_files
+    def is_supported_name(file_name: str) -> bool:
+        """根据文件名检查是否为支持的媒体类型"""
+        return _is_media_name(file_name)
 
     def is_supported_file(file_path: Path) -> bool:
         """检查文件是否为支持的媒体类型"""
@@ -28,4 +196,4 @@ class FileScanner:
 
     def is_video(file_path: str) -> bool:
         """检查文件是否为视频"""
-        return Path(file_path).suffix.lower() in VIDEO_EXTENSIONS 
\ No newline at end of file
+        return Path(file_path).suffix.lower() in VIDEO_EXTENSIONS
@@ -1,199 +1,211 @@
 from src.core.file_scanner import FileScanner
-from src.core.feature_extractor import FeatureExtractor
-from src.database.models import MediaFileDao, VideoFrameDao
-from src.config import CACHE_DIR, VIDEO_FRAME_INTERVAL
-from src.utils import delete_folder
-from typing import List
-import numpy as np
-import concurrent.futures
-import cv2
+from src.core.pipeline import IndexingPipeline
+from src.core.media_info import image_info, video_info, owning_folder
+from src.database.models import MediaFile, MediaFileDao, FilePathDao, DirStateDao
+from src.database.sqlite_db import SQLiteDB
+from typing import Callable, Iterable, Iterator, List
 import os
 import logging
 
 log = logging.getLogger(__name__)
 
+class FolderChanges:
+    """刷新时文件夹与数据库记录的差异"""
+    def __init__(self):
+        # 新增的文件路径
+        self.added: List[str] = []
+        # 内容被修改的记录，需要重新提取特征
+        self.modified: List[MediaFile] = []
+        # 已不存在的记录
+        self.removed: List[MediaFile] = []
+        # 被移动或重命名的记录，file_path 已更新为新路径
+        self.moved: List[MediaFile] = []
+        # 内容未变化、只需更新文件状态的记录（旧版本没有保存文件状态或 inode 变化）
+        self.refreshed: List[MediaFile] = []
+        # 本次扫描的目录状态 {dir_path: (mtime_ns, entry_count)}，刷新成功后保存
+        self.dir_states: dict = {}
+        # 修改时间未变化而跳过列出的目录数
+        self.skipped_dirs = 0
+
+    def __str__(self):
+        return (f"added={len(self.added)} modified={len(self.modified)} removed={len(self.removed)} "
+                f"moved={len(self.moved)} refreshed={len(self.refreshed)} skipped_dirs={self.skipped_dirs}")
+
 class Indexer:
 
+    def create_pipeline(self, on_file_done: Callable[[str, bool], None] = None) -> IndexingPipeline:
+        """创建索引流水线"""
+        return IndexingPipeline(on_file_done=on_file_done)
+
     def index_directory(self, directory: str) -> List[str]:
         """索引目录中的所有媒体文件"""
-        media_files = FileScanner.scan_directory(directory)
-        indexed_files = []
-
-        # 使用线程池并行处理文件
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = {executor.submit(self.index_single_file, file_path): file_path for file_path in media_files}
-            for future in concurrent.futures.as_completed(futures):
-                file_path = futures[future]
-                try:
-                    if future.result():
-                        indexed_files.append(file_path)
-                except Exception as e:
-                    log.exception(f"Error indexing file {file_path}:")
-
-        return indexed_files
+        return self.index_files(FileScanner.iter_directory(directory))
+
+    def index_files(self, file_paths: Iterable[str]) -> List[str]:
+        """批量索引文件，返回成功索引的文件列表"""
+        return self.create_pipeline().run(file_paths)
 
     def index_single_file(self, file_path: str) -> bool:
         """索引单个文件"""
         try:
-            # 检查文件是否已经索引
-            if MediaFileDao.is_file_indexed(file_path):
-                log.warning(f"索引已存在 文件:{file_path}")
-                return True
-            
-            # 确定文件类型
-            file_type = 'image' if FileScanner.is_image(file_path) else 'video'
-            
-            if file_type == 'image':
-                return self._index_image(file_path)
-            elif file_type == 'video':
-                return self._index_video(file_path)
-    
+            return len(self.index_files([file_path])) > 0
         except Exception as e:
             log.exception(f"Error indexing file {file_path}: ")
-    
         return False
 
-    def _index_image(self, file_path: str) -> bool:
-        """索引图片文件"""
-        try:
-            log.debug(f"=== 图片索引: {file_path} ===")
-            features = FeatureExtractor().extract_image_features(file_path)
-            
-            if features is not None:
-                # 验证特征向量
-                if not isinstance(features, np.ndarray):
-                    log.warning(f"无效的要素类型: {type(features)}")
-                    return False
-                    
-                if len(features.shape) != 1:
-                    log.warning(f"无效的特征形状: {features.shape}")
-                    return False
-                
-                # 将特征向量转换为列表并保存
-                MediaFileDao.add_media_file(
-                    file_path=file_path,
-                    file_type='image',
-                    feature_list=features.tolist()
-                )
-
-                log.debug(f"成功索引图像: {file_path}")
-                return True
-                
+    def diff_folder(self, folder: str, full_scan: bool = False) -> FolderChanges:
+        """对比文件夹当前状态与数据库记录，扫描完成后返回全部变化"""
+        changes = FolderChanges()
+        for _ in self.iter_folder_changes(folder, changes, full_scan):
+            pass
+        return changes
+
+    def iter_folder_changes(self, folder: str, changes: FolderChanges, full_scan: bool = False) -> Iterator[str]:
+        """
+        流式对比文件夹当前状态与数据库记录
+        数据库记录一次查询载入内存，文件在扫描线程中 stat，
+        不可能是移动的新文件在扫描过程中立即返回，以便边扫描边索引，其余变化在扫描结束后写入 changes。
+        :param full_scan: 为 False 时跳过修改时间未变化的目录，其中文件的原地修改只能由完整校验发现
+        """
+        db_files = self._load_db_files(MediaFileDao.get_media_files_in_folder(folder), changes)
+        scanner = FileScanner.iter_directory(folder, with_stat=True, dir_states=None if full_scan else DirStateDao.get_dir_states(folder))
+
+        def retain(file_path: str) -> bool:
+            """跳过的目录中的文件视为未变化，无法列出的目录中的文件状态未知，都保留"""
+            return (os.path.dirname(file_path) in scanner.skipped_dirs
+                    or any(file_path.startswith(os.path.join(dir_path, '')) for dir_path in scanner.failed_dirs))
+
+        yield from self._classify(scanner, db_files, changes, retain)
+        changes.dir_states = scanner.dir_states
+        changes.skipped_dirs = len(scanner.skipped_dirs)
+        log.info(f"文件夹变化 {folder}: {changes}")
+
+    def sync_paths(self, paths: Iterable[str]) -> FolderChanges:
+        """
+        对比文件系统事件涉及的路径与数据库记录，只检查这些文件和目录
+        路径不存在时删除该文件及该目录下的记录，目录存在时扫描整个目录；
+        同一批中消失的记录与新出现的文件标识相同时视为移动。
+        """
+        # 去掉已被其他目录包含的路径，避免重复扫描
+        roots = set(paths)
+        for path in list(roots):
+            parent = os.path.dirname(path)
+            while parent and parent != os.path.dirname(parent):
+                if parent in roots:
+                    roots.discard(path)
+                    break
+                parent = os.path.dirname(parent)
+
+        changes = FolderChanges()
+        records = []
+        found = []
+        for path in roots:
+            records.extend(MediaFileDao.get_media_files_by_file_path(path))
+            if os.path.isfile(path):
+                file_stat = FileScanner.file_stat(path)
+                if file_stat is not None and FileScanner.is_supported_name(os.path.basename(path)):
+                    found.append((path, file_stat))
+                continue
+            records.extend(MediaFileDao.get_media_files_in_folder(path))
+            if os.path.isdir(path):
+                found.extend(FileScanner.iter_directory(path, with_stat=True))
+
+        db_files = self._load_db_files(records, changes)
+        for _ in self._classify(found, db_files, changes):
+            pass
+        log.info(f"文件变化: {changes}")
+        return changes
+
+    def apply_changes(self, changes: FolderChanges) -> None:
+        """删除不存在的记录，更新移动文件的路径；被修改的文件先删除旧记录再重新索引"""
+        MediaFileDao.delete_media_files(changes.removed + changes.modified)
+        if changes.moved:
+            folders = FilePathDao.get_indexed_folders()
+            for mf in changes.moved:
+                if mf.folder is not None:
+                    mf.folder = owning_folder(mf.file_path, folders)
+            MediaFileDao.move_media_files(changes.moved)
+        if changes.refreshed:
+            MediaFileDao.update_file_stats(changes.refreshed)
+        # 确保旧记录删除后再重新索引
+        SQLiteDB().flush()
+
+    def backfill_media_info(self, folder: str) -> int:
+        """补全旧版本索引的记录缺少的拍摄时间、尺寸与所属文件夹，不需要重新提取特征，返回补全的记录数"""
+        media_files = MediaFileDao.get_media_files_without_info(folder)
+        if not media_files:
+            return 0
+        folders = FilePathDao.get_indexed_folders()
+        for mf in media_files:
+            file_stat = (mf.file_size, mf.mtime_ns, mf.inode)
+            info = image_info(mf.file_path, file_stat) if mf.file_type == 'image' else video_info(mf.file_path, file_stat)
+            mf.captured_at, mf.width, mf.height = info['captured_at'], info['width'], info['height']
+            mf.folder = owning_folder(mf.file_path, folders)
+        MediaFileDao.update_media_info(media_files)
+        log.info(f"补全 {len(media_files)} 条记录的拍摄时间与尺寸 {folder}")
+        return len(media_files)
+
+    def _load_db_files(self, records: List[MediaFile], changes: FolderChanges) -> dict:
+        """按路径建立数据库记录索引，重复的记录只保留一条"""
+        db_files = {}
+        for mf in records:
+            if mf.file_path in db_files:
+                if db_files[mf.file_path].id != mf.id:
+                    changes.removed.append(mf)
             else:
-                log.warning(f"无法从图像中提取特征: {file_path}")
-                return False
-                
-        except Exception as e:
-            log.exception(f"Error indexing image {file_path}: ")
-            return False
-
-    def _index_video(self, file_path: str) -> bool:
-        """索引视频文件"""
-        try:
-            log.debug(f"=== 索引视频文件路径: {file_path} ===")
-            cap = cv2.VideoCapture(file_path)
-            if not cap.isOpened():
-                log.warning(f"无法打开视频文件: {file_path}")
-                return False
-
-            # 获取视频信息
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            frame_interval = int(fps / float(VIDEO_FRAME_INTERVAL))
-            
-            log.debug(f"视频帧率 fps: {fps}; total_frames: {total_frames}; frame_interval: {frame_interval}")
-            
-            if fps <= 0 or total_frames <= 0:
-                log.warning(f"视频元数据无效: fps={fps}, total_frames={total_frames}")
-                return False
-
-            # 创建视频文件记录
-            media_file = MediaFileDao.add_media_file(
-                file_path=file_path,
-                file_type='video',
-                metadata={
-                    'fps': fps,
-                    'total_frames': total_frames,
-                    'duration': total_frames / fps
-                }
-            )
-
-            if media_file is None:
-                log.warning(f"无法创建视频文件记录数据库保存失败！file_path: {file_path}")
-                return False
-
-            try:
-                frame_count = 0
-                successful_frames = 0
-                
-                # 创建帧保存目录
-                frames_dir = os.path.join(CACHE_DIR, 'video_frames', str(media_file.id))
-                os.makedirs(frames_dir, exist_ok=True)
-
-                log.debug(f"创建帧保存目录 frames_dir: {frames_dir}")
-
-                while True:
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-
-                    if frame_count % frame_interval == 0:
-                        try:
-                            frame_path = os.path.join(frames_dir, f'frame_{frame_count}.jpg')
-                            cv2.imwrite(frame_path, frame)
-                            
-                            # 提取特征
-                            features = FeatureExtractor().extract_frame_features(frame)
-                            
-                            if features is not None:
-                                # 验证特征向量
-                                if not isinstance(features, np.ndarray):
-                                    log.warning(f"Invalid feature type for frame {frame_count}")
-                                    continue
-                                    
-                                if len(features.shape) != 1:
-                                    log.warning(f"Invalid feature shape for frame {frame_count}: {features.shape}")
-                                    continue
-                                
-                                # 将特征向量转换为列表并保存
-                                video_frame = VideoFrameDao.add_video_frame(
-                                    media_file_id=media_file.id,
-                                    frame_number=frame_count,
-                                    timestamp=frame_count / fps,
-                                    file_path=file_path,
-                                    frame_path=frame_path,
-                                    feature_list=features.tolist()
-                                )
-
-                                if video_frame is not None:
-                                    successful_frames += 1
-
-                        except Exception as e:
-                            log.exception(f"Error processing frame {frame_count}: ")
-                            if os.path.exists(frame_path):
-                                os.remove(frame_path)
-                            continue
-
-                    frame_count += 1
-
-                # 如果没有成功处理任何帧，则删除视频记录和帧目录
-                if successful_frames == 0:
-                    delete_folder(frames_dir)
-                    log.warning(f"No frames were successfully processed for {file_path}")
-                    return False
-
-                log.debug(f"成功索引视频 {file_path} 共获取 {successful_frames} 帧")
-                return True
-
-            except Exception as e:
-                # 清理创建的目录
-                delete_folder(frames_dir)
-                log.exception(f"Error indexing video {file_path}: ")
-                return False
-            
-            finally:
-                cap.release()
-
-        except Exception as e:
-            log.exception(f"Error indexing video {file_path}: ")
-            return False
+                db_files[mf.file_path] = mf
+        return db_files
+
+    def _classify(self, found: Iterable[tuple], db_files: dict, changes: FolderChanges,
+                  retain: Callable[[str], bool] = None) -> Iterator[str]:
+        """
+        把当前文件与数据库记录分类为新增、修改、移动和删除
+        大小或修改时间变化视为修改；消失的记录与新文件的 (inode, 大小, 修改时间) 相同时视为移动。
+        确定为新增的文件立即返回，其余结果在 found 遍历完后写入 changes
+        :param found: [(文件路径, (大小, 修改时间纳秒, inode)), ...]
+        :param retain: found 遍历完后调用，返回 True 的未出现记录视为未变化
+        """
+        # 所有记录的文件标识，新文件与其中任何一条都不匹配时才能确定是新增
+        identities = {
+            (mf.inode, mf.file_size, mf.mtime_ns): mf
+            for mf in db_files.values()
+            if mf.inode and mf.file_size is not None and mf.mtime_ns is not None
+        }
+
+        new_files = {}
+        for file_path, file_stat in found:
+            file_size, mtime_ns, inode = file_stat
+            mf = db_files.pop(file_path, None)
+            if mf is None:
+                if inode and (inode, file_size, mtime_ns) in identities:
+                    new_files[file_path] = file_stat
+                else:
+                    changes.added.append(file_path)
+                    yield file_path
+            elif mf.file_size is None or mf.mtime_ns is None:
+                # 旧版本的记录没有文件状态，无法判断是否修改，只补全状态
+                changes.refreshed.append(MediaFile(id=mf.id, file_path=file_path, file_size=file_size, mtime_ns=mtime_ns, inode=inode))
+            elif mf.file_size != file_size or mf.mtime_ns != mtime_ns:
+                changes.modified.append(mf)
+            elif mf.inode != inode:
+                changes.refreshed.append(MediaFile(id=mf.id, file_path=file_path, file_size=file_size, mtime_ns=mtime_ns, inode=inode))
+
+        if retain is not None:
+            for file_path in [file_path for file_path in db_files if retain(file_path)]:
+                del db_files[file_path]
+
+        # 剩余的记录对应的文件已不在原路径，按文件标识匹配移动后的新路径
+        missing = {id(mf) for mf in db_files.values()}
+        for file_path, (file_size, mtime_ns, inode) in new_files.items():
+            mf = identities.get((inode, file_size, mtime_ns))
+            if mf is None or id(mf) not in missing:
+                # 匹配到的记录仍在原路径，是复制出的新文件
+                changes.added.append(file_path)
+                yield file_path
+                continue
+            missing.discard(id(mf))
+            del db_files[mf.file_path]
+            mf.file_path = file_path
+            changes.moved.append(mf)
+
+        changes.removed.extend(db_files.values())
@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import List
+from PIL import Image
+import cv2
+import os
+import logging
+
+log = logging.getLogger(__name__)
+
+# EXIF 子 IFD 及其中的拍摄时间标签
+_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 36867
+# 主 IFD 中的修改时间标签，没有拍摄时间时使用
+_TAG_DATETIME = 306
+_EXIF_TIME_FORMAT = '%Y:%m:%d %H:%M:%S'
+
+# 索引时提取、用于搜索过滤的媒体属性：
+# captured_at 拍摄时间（秒级时间戳），width / height 画面尺寸，folder 所属的索引文件夹
+
+
+def _mtime_seconds(file_path: str, file_stat: tuple) -> int:
+    """文件修改时间（秒），file_stat 为 (大小, 修改时间纳秒, inode)"""
+    if file_stat is not None and file_stat[1] is not None:
+        return file_stat[1] // 1_000_000_000
+    try:
+        return int(os.stat(file_path).st_mtime)
+    except OSError:
+        return None
+
+
+def _exif_captured_at(image: Image.Image) -> int:
+    """读取 EXIF 中的拍摄时间，没有或格式错误时返回 None"""
+    try:
+        exif = image.getexif()
+        value = exif.get_ifd(_EXIF_IFD).get(_TAG_DATETIME_ORIGINAL) or exif.get(_TAG_DATETIME)
+        if not value:
+            return None
+        return int(datetime.strptime(str(value).strip('\x00 ')[:19], _EXIF_TIME_FORMAT).timestamp())
+    except Exception:
+        return None
+
+
+def image_info(file_path: str, file_stat: tuple = None) -> dict:
+    """
+    读取图片的拍摄时间与尺寸，只解析文件头不解码像素
+    没有 EXIF 拍摄时间时使用文件修改时间
+    """
+    info = {'captured_at': None, 'width': None, 'height': None}
+    try:
+        with Image.open(file_path) as image:
+            info['width'], info['height'] = image.size
+            info['captured_at'] = _exif_captured_at(image)
+    except Exception as e:
+        log.debug(f"读取图片属性失败 {file_path}: {e}")
+    if info['captured_at'] is None:
+        info['captured_at'] = _mtime_seconds(file_path, file_stat)
+    return info
+
+
+def video_info(file_path: str, file_stat: tuple = None, cap: cv2.VideoCapture = None) -> dict:
+    """
+    读取视频的画面尺寸，cap 为空时临时打开视频
+    OpenCV 无法读取容器中的创建时间，拍摄时间使用文件修改时间
+    """
+    info = {'captured_at': _mtime_seconds(file_path, file_stat), 'width': None, 'height': None}
+    own_cap = cap is None
+    try:
+        if own_cap:
+            cap = cv2.VideoCapture(file_path)
+        if cap.isOpened():
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if width > 0 and height > 0:
+                info['width'], info['height'] = width, height
+    except Exception as e:
+        log.debug(f"读取视频属性失败 {file_path}: {e}")
+    finally:
+        if own_cap and cap is not None:
+            cap.release()
+    return info
+
+
+def owning_folder(file_path: str, folders: List[str]) -> str:
+    """文件所属的索引文件夹，嵌套时取最深的一个；不在任何索引文件夹下时取文件所在目录"""
+    best = None
+    for folder in folders:
+        if file_path.startswith(os.path.join(folder, '')) and (best is None or len(folder) > len(best)):
+            best = folder
+    return best if best is not None else os.path.dirname(file_path)
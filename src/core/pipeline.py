@@ -0,0 +1,646 @@
+from src.core.file_scanner import FileScanner
+from src.core.feature_extractor import FeatureExtractor, IMAGE_MEAN, IMAGE_STD
+from src.core.preprocess import PixelRingBuffer, init_worker, preprocess_to_slot
+from src.core.video_sampler import create_frame_sampler
+from src.core.media_info import image_info, video_info, owning_folder
+from src.core.thumbnails import save_thumbnail, thumbnail_from_file
+from src.database.models import FilePathDao, MediaFileDao, VideoFrameDao, EmbeddingCacheDao, PendingWrite
+from src.database.sqlite_db import SQLiteDB
+from src.config import (BATCH_SIZE, INDEX_DECODE_WORKERS, INDEX_PERSIST_WORKERS, INDEX_QUEUE_SIZE,
+                        INDEX_DECODE_MODE, INDEX_DECODE_PROCESSES, INDEX_EMBEDDING_CACHE, INDEX_HASH_SAMPLE_BYTES,
+                        MODEL_NAME, CACHE_DIR, THUMBNAIL_DIR, THUMBNAIL_CACHE_SIZE, THUMBNAIL_CACHE_FORMAT,
+                        DB_WRITE_FLUSH_INTERVAL)
+from src.utils import delete_folder, generate_id, file_content_hash
+from typing import Callable, Iterable, List
+from collections import deque
+from PIL import Image
+import numpy as np
+import concurrent.futures
+import threading
+import shutil
+import queue
+import time
+import cv2
+import os
+import logging
+
+log = logging.getLogger(__name__)
+
+# 队列结束标记
+_SENTINEL = object()
+
+# 特征提取阶段凑批的最长等待时间（秒）
+_BATCH_WAIT_SECONDS = 0.05
+
+# 生成缩略图的参数 (目录, 尺寸, 格式)，也传给解码子进程
+_THUMBNAIL_ARGS = (THUMBNAIL_DIR, THUMBNAIL_CACHE_SIZE, THUMBNAIL_CACHE_FORMAT)
+
+
+class _ImageTask:
+    """已预处理、等待提取特征的图片，像素数据在 pixel_values 或共享内存槽位 slot 中"""
+    def __init__(self, file_path, pixel_values=None, slot=None, file_stat=None, content_hash=None, media_info=None, thumbnail=None):
+        self.file_path = file_path
+        self.pixel_values = pixel_values
+        self.slot = slot
+        self.file_stat = file_stat
+        self.content_hash = content_hash
+        # 用于搜索过滤的 {captured_at, width, height, folder}
+        self.media_info = media_info
+        # 缩略图路径
+        self.thumbnail = thumbnail
+
+
+class _VideoJob:
+    """一个视频的索引状态，所有采样帧写入完成后结束"""
+    def __init__(self, file_path, fps, total_frames, file_stat=None, content_hash=None, cached=False, media_info=None):
+        self.file_path = file_path
+        self.fps = fps
+        self.total_frames = total_frames
+        self.file_stat = file_stat
+        self.content_hash = content_hash
+        # 用于搜索过滤的 {captured_at, width, height, folder}
+        self.media_info = media_info
+        # 帧特征来自内容哈希缓存
+        self.cached = cached
+        # 提前生成视频记录id，解码阶段即可写出帧图片
+        self.media_file_id = generate_id()
+        self.frames_dir = os.path.join(CACHE_DIR, 'video_frames', str(self.media_file_id))
+        self.media_file = None
+        # 视频记录的写入，帧的特征向量在视频记录提交成功后才写入
+        self.media_file_write = None
+        self.pending = 0
+        self.successful = 0
+        self.decoded = False
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def metadata(self) -> dict:
+        """视频记录的元数据"""
+        return {
+            'fps': self.fps,
+            'total_frames': self.total_frames,
+            'duration': self.total_frames / self.fps
+        }
+
+
+class _FrameTask:
+    """已预处理、等待提取特征的视频帧"""
+    def __init__(self, job, frame_number, timestamp, frame_path, pixel_values, thumbnail=None):
+        self.job = job
+        self.file_path = job.file_path
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.frame_path = frame_path
+        self.pixel_values = pixel_values
+        self.slot = None
+        # 缩略图路径
+        self.thumbnail = thumbnail
+
+
+class _EmbeddedTask:
+    """已提取特征、等待写入数据库的图片或视频帧，cached 表示特征来自内容哈希缓存"""
+    def __init__(self, task, features, cached=False):
+        self.task = task
+        self.features = features
+        self.cached = cached
+
+
+class StageStats:
+    """单个阶段的耗时统计"""
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, busy_seconds: float, wait_seconds: float = 0.0) -> None:
+        with self._lock:
+            self.items += items
+            self.busy_seconds += busy_seconds
+            self.wait_seconds += wait_seconds
+
+    def __str__(self):
+        return f"{self.name}: items={self.items} busy={self.busy_seconds:.2f}s wait={self.wait_seconds:.2f}s"
+
+
+class IndexingPipeline:
+    """
+    分阶段索引流水线：读取解码 → 批量特征提取 → 持久化
+    各阶段之间使用有界队列连接，解码与模型推理可以重叠执行，
+    模型只在单个推理线程中调用，图片与各视频的采样帧混合凑批。
+    """
+
+    def __init__(self, on_file_done: Callable[[str, bool], None] = None,
+                 decode_workers: int = INDEX_DECODE_WORKERS,
+                 persist_workers: int = INDEX_PERSIST_WORKERS,
+                 queue_size: int = INDEX_QUEUE_SIZE,
+                 decode_mode: str = INDEX_DECODE_MODE,
+                 decode_processes: int = INDEX_DECODE_PROCESSES):
+        """
+        :param on_file_done: 每个文件处理结束时回调 (file_path, 是否成功)，在阶段线程中串行调用
+        :param decode_workers: 读取解码线程数
+        :param persist_workers: 持久化线程数
+        :param queue_size: 阶段之间队列的最大长度
+        :param decode_mode: thread 在解码线程中解码；process 在进程池中解码并预处理图片
+        :param decode_processes: process 模式下的进程数
+        """
+        self.on_file_done = on_file_done
+        self.decode_mode = decode_mode
+        self.decode_processes = max(1, decode_processes)
+        # process 模式下每个解码线程负责向进程池提交任务并等待结果
+        self.decode_workers = max(1, decode_workers if decode_mode != 'process' else self.decode_processes)
+        self.persist_workers = max(1, persist_workers)
+        self.queue_size = max(1, queue_size)
+        self.stats = {
+            'decode': StageStats('decode'),
+            'embed': StageStats('embed'),
+            'persist': StageStats('persist'),
+            'cache': StageStats('cache')
+        }
+        self._stop_event = threading.Event()
+        self._indexed_files = []
+        self._result_lock = threading.Lock()
+        self._process_pool = None
+        self._ring = None
+
+    def run(self, file_paths: Iterable[str]) -> List[str]:
+        """执行流水线，阻塞直到所有文件处理完毕，返回成功索引的文件列表"""
+        self._path_queue = queue.Queue(maxsize=self.queue_size)
+        self._embed_queue = queue.Queue(maxsize=self.queue_size)
+        self._persist_queue = queue.Queue(maxsize=self.queue_size)
+        self._decode_remaining = self.decode_workers
+        self._decode_lock = threading.Lock()
+        self._indexed_files = []
+        # 记录所属的索引文件夹用于搜索过滤
+        self._folders = FilePathDao.get_indexed_folders()
+        # 在启动各阶段线程前加载模型
+        self._extractor = FeatureExtractor()
+        if self.decode_mode == 'process':
+            self._start_process_pool()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._decode_stage, name=f'IndexDecode-{i}', daemon=True)
+                   for i in range(self.decode_workers)]
+        threads.append(threading.Thread(target=self._embed_stage, name='IndexEmbed', daemon=True))
+        threads.extend(threading.Thread(target=self._persist_stage, name=f'IndexPersist-{i}', daemon=True)
+                       for i in range(self.persist_workers))
+        for thread in threads:
+            thread.start()
+
+        try:
+            for file_path in file_paths:
+                if self._stop_event.is_set():
+                    break
+                self._path_queue.put(file_path)
+        finally:
+            for _ in range(self.decode_workers):
+                self._path_queue.put(_SENTINEL)
+            for thread in threads:
+                thread.join()
+            self._shutdown_process_pool()
+            # 等待写入线程提交所有记录，之后的查询才能看到
+            SQLiteDB().flush()
+
+        log.info(f"索引流水线完成 耗时 {time.perf_counter() - started:.2f}s; "
+                 + "; ".join(str(stage) for stage in self.stats.values()))
+        return list(self._indexed_files)
+
+    def stop(self) -> None:
+        """停止流水线，已排队的任务会被丢弃"""
+        self._stop_event.set()
+
+    def _start_process_pool(self) -> None:
+        """创建解码进程池与共享内存环形缓冲区"""
+        # 槽位数覆盖：进程中处理的、队列中等待的和正在推理的批次
+        slots = self.decode_processes + self.queue_size + BATCH_SIZE
+        self._ring = PixelRingBuffer(slots, self._extractor.pixel_shape)
+        self._process_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.decode_processes,
+            initializer=init_worker,
+            initargs=(MODEL_NAME, CACHE_DIR, IMAGE_MEAN, IMAGE_STD)
+        )
+        log.info(f"使用多进程解码 processes={self.decode_processes} slots={slots}")
+
+    def _shutdown_process_pool(self) -> None:
+        """关闭进程池并释放共享内存"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+    def _file_done(self, file_path: str, ok: bool) -> None:
+        """记录单个文件的处理结果，回调串行执行"""
+        with self._result_lock:
+            if ok:
+                self._indexed_files.append(file_path)
+            if self.on_file_done is not None:
+                try:
+                    self.on_file_done(file_path, ok)
+                except Exception as e:
+                    log.exception("索引回调异常")
+
+    def _task_failed(self, task) -> None:
+        """单个图片或视频帧提取特征失败"""
+        if isinstance(task, _FrameTask):
+            self._frames_done(task.job, 1, 0)
+        else:
+            self._file_done(task.file_path, False)
+
+    def _decode_stage(self) -> None:
+        """读取并解码文件"""
+        stats = self.stats['decode']
+        while True:
+            wait_start = time.perf_counter()
+            file_path = self._path_queue.get()
+            busy_start = time.perf_counter()
+            if file_path is _SENTINEL:
+                break
+            if self._stop_event.is_set():
+                continue
+
+            try:
+                if MediaFileDao.is_file_indexed(file_path):
+                    log.warning(f"索引已存在 文件:{file_path}")
+                    self._file_done(file_path, True)
+                else:
+                    # 读取前记录文件状态，读取期间文件被修改时下次刷新会重新索引
+                    file_stat = FileScanner.file_stat(file_path)
+                    content_hash = self._content_hash(file_path)
+                    if FileScanner.is_image(file_path):
+                        media_info = self._media_info(file_path, image_info(file_path, file_stat))
+                        if not self._link_cached_image(file_path, file_stat, content_hash, media_info):
+                            self._embed_queue.put(self._decode_image(file_path, file_stat, content_hash, media_info))
+                    elif not self._link_cached_video(file_path, file_stat, content_hash):
+                        self._decode_video(file_path, file_stat, content_hash)
+            except Exception as e:
+                log.warning(f"无法读取文件 {file_path}: {e}")
+                self._file_done(file_path, False)
+
+            stats.add(1, time.perf_counter() - busy_start, busy_start - wait_start)
+
+        # 最后一个解码线程结束时通知推理阶段
+        with self._decode_lock:
+            self._decode_remaining -= 1
+            if self._decode_remaining == 0:
+                self._embed_queue.put(_SENTINEL)
+
+    def _media_info(self, file_path: str, info: dict) -> dict:
+        """补充所属的索引文件夹"""
+        return dict(info, folder=owning_folder(file_path, self._folders))
+
+    def _content_hash(self, file_path: str) -> str:
+        """计算文件内容哈希，未启用缓存或读取失败时返回 None"""
+        if not INDEX_EMBEDDING_CACHE:
+            return None
+        try:
+            return file_content_hash(file_path, INDEX_HASH_SAMPLE_BYTES)
+        except OSError as e:
+            log.warning(f"计算文件哈希失败 {file_path}: {e}")
+        return None
+
+    def _link_cached_image(self, file_path: str, file_stat: tuple, content_hash: str, media_info: dict = None) -> bool:
+        """内容相同的图片已提取过特征时直接复用，跳过解码与推理"""
+        if content_hash is None:
+            return False
+        features = EmbeddingCacheDao.get_image_embedding(content_hash)
+        if features is None or features.shape[0] != self._extractor.feature_dim:
+            return False
+        # 跳过了解码，缩略图按缩小的尺寸单独解码生成
+        task = _ImageTask(file_path, file_stat=file_stat, content_hash=content_hash, media_info=media_info,
+                          thumbnail=thumbnail_from_file(file_path, *_THUMBNAIL_ARGS))
+        self._persist_queue.put([_EmbeddedTask(task, features, cached=True)])
+        self.stats['cache'].add(1, 0.0)
+        return True
+
+    def _link_cached_video(self, file_path: str, file_stat: tuple, content_hash: str) -> bool:
+        """内容相同的视频已提取过特征时复用所有采样帧的特征，只复制帧图片"""
+        if content_hash is None:
+            return False
+        cached = EmbeddingCacheDao.get_video_embeddings(content_hash)
+        if cached is None:
+            return False
+        metadata, frames = cached
+        if frames[0][3].shape[0] != self._extractor.feature_dim:
+            return False
+
+        job = _VideoJob(file_path, metadata['fps'], metadata['total_frames'], file_stat, content_hash, cached=True,
+                        media_info=self._media_info(file_path, video_info(file_path, file_stat)))
+        os.makedirs(job.frames_dir, exist_ok=True)
+        frame_paths = self._copy_cached_frames(job, frames)
+        if frame_paths is None:
+            delete_folder(job.frames_dir)
+            return False
+
+        results = [
+            _EmbeddedTask(_FrameTask(job, frame_number, timestamp, frame_path, None, thumbnail_from_file(frame_path, *_THUMBNAIL_ARGS)),
+                          embedding, cached=True)
+            for (frame_number, timestamp, _, embedding), frame_path in zip(frames, frame_paths)
+        ]
+        with job.lock:
+            job.pending = len(results)
+        for start in range(0, len(results), BATCH_SIZE):
+            self._persist_queue.put(results[start:start + BATCH_SIZE])
+        with job.lock:
+            job.decoded = True
+        self._frames_done(job, 0, 0)
+        self.stats['cache'].add(1, 0.0)
+        return True
+
+    def _copy_cached_frames(self, job: _VideoJob, frames: List[tuple]) -> List[str]:
+        """复制缓存中的帧图片，原图片已被删除时定位到该帧重新保存，失败返回 None"""
+        frame_paths = []
+        cap = None
+        try:
+            for frame_number, _, cached_path, _ in frames:
+                frame_path = os.path.join(job.frames_dir, f'frame_{frame_number}.jpg')
+                if cached_path and os.path.exists(cached_path):
+                    shutil.copyfile(cached_path, frame_path)
+                else:
+                    if cap is None:
+                        cap = cv2.VideoCapture(job.file_path)
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                    ret, frame = cap.read()
+                    if not ret:
+                        return None
+                    cv2.imwrite(frame_path, frame)
+                frame_paths.append(frame_path)
+        except Exception as e:
+            log.warning(f"复制缓存帧图片失败 {job.file_path}: {e}")
+            return None
+        finally:
+            if cap is not None:
+                cap.release()
+        return frame_paths
+
+    def _decode_image(self, file_path: str, file_stat: tuple = None, content_hash: str = None, media_info: dict = None) -> _ImageTask:
+        """解码并预处理图片，process 模式下在子进程中完成"""
+        if self._process_pool is None:
+            image = FeatureExtractor.load_image(file_path)
+            return _ImageTask(file_path, pixel_values=self._extractor.preprocess_images([image])[0],
+                              file_stat=file_stat, content_hash=content_hash, media_info=media_info,
+                              thumbnail=save_thumbnail(image, *_THUMBNAIL_ARGS))
+
+        slot = self._ring.acquire()
+        try:
+            thumbnail = self._process_pool.submit(
+                preprocess_to_slot, file_path, self._ring.name, self._ring.shape, slot, _THUMBNAIL_ARGS
+            ).result()
+        except Exception:
+            self._ring.release([slot])
+            raise
+        return _ImageTask(file_path, slot=slot, file_stat=file_stat, content_hash=content_hash, media_info=media_info,
+                          thumbnail=thumbnail)
+
+    def _decode_video(self, file_path: str, file_stat: tuple = None, content_hash: str = None) -> None:
+        """采样视频帧，保存帧图片并把预处理后的帧送入推理阶段"""
+        log.debug(f"=== 索引视频文件路径: {file_path} ===")
+        cap = cv2.VideoCapture(file_path)
+        try:
+            if not cap.isOpened():
+                log.warning(f"无法打开视频文件: {file_path}")
+                self._file_done(file_path, False)
+                return
+
+            # 获取视频信息
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if fps <= 0 or total_frames <= 0:
+                log.warning(f"视频元数据无效: fps={fps}, total_frames={total_frames}")
+                self._file_done(file_path, False)
+                return
+
+            log.debug(f"视频帧率 fps: {fps}; total_frames: {total_frames}")
+
+            job = _VideoJob(file_path, fps, total_frames, file_stat, content_hash,
+                            media_info=self._media_info(file_path, video_info(file_path, file_stat, cap)))
+            os.makedirs(job.frames_dir, exist_ok=True)
+            try:
+                for frame_number, frame in create_frame_sampler(file_path, cap, fps, total_frames):
+                    if self._stop_event.is_set():
+                        break
+                    try:
+                        frame_path = os.path.join(job.frames_dir, f'frame_{frame_number}.jpg')
+                        cv2.imwrite(frame_path, frame)
+                        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                        pixel_values = self._extractor.preprocess_images([image])[0]
+                        thumbnail = save_thumbnail(image, *_THUMBNAIL_ARGS)
+                    except Exception as e:
+                        log.exception(f"Error processing frame {frame_number}: ")
+                        continue
+
+                    with job.lock:
+                        job.pending += 1
+                    self._embed_queue.put(_FrameTask(job, frame_number, frame_number / fps, frame_path, pixel_values, thumbnail))
+            finally:
+                with job.lock:
+                    job.decoded = True
+                self._frames_done(job, 0, 0)
+        finally:
+            cap.release()
+
+    def _frames_done(self, job: _VideoJob, done: int, successful: int) -> None:
+        """更新视频的帧处理计数，全部完成时结束该视频"""
+        with job.lock:
+            job.pending -= done
+            job.successful += successful
+            if job.finished or not job.decoded or job.pending > 0:
+                return
+            job.finished = True
+
+        if job.successful > 0:
+            log.debug(f"成功索引视频 {job.file_path} 共获取 {job.successful} 帧")
+            if job.content_hash is not None and not job.cached:
+                EmbeddingCacheDao.add_video(job.content_hash, job.metadata())
+            self._file_done(job.file_path, True)
+            return
+
+        # 没有成功处理任何帧，则删除视频记录和帧目录
+        log.warning(f"No frames were successfully processed for {job.file_path}")
+        delete_folder(job.frames_dir)
+        if job.media_file is not None:
+            MediaFileDao.delete_media_file(job.media_file)
+        self._file_done(job.file_path, False)
+
+    def _embed_stage(self) -> None:
+        """凑批并提取特征，只在这一个线程中调用模型"""
+        stats = self.stats['embed']
+        finished = False
+        while not finished:
+            batch = []
+            wait_start = time.perf_counter()
+            task = self._embed_queue.get()
+            if task is _SENTINEL:
+                break
+            batch.append(task)
+            # 在短时间内尽量凑满一个批次
+            deadline = time.perf_counter() + _BATCH_WAIT_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    task = self._embed_queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if task is _SENTINEL:
+                    finished = True
+                    break
+                batch.append(task)
+
+            busy_start = time.perf_counter()
+            if self._stop_event.is_set():
+                self._release_slots(batch)
+            else:
+                self._persist_queue.put(self._embed_batch(batch))
+            stats.add(len(batch), time.perf_counter() - busy_start, busy_start - wait_start)
+
+        for _ in range(self.persist_workers):
+            self._persist_queue.put(_SENTINEL)
+
+    def _release_slots(self, batch: list) -> None:
+        """归还被丢弃任务占用的共享内存槽位"""
+        slots = [task.slot for task in batch if task.slot is not None]
+        if slots:
+            self._ring.release(slots)
+
+    def _embed_batch(self, batch: list) -> List[_EmbeddedTask]:
+        """对一个批次做一次前向计算，批次失败时逐个重试找出有问题的文件"""
+        pixel_values = np.empty((len(batch),) + tuple(self._extractor.pixel_shape), dtype=np.float32)
+        slot_indexes = [i for i, task in enumerate(batch) if task.slot is not None]
+        if slot_indexes:
+            pixel_values[slot_indexes] = self._ring.take([batch[i].slot for i in slot_indexes])
+        for i, task in enumerate(batch):
+            if task.slot is None:
+                pixel_values[i] = task.pixel_values
+
+        try:
+            features = self._extractor.extract_pixel_features(pixel_values)
+            return [_EmbeddedTask(task, feature) for task, feature in zip(batch, features)]
+        except Exception as e:
+            log.warning(f"批量提取图像特征失败，逐张重试: {e}")
+
+        results = []
+        for i, task in enumerate(batch):
+            try:
+                results.append(_EmbeddedTask(task, self._extractor.extract_pixel_features(pixel_values[i:i + 1])[0]))
+            except Exception as e:
+                log.warning(f"图像提取特征错误 {task.file_path}: {e}")
+                self._task_failed(task)
+        return results
+
+    def _persist_stage(self) -> None:
+        """
+        写入 SQLite 与向量数据库
+        记录提交给写入线程后不等待，写入线程把多个批次合并为一个事务；
+        提交完成的批次按顺序写入特征向量并完成对应的文件，提交失败的批次不写入特征向量。
+        """
+        stats = self.stats['persist']
+        # 等待写入线程提交的批次 [(PendingWrite, 完成回调), ...]，按提交顺序完成
+        pending = deque()
+        while True:
+            wait_start = time.perf_counter()
+            try:
+                # 有等待提交的批次时定期检查，写入线程最迟在刷新间隔后提交
+                batch = self._persist_queue.get(timeout=DB_WRITE_FLUSH_INTERVAL if pending else None)
+            except queue.Empty:
+                batch = None
+            busy_start = time.perf_counter()
+            if batch is _SENTINEL:
+                break
+            items = 0
+            if batch is not None and not self._stop_event.is_set():
+                self._submit_batch(batch, pending)
+                items = len(batch)
+            while pending and pending[0][0].done():
+                self._finish_write(*pending.popleft())
+            stats.add(items, time.perf_counter() - busy_start, busy_start - wait_start)
+
+        # 流水线结束时等待写入线程提交剩余的记录
+        busy_start = time.perf_counter()
+        if pending:
+            SQLiteDB().flush()
+        while pending:
+            self._finish_write(*pending.popleft())
+        stats.add(0, time.perf_counter() - busy_start)
+
+    def _submit_batch(self, batch: List[_EmbeddedTask], pending: deque) -> None:
+        """提交一批结果的记录，图片一次写入，同一视频的帧一次写入"""
+        images = []
+        video_frames = {}
+        for result in batch:
+            if isinstance(result.task, _FrameTask):
+                video_frames.setdefault(result.task.job, []).append(result)
+            else:
+                images.append(result)
+
+        if images:
+            try:
+                write = MediaFileDao.submit_media_files(
+                    [result.task.file_path for result in images],
+                    'image',
+                    np.stack([result.features for result in images]),
+                    file_stats=[result.task.file_stat for result in images],
+                    media_infos=[result.task.media_info for result in images],
+                    thumbnails=[result.task.thumbnail for result in images]
+                )
+                pending.append((write, lambda media_files: self._images_persisted(images, media_files)))
+            except Exception as e:
+                log.exception("批量添加媒体文件异常")
+                self._images_persisted(images, [])
+
+        for job, results in video_frames.items():
+            self._submit_frames(job, results, pending)
+
+    def _finish_write(self, write: PendingWrite, on_done: Callable[[list], None]) -> None:
+        """写入已提交批次的特征向量，再完成对应的文件"""
+        on_done(write.result())
+
+    def _images_persisted(self, images: List[_EmbeddedTask], media_files: list) -> None:
+        """一批图片写入完成，成功时记录特征缓存"""
+        if media_files:
+            new_results = [result for result in images if not result.cached and result.task.content_hash is not None]
+            if new_results:
+                EmbeddingCacheDao.add_image_embeddings(
+                    [result.task.content_hash for result in new_results],
+                    [result.features for result in new_results]
+                )
+        for result in images:
+            self._file_done(result.task.file_path, len(media_files) > 0)
+
+    def _submit_frames(self, job: _VideoJob, results: List[_EmbeddedTask], pending: deque) -> None:
+        """提交一个视频的一批帧，首次写入时创建视频记录"""
+        frames = [(result.task.frame_number, result.task.timestamp, result.task.frame_path) for result in results]
+        features = np.stack([result.features for result in results])
+        try:
+            with job.lock:
+                if job.media_file_write is None:
+                    job.media_file_write = MediaFileDao.submit_media_file(
+                        file_path=job.file_path,
+                        file_type='video',
+                        metadata=job.metadata(),
+                        id=job.media_file_id,
+                        file_stat=job.file_stat,
+                        media_info=job.media_info
+                    )
+                    job.media_file = job.media_file_write.records[0]
+
+            write = VideoFrameDao.submit_video_frames(
+                media_file_id=job.media_file_id,
+                file_path=job.file_path,
+                frames=frames,
+                features=features,
+                media_info=job.media_info,
+                thumbnails=[result.task.thumbnail for result in results],
+                after=job.media_file_write
+            )
+        except Exception as e:
+            log.exception(f"写入视频帧异常 file_path: {job.file_path}")
+            self._frames_done(job, len(results), 0)
+            return
+        pending.append((write, lambda video_frames: self._frames_persisted(job, frames, features, video_frames)))
+
+    def _frames_persisted(self, job: _VideoJob, frames: List[tuple], features: np.ndarray, video_frames: list) -> None:
+        """一批帧写入完成，成功时记录特征缓存"""
+        if video_frames and job.content_hash is not None and not job.cached:
+            EmbeddingCacheDao.add_video_frame_embeddings(job.content_hash, frames, features)
+        self._frames_done(job, len(frames), len(video_frames))
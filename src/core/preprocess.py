@@ -0,0 +1,90 @@
+from multiprocessing import shared_memory
+from PIL import Image
+from typing import List, Tuple
+from src.core.thumbnails import save_thumbnail
+import numpy as np
+import queue
+
+# 多进程图片解码与预处理：
+# 子进程把预处理后的 float32 像素张量直接写入共享内存环形缓冲区，
+# 主进程只传递槽位编号，避免序列化大数组。
+
+# 子进程内的图片预处理器
+_processor = None
+# 子进程内已附加的共享内存 {name: (SharedMemory, ndarray)}
+_buffers = {}
+
+
+class PixelRingBuffer:
+    """基于共享内存的像素张量环形缓冲区，槽位用完时 acquire 会阻塞"""
+
+    def __init__(self, slots: int, pixel_shape: Tuple[int, int, int]):
+        self.shape = (slots,) + tuple(pixel_shape)
+        nbytes = int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.array = np.ndarray(self.shape, dtype=np.float32, buffer=self.shm.buf)
+        self._free = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self) -> int:
+        """获取一个空闲槽位"""
+        return self._free.get()
+
+    def release(self, slots: List[int]) -> None:
+        """归还槽位"""
+        for slot in slots:
+            self._free.put(slot)
+
+    def take(self, slots: List[int]) -> np.ndarray:
+        """复制出指定槽位的像素张量 [N, C, H, W]，并归还槽位"""
+        pixel_values = self.array[slots]
+        self.release(slots)
+        return pixel_values
+
+    def close(self) -> None:
+        """释放共享内存"""
+        # 必须先释放 numpy 视图，否则无法关闭共享内存
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def init_worker(model_name: str, cache_dir: str, image_mean: List[float], image_std: List[float]) -> None:
+    """子进程初始化，只加载图片预处理器而不加载模型"""
+    global _processor
+    from transformers import ChineseCLIPImageProcessor
+
+    _processor = ChineseCLIPImageProcessor.from_pretrained(
+        model_name,
+        cache_dir=cache_dir,
+        local_files_only=True,
+        image_mean=image_mean,
+        image_std=image_std
+    )
+
+
+def preprocess_to_slot(image_path: str, shm_name: str, shape: Tuple[int, ...], slot: int, thumbnail_args: tuple = None) -> str:
+    """
+    在子进程中解码并预处理图片，结果写入共享内存的指定槽位
+    :param thumbnail_args: (缩略图目录, 尺寸, 格式)，不为空时顺便用解码后的图片生成缩略图
+    :return: 缩略图路径
+    """
+    with Image.open(image_path) as image:
+        image = image.convert('RGB')
+    pixel_values = _processor(images=image, return_tensors='np')['pixel_values']
+    _attach(shm_name, shape)[slot] = pixel_values[0]
+    return save_thumbnail(image, *thumbnail_args) if thumbnail_args is not None else None
+
+
+def _attach(shm_name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    """附加到主进程创建的共享内存"""
+    if shm_name not in _buffers:
+        # 进程池子进程与主进程共用同一个资源跟踪器，附加时不会重复回收
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _buffers[shm_name] = (shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf))
+    return _buffers[shm_name][1]
@@ -1,49 +1,195 @@
-from typing import List, Tuple
+from typing import Callable, Hashable, List, Tuple
+from collections import OrderedDict
 from src.core.feature_extractor import FeatureExtractor
 from src.database.models import MediaFileDao
+from src.database.media_filter import MediaFilter
 from src.database.vector_db import VectorDB
+from src.config import QUERY_CACHE_SIZE, SEARCH_GROUP_RESULTS, SEARCH_FRAMES_PER_RESULT
+import threading
+import unicodedata
 import logging
+import os
 import numpy as np
 
 log = logging.getLogger(__name__)
 
+class QueryEmbeddingCache:
+    """搜索词与搜索图片特征向量的 LRU 缓存"""
+
+    def __init__(self, max_size: int = QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """命中时直接返回缓存的特征向量，否则计算并缓存"""
+        if self.max_size <= 0:
+            return compute()
+        with self._lock:
+            features = self._items.get(key)
+            if features is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                log.debug(f"查询特征缓存命中 hits={self.hits} misses={self.misses}")
+                return features
+            self.misses += 1
+
+        features = compute()
+        if features is None:
+            return None
+        features.setflags(write=False)
+        with self._lock:
+            self._items[key] = features
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return features
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+_query_cache = QueryEmbeddingCache()
+
 class SearchEngine:
 
-    def text_search(query_text: str, page_number: int = 1, page_size: int = 20) -> List[Tuple]:
-        """文本搜索"""
+    def text_search(query_text: str, page_number: int = 1, page_size: int = 20, media_filter: MediaFilter = None) -> List[Tuple]:
+        """
+        文本搜索
+        :param media_filter: 按所属文件夹、文件类型、拍摄时间与尺寸过滤结果
+        """
         try:
-            # 提取文本特征
-            query_features = FeatureExtractor().extract_text_features(query_text)
+            # 提取文本特征，相同的搜索词直接使用缓存；特征由规范化后的文本计算，与缓存键一致
+            normalized_text = SearchEngine._normalize_text(query_text)
+            query_features = _query_cache.get_or_compute(
+                ('text', normalized_text),
+                lambda: FeatureExtractor().extract_text_features(normalized_text)
+            )
             if query_features is None:
                 log.warning("提取文本特征向量失败")
                 return []
-            return SearchEngine._search_with_features(query_features, page_number = page_number, page_size = page_size)
+            return SearchEngine._search_with_features(query_features, page_number = page_number, page_size = page_size, media_filter = media_filter)
         except Exception as e:
             log.exception("Error in text search: ")
             return []
 
-    def image_search(query_image_path: str, page_number: int = 1, page_size: int = 20) -> List[Tuple]:
-        """图像搜索"""
+    def image_search(query_image_path: str, page_number: int = 1, page_size: int = 20, media_filter: MediaFilter = None) -> List[Tuple]:
+        """
+        图像搜索
+        :param media_filter: 按所属文件夹、文件类型、拍摄时间与尺寸过滤结果
+        """
         try:
-            # 提取图像特征
-            query_features = FeatureExtractor().extract_image_features(query_image_path)
+            # 提取图像特征，文件未变化时直接使用缓存
+            st = os.stat(query_image_path)
+            query_features = _query_cache.get_or_compute(
+                ('image', os.path.abspath(query_image_path), st.st_mtime_ns, st.st_size),
+                lambda: FeatureExtractor().extract_image_features(query_image_path)
+            )
             if query_features is None:
                 log.warning("提取图像特征向量失败")
                 return []
-            return SearchEngine._search_with_features(query_features, page_number = page_number, page_size = page_size)
+            return SearchEngine._search_with_features(query_features, page_number = page_number, page_size = page_size, media_filter = media_filter)
         except Exception as e:
             log.exception("Error in image search: ")
             return []
 
-    def _search_with_features(query_features: np.ndarray, page_number: int = 1, page_size: int = 20) -> List[Tuple]:
+    def _normalize_text(query_text: str) -> str:
+        """统一全半角并合并空白，作为文本查询的缓存键"""
+        return ' '.join(unicodedata.normalize('NFKC', query_text).split())
+
+    def query_cache_stats() -> dict:
+        """查询特征缓存的命中统计"""
+        return {'hits': _query_cache.hits, 'misses': _query_cache.misses, 'size': len(_query_cache)}
+
+    def _search_with_features(query_features: np.ndarray, page_number: int = 1, page_size: int = 20, media_filter: MediaFilter = None) -> List[Tuple]:
         """使用特征向量搜索"""
         try:
             if MediaFileDao.is_empty():
                 log.warning("没有添加文件索引")
                 return None
-            return VectorDB().query(query_features.tolist(), page_number = page_number, page_size = page_size)
+            if not SEARCH_GROUP_RESULTS:
+                results = VectorDB().query(query_features, page_number = page_number, page_size = page_size, media_filter = media_filter)
+            else:
+                results = SearchEngine._grouped_query(query_features, page_number = page_number, page_size = page_size, media_filter = media_filter)
+            return SearchEngine._hydrate(results)
         except Exception as e:
             log.exception("Error in feature search: ")
             return []
 
- 
\ No newline at end of file
+    def _grouped_query(query_features: np.ndarray, page_number: int = 1, page_size: int = 20, media_filter: MediaFilter = None) -> List[dict]:
+        """
+        按媒体文件合并命中结果后分页，同一视频的多个帧只占一个结果
+        命中的不同文件不足一页时，成倍扩大取回的原始结果数量，直到够数或没有更多结果。
+        """
+        offset = (max(1, page_number) - 1) * page_size
+        limit = offset + page_size
+        raw_limit = limit * 2
+        while True:
+            # 向量库保留同一查询的游标，扩大数量时只补充查询新增的部分
+            hits = VectorDB().query(query_features, page_size = raw_limit, page_number = 1, media_filter = media_filter)
+            groups = SearchEngine._group_hits(hits)
+            if len(groups) >= limit or len(hits) < raw_limit:
+                break
+            raw_limit *= 2
+        log.debug(f"取回 {len(hits)} 条原始结果，合并为 {len(groups)} 个文件")
+        return groups[offset:limit]
+
+    def _group_hits(hits: List[dict]) -> List[dict]:
+        """
+        按 metadata['id'] 合并命中结果，命中结果已按得分从高到低排列
+        每个文件保留第一个即得分最高的命中作为结果，视频另外在 frames 中按顺序保留得分最高的几个帧（时间点与帧图片）
+        """
+        groups = {}
+        for hit in hits:
+            metadata = hit['metadata']
+            group = groups.get(metadata['id'])
+            if group is None:
+                group = groups[metadata['id']] = {
+                    'id': hit['id'],
+                    'score': hit['score'],
+                    'metadata': metadata,
+                    'frames': []
+                }
+            if metadata['file_type'] == 'video_frame' and len(group['frames']) < SEARCH_FRAMES_PER_RESULT:
+                group['frames'].append({
+                    'timestamp': metadata['timestamp'],
+                    'frame_path': metadata['frame_path'],
+                    'score': hit['score']
+                })
+        return list(groups.values())
+
+    def _hydrate(results: List[dict]) -> List[dict]:
+        """
+        补全一页结果的媒体文件信息，在搜索线程中完成，界面线程不再逐条查询数据库和检查文件
+        一次查询取出本页所有媒体文件记录，路径以数据库记录为准；记录不存在或文件已被删除时 exists 为 False。
+        返回的每条结果包含 file_path、file_type(image/video)、timestamp 与 frame_path（图片为 None），
+        thumbnail_path（索引时生成的缩略图，旧索引没有缩略图时为原图或帧图片），以及原有的 id、score、metadata 与 frames。
+        """
+        media_files = MediaFileDao.get_media_files_by_ids([item['metadata']['id'] for item in results])
+        records = []
+        for item in results:
+            metadata = item['metadata']
+            media_file = media_files.get(metadata['id'])
+            file_path = media_file.file_path if media_file is not None else metadata['file_path']
+            thumbnail_path = metadata.get('thumbnail')
+            if not thumbnail_path or not os.path.exists(thumbnail_path):
+                thumbnail_path = metadata.get('frame_path') or file_path
+            records.append({
+                'id': item['id'],
+                'score': item['score'],
+                'metadata': metadata,
+                'frames': item.get('frames', []),
+                'media_file_id': metadata['id'],
+                'file_path': file_path,
+                'file_type': 'image' if metadata['file_type'] == 'image' else 'video',
+                'timestamp': metadata.get('timestamp'),
+                'frame_path': metadata.get('frame_path'),
+                'thumbnail_path': thumbnail_path,
+                'exists': media_file is not None and os.path.exists(file_path)
+            })
+        return records
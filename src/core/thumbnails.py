@@ -0,0 +1,75 @@
+from PIL import Image, features
+import hashlib
+import io
+import os
+import tempfile
+import logging
+
+log = logging.getLogger(__name__)
+
+# 缩略图按内容哈希命名的缓存：<thumbnail_dir>/<哈希前两位>/<哈希>.<扩展名>
+# 相同的缩略图只保存一份，文件一经写入不再修改，可以被多条记录共用。
+# 不读取 src.config，多进程解码时子进程由调用方传入目录、尺寸与格式。
+
+# 格式 → (Pillow 格式名, 扩展名, 编码参数)
+_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True}),
+}
+
+
+def _resolve_format(fmt: str) -> str:
+    """当前 Pillow 不支持 webp 时使用 jpeg"""
+    if fmt == 'webp' and not features.check('webp'):
+        return 'jpeg'
+    return fmt if fmt in _FORMATS else 'jpeg'
+
+
+def save_thumbnail(image: Image.Image, thumbnail_dir: str, size: int, fmt: str) -> str:
+    """
+    由已解码的图片生成缩略图并写入缓存，返回缩略图路径，失败时返回 None
+    :param size: 缩略图的最大边长
+    :param fmt: webp 或 jpeg
+    """
+    try:
+        pil_format, extension, options = _FORMATS[_resolve_format(fmt)]
+        # 直接缩放出新图片，不复制原图；reducing_gap 先按整数倍快速缩小再精细缩放
+        scale = min(1.0, size / max(image.size))
+        thumbnail = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                 Image.Resampling.LANCZOS, reducing_gap=2.0)
+        if thumbnail.mode not in ('RGB', 'L'):
+            thumbnail = thumbnail.convert('RGB')
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, pil_format, **options)
+        data = buffer.getvalue()
+
+        digest = hashlib.sha1(data).hexdigest()
+        path = os.path.join(thumbnail_dir, digest[:2], f'{digest}.{extension}')
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再改名，并发写入相同内容时不会读到不完整的文件；
+            # 每次写入使用唯一的临时文件，同一进程的多个线程生成相同缩略图时互不影响
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return path
+    except Exception as e:
+        log.warning(f"生成缩略图失败: {e}")
+    return None
+
+
+def thumbnail_from_file(file_path: str, thumbnail_dir: str, size: int, fmt: str) -> str:
+    """读取图片文件生成缩略图，JPEG 使用 draft 模式按缩小的尺寸解码"""
+    try:
+        with Image.open(file_path) as image:
+            image.draft('RGB', (size, size))
+            return save_thumbnail(image.convert('RGB'), thumbnail_dir, size, fmt)
+    except Exception as e:
+        log.warning(f"生成缩略图失败 {file_path}: {e}")
+    return None
@@ -0,0 +1,175 @@
+from src.config import (VIDEO_FRAME_INTERVAL, VIDEO_SAMPLE_MODE, VIDEO_SEEK_MIN_INTERVAL, VIDEO_SAMPLE_STRATEGY,
+                        VIDEO_PROBE_FPS, VIDEO_SCENE_THRESHOLD, VIDEO_MIN_FRAMES, VIDEO_MAX_FRAMES,
+                        VIDEO_FRAMES_PER_MINUTE, VIDEO_MAX_GAP_SECONDS)
+from typing import Iterator, Tuple
+import numpy as np
+import cv2
+import logging
+
+log = logging.getLogger(__name__)
+
+# 场景检测时帧缩小后的尺寸
+_SIGNATURE_SIZE = (64, 36)
+
+
+def create_frame_sampler(file_path: str, cap: cv2.VideoCapture, fps: float, total_frames: int):
+    """根据配置的采样策略创建视频帧采样器"""
+    if VIDEO_SAMPLE_STRATEGY == 'adaptive':
+        return AdaptiveFrameSampler(file_path, cap, fps, total_frames)
+    frame_interval = max(1, int(fps / float(VIDEO_FRAME_INTERVAL)))
+    return VideoFrameSampler(file_path, cap, total_frames, frame_interval)
+
+
+class VideoFrameSampler:
+    """
+    按固定间隔采样视频帧
+    read: 逐帧解码，只保留需要的帧
+    grab: 跳过的帧只 grab 不做颜色转换和拷贝，采样帧再 retrieve
+    seek: 直接定位到采样帧，定位不可靠时回退到 grab
+    auto: 采样间隔足够大时使用 seek，否则使用 grab
+    """
+
+    def __init__(self, file_path: str, cap: cv2.VideoCapture, total_frames: int, frame_interval: int, mode: str = VIDEO_SAMPLE_MODE):
+        self.file_path = file_path
+        self.cap = cap
+        self.total_frames = total_frames
+        self.frame_interval = max(1, frame_interval)
+        if mode == 'auto':
+            mode = 'seek' if self.frame_interval >= VIDEO_SEEK_MIN_INTERVAL else 'grab'
+        self.mode = mode
+        # 下一个需要采样的帧号
+        self._next_target = 0
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """依次返回 (帧号, BGR帧)"""
+        if self.mode == 'seek':
+            return self._iter_seek()
+        if self.mode == 'grab':
+            return self._iter_grab(0)
+        return self._iter_read()
+
+    def skip_to(self, frame_number: int) -> None:
+        """跳过指定帧号之前的采样点，迭代过程中调用"""
+        self._next_target = max(self._next_target, frame_number)
+
+    def _sampled(self, frame_number: int) -> None:
+        """已返回一帧，计算下一个采样点"""
+        self._next_target = max(self._next_target, frame_number + self.frame_interval)
+
+    def _iter_read(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """逐帧解码"""
+        frame_number = 0
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            if frame_number >= self._next_target:
+                self._sampled(frame_number)
+                yield frame_number, frame
+            frame_number += 1
+
+    def _iter_grab(self, frame_number: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """从当前位置开始，跳过的帧只 grab 不 retrieve"""
+        while True:
+            if not self.cap.grab():
+                break
+            if frame_number >= self._next_target:
+                ret, frame = self.cap.retrieve()
+                if not ret:
+                    break
+                self._sampled(frame_number)
+                yield frame_number, frame
+            frame_number += 1
+
+    def _iter_seek(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """定位到每个采样帧后解码，发现定位不准确时回退到 grab"""
+        while self._next_target < self.total_frames:
+            target = self._next_target
+            if target > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+
+            # 读取后位置应为 target + 1，否则说明该编码/容器不支持精确定位
+            position = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if abs(position - (target + 1)) > 1:
+                log.debug(f"视频定位不准确，回退到 grab 模式: {self.file_path} target={target} position={position}")
+                yield from self._fallback_grab(target)
+                return
+
+            self._sampled(target)
+            yield target, frame
+
+    def _fallback_grab(self, frame_number: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """重新打开视频并顺序 grab 到指定帧后继续采样"""
+        self.cap.release()
+        self.cap.open(self.file_path)
+        if not self.cap.isOpened():
+            log.warning(f"无法重新打开视频文件: {self.file_path}")
+            return
+
+        for _ in range(frame_number):
+            if not self.cap.grab():
+                return
+        yield from self._iter_grab(frame_number)
+
+
+class AdaptiveFrameSampler:
+    """
+    基于场景变化的自适应采样
+    以 VIDEO_PROBE_FPS 的频率探测缩小后的帧，与上一个保留帧的灰度直方图或像素差异
+    超过阈值时保留；每个视频的保留帧数受时长预算限制，长时间无变化时按最大间隔补一帧。
+    """
+
+    def __init__(self, file_path: str, cap: cv2.VideoCapture, fps: float, total_frames: int):
+        self.fps = fps
+        duration = total_frames / fps
+        # 帧数预算：基础帧数 + 按时长增加，且不超过上限
+        self.budget = max(1, min(VIDEO_MAX_FRAMES, VIDEO_MIN_FRAMES + int(duration / 60 * VIDEO_FRAMES_PER_MINUTE)))
+        # 保留帧之间的最小间隔，保证不会超出预算
+        self.min_gap_frames = int(total_frames / self.budget)
+        self.max_gap_frames = int(VIDEO_MAX_GAP_SECONDS * fps)
+        probe_interval = max(1, int(fps / VIDEO_PROBE_FPS))
+        self.sampler = VideoFrameSampler(file_path, cap, total_frames, probe_interval)
+        log.debug(f"自适应采样 budget={self.budget} min_gap_frames={self.min_gap_frames} probe_interval={probe_interval}")
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """依次返回 (帧号, BGR帧)"""
+        last_signature = None
+        last_kept = 0
+        kept = 0
+        for frame_number, frame in self.sampler:
+            signature = _frame_signature(frame)
+            keep = (
+                last_signature is None
+                or frame_number - last_kept >= self.max_gap_frames
+                or _scene_score(signature, last_signature) >= VIDEO_SCENE_THRESHOLD
+            )
+            if not keep:
+                continue
+
+            yield frame_number, frame
+            kept += 1
+            if kept >= self.budget:
+                break
+            last_signature = signature
+            last_kept = frame_number
+            # 最小间隔内的帧不会被保留，直接跳过不解码
+            self.sampler.skip_to(frame_number + self.min_gap_frames)
+
+
+def _frame_signature(frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """缩小后的灰度图及其直方图"""
+    small = cv2.resize(frame, _SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+    cv2.normalize(hist, hist)
+    return gray, hist
+
+
+def _scene_score(signature: Tuple[np.ndarray, np.ndarray], other: Tuple[np.ndarray, np.ndarray]) -> float:
+    """场景变化得分，0 表示相同，越大差异越明显"""
+    pixel_score = float(np.mean(cv2.absdiff(signature[0], other[0]))) / 255.0
+    hist_score = cv2.compareHist(signature[1], other[1], cv2.HISTCMP_BHATTACHARYYA)
+    return max(pixel_score, hist_score)
@@ -0,0 +1,236 @@
+from src.core.file_scanner import FileScanner
+from src.config import WATCH_MODE, WATCH_POLL_INTERVAL
+from typing import Dict, List, Set
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+# inotify 事件掩码，见 <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+               | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def create_watcher(folders: List[str], mode: str = WATCH_MODE):
+    """
+    创建文件夹监听器
+    :param mode: inotify 使用 Linux inotify；polling 定期扫描目录；auto 优先使用 inotify，不可用时回退到轮询
+    """
+    if mode in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(folders)
+        except OSError as e:
+            log.warning(f"inotify 不可用，改用轮询监听: {e}")
+    return PollingWatcher(folders)
+
+
+class InotifyWatcher:
+    """
+    基于 inotify 的文件夹监听，通过 ctypes 直接调用 libc
+    每个目录一个监听，新建或移入的目录会自动加入监听；read_events 返回有变化的文件或目录路径。
+    """
+
+    def __init__(self, folders: List[str]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.folders = list(folders)
+        # 监听描述符 → 目录路径
+        self._watches: Dict[int, str] = {}
+        try:
+            for folder in self.folders:
+                self._watch_tree(folder)
+        except OSError:
+            self.close()
+            raise
+        log.info(f"inotify 监听 {len(self._watches)} 个目录")
+
+    def read_events(self, timeout: float) -> Set[str]:
+        """等待最多 timeout 秒，返回有变化的路径"""
+        if self._fd < 0:
+            return set()
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        paths = set()
+        moved_dirs = {}
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].split(b'\0', 1)[0]
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，只能重新检查全部文件夹
+                log.warning("inotify 事件队列溢出，重新检查所有监听的文件夹")
+                paths.update(self.folders)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    if cookie in moved_dirs:
+                        self._rename_watches(moved_dirs.pop(cookie), path)
+                    else:
+                        self._watch_tree(path)
+                elif mask & IN_MOVED_FROM:
+                    moved_dirs[cookie] = path
+                paths.add(path)
+            elif FileScanner.is_supported_name(os.path.basename(path)):
+                paths.add(path)
+
+        # 移出监听范围的目录不再监听
+        for path in moved_dirs.values():
+            self._unwatch_tree(path)
+        return paths
+
+    def close(self) -> None:
+        """关闭 inotify"""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+            self._watches.clear()
+
+    def _watch_tree(self, directory: str) -> None:
+        """监听目录及其所有子目录"""
+        self._add_watch(directory)
+        for root, dirs, _ in os.walk(directory):
+            for name in dirs:
+                self._add_watch(os.path.join(root, name))
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOSPC:
+                # 超过 fs.inotify.max_user_watches
+                raise OSError(code, f"inotify 监听数量达到上限: {directory}")
+            log.warning(f"无法监听目录 {directory}: {os.strerror(code)}")
+            return
+        self._watches[wd] = directory
+
+    def _rename_watches(self, old_path: str, new_path: str) -> None:
+        """目录在监听范围内移动后更新监听路径"""
+        prefix = os.path.join(old_path, '')
+        for wd, directory in list(self._watches.items()):
+            if directory == old_path:
+                self._watches[wd] = new_path
+            elif directory.startswith(prefix):
+                self._watches[wd] = os.path.join(new_path, directory[len(prefix):])
+
+    def _unwatch_tree(self, path: str) -> None:
+        """取消目录及其子目录的监听"""
+        prefix = os.path.join(path, '')
+        for wd, directory in list(self._watches.items()):
+            if directory == path or directory.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                self._watches.pop(wd, None)
+
+
+class PollingWatcher:
+    """
+    轮询监听，定期扫描文件夹并与上次的快照对比
+    修改时间未变化的目录不重新列出，只重新获取快照中已知文件的状态，原地修改的文件同样能被发现。
+    """
+
+    def __init__(self, folders: List[str], interval: float = WATCH_POLL_INTERVAL):
+        self.folders = list(folders)
+        self.interval = max(1.0, interval)
+        # 每个文件夹的目录状态与快照 {目录: {文件路径: 文件状态}}
+        self._dir_states = {}
+        self._snapshots = {}
+        for folder in self.folders:
+            self._poll(folder)
+        self._next_poll = time.monotonic() + self.interval
+        log.info(f"轮询监听 {len(self.folders)} 个文件夹，间隔 {self.interval}s")
+
+    def read_events(self, timeout: float) -> Set[str]:
+        """等待最多 timeout 秒，到达轮询时间时返回有变化的路径"""
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, wait))
+        paths = set()
+        for folder in self.folders:
+            paths.update(self._poll(folder))
+        self._next_poll = time.monotonic() + self.interval
+        return paths
+
+    def close(self) -> None:
+        self._snapshots.clear()
+
+    def _poll(self, folder: str) -> Set[str]:
+        """扫描一次文件夹，返回与上次快照相比有变化的文件"""
+        scanner = FileScanner.iter_directory(folder, with_stat=True, dir_states=self._dir_states.get(folder))
+        listed = {}
+        for file_path, file_stat in scanner:
+            listed.setdefault(os.path.dirname(file_path), {})[file_path] = file_stat
+
+        previous = self._snapshots.get(folder, {})
+        snapshot = {}
+        changed = set()
+        for directory in scanner.dir_states:
+            old_files = previous.get(directory, {})
+            if directory in scanner.failed_dirs:
+                # 暂时无法列出的目录沿用上次的快照
+                snapshot[directory] = old_files
+                continue
+            if directory in scanner.skipped_dirs:
+                # 目录修改时间未变化时文件列表不变，但文件内容可能被原地修改
+                files = {}
+                for path in old_files:
+                    file_stat = FileScanner.file_stat(path)
+                    if file_stat is not None:
+                        files[path] = file_stat
+            else:
+                files = listed.get(directory, {})
+            changed.update(path for path, file_stat in files.items() if old_files.get(path) != file_stat)
+            changed.update(path for path in old_files if path not in files)
+            snapshot[directory] = files
+        # 已不存在的目录
+        for directory, old_files in previous.items():
+            if directory not in snapshot:
+                changed.update(old_files)
+
+        self._dir_states[folder] = scanner.dir_states
+        self._snapshots[folder] = snapshot
+        # 首次扫描只建立快照
+        return changed if previous else set()
@@ -0,0 +1,137 @@
+import logging
+import chromadb
+import numpy as np
+from typing import Iterator, List, Set, Tuple
+from src.config import VECTOR_DB_PATH, VECTOR_WRITE_CHUNK_SIZE
+from .media_filter import MediaFilter
+
+log = logging.getLogger(__name__)
+
+class ChromaVectorStore:
+    """基于 Chroma 的向量存储（HNSW 近似搜索）"""
+
+    # 支持把过滤条件下推为元数据过滤
+    supports_where = True
+
+    def __init__(self, path: str = VECTOR_DB_PATH):
+        self.client = chromadb.PersistentClient(path = path)
+        # 支持的 hnsw:space 选项包括：
+        # "cosine"：余弦相似度（默认）
+        # "l2"：欧几里得距离
+        # "ip"：内积（Inner Product）
+        self.collection = self.client.get_or_create_collection(name='media_search', metadata={"hnsw:space": "cosine"})
+        # 单次写入的最大条数不能超过 Chroma 的限制
+        max_batch_size = getattr(self.client, 'get_max_batch_size', lambda: VECTOR_WRITE_CHUNK_SIZE)()
+        self.write_chunk_size = max(1, min(VECTOR_WRITE_CHUNK_SIZE, max_batch_size))
+
+    def count(self) -> int:
+        """向量总数"""
+        return self.collection.count()
+
+    def add(self, ids: List[str], embeddings: np.ndarray, metadatas: List[dict], skip_existing: bool) -> None:
+        """分块批量写入特征向量，存在性检查也按块一次完成"""
+        for start in range(0, len(ids), self.write_chunk_size):
+            chunk_ids = ids[start:start + self.write_chunk_size]
+            chunk_embeddings = embeddings[start:start + self.write_chunk_size]
+            chunk_metadatas = metadatas[start:start + self.write_chunk_size]
+
+            if not skip_existing:
+                self.collection.upsert(ids=chunk_ids, embeddings=chunk_embeddings, metadatas=chunk_metadatas)
+                continue
+
+            existing = set(self.collection.get(ids=chunk_ids, include=[])['ids'])
+            keep = [i for i, id in enumerate(chunk_ids) if id not in existing]
+            if keep:
+                self.collection.add(
+                    ids=[chunk_ids[i] for i in keep],
+                    embeddings=chunk_embeddings[keep],
+                    metadatas=[chunk_metadatas[i] for i in keep]
+                )
+
+    def delete(self, ids: List[str]) -> None:
+        """按向量id删除"""
+        self.collection.delete(ids=ids)
+
+    def delete_by_media_file_ids(self, media_file_ids: List[int]) -> None:
+        """删除媒体文件及其所有视频帧的特征向量"""
+        for start in range(0, len(media_file_ids), self.write_chunk_size):
+            self.collection.delete(where={'id': {'$in': media_file_ids[start:start + self.write_chunk_size]}})
+
+    def thumbnails_of_media_files(self, media_file_ids: List[int]) -> Set[str]:
+        """媒体文件及其视频帧引用的缩略图路径"""
+        thumbnails = set()
+        for start in range(0, len(media_file_ids), self.write_chunk_size):
+            result = self.collection.get(where={'id': {'$in': media_file_ids[start:start + self.write_chunk_size]}}, include=['metadatas'])
+            thumbnails.update(metadata['thumbnail'] for metadata in result['metadatas'] if metadata.get('thumbnail'))
+        return thumbnails
+
+    def thumbnails_in_use(self, thumbnails: List[str]) -> Set[str]:
+        """仍被特征向量引用的缩略图路径，缩略图按内容命名，可能被多条记录共用"""
+        in_use = set()
+        for start in range(0, len(thumbnails), self.write_chunk_size):
+            result = self.collection.get(where={'thumbnail': {'$in': thumbnails[start:start + self.write_chunk_size]}}, include=['metadatas'])
+            in_use.update(metadata['thumbnail'] for metadata in result['metadatas'])
+        return in_use
+
+    def update_metadata(self, updates: dict) -> None:
+        """更新媒体文件及其视频帧的元数据字段 {media_file_id: {字段: 新值}}"""
+        media_file_ids = list(updates.keys())
+        for start in range(0, len(media_file_ids), self.write_chunk_size):
+            chunk = media_file_ids[start:start + self.write_chunk_size]
+            result = self.collection.get(where={'id': {'$in': chunk}}, include=['metadatas'])
+            if not result['ids']:
+                continue
+            metadatas = [dict(metadata, **updates[metadata['id']]) for metadata in result['metadatas']]
+            self.collection.update(ids=result['ids'], metadatas=metadatas)
+
+    def query(self, query_embedding: np.ndarray, k: int, where: MediaFilter = None, media_file_ids: np.ndarray = None) -> List[Tuple[str, float, dict]]:
+        """
+        查询最近的 k 个向量，返回按余弦距离升序排列的 (id, 距离, 元数据)
+        :param where: 作为元数据条件下推到 HNSW 查询的过滤条件
+        :param media_file_ids: 只在这些媒体文件的向量中精确搜索
+        """
+        if media_file_ids is not None:
+            return self._exact_query(query_embedding, k, media_file_ids)
+        result = self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=where.to_chroma_where() if where is not None else None,
+            include=[
+                'distances',
+                'metadatas'
+            ]
+        )
+        return list(zip(result['ids'][0], result['distances'][0], result['metadatas'][0]))
+
+    def _exact_query(self, query_embedding: np.ndarray, k: int, media_file_ids: np.ndarray) -> List[Tuple[str, float, dict]]:
+        """取出少量媒体文件的全部向量直接计算余弦距离，避免过滤后的 HNSW 图搜索漏掉结果"""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+        ids, distances, metadatas = [], [], []
+        media_file_ids = [int(id) for id in media_file_ids]
+        for start in range(0, len(media_file_ids), self.write_chunk_size):
+            result = self.collection.get(
+                where={'id': {'$in': media_file_ids[start:start + self.write_chunk_size]}},
+                include=['embeddings', 'metadatas']
+            )
+            if not result['ids']:
+                continue
+            embeddings = np.asarray(result['embeddings'], dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1)
+            norms[norms == 0] = 1
+            ids.extend(result['ids'])
+            distances.extend((1.0 - embeddings @ query / norms).tolist())
+            metadatas.extend(result['metadatas'])
+        order = np.argsort(distances, kind='stable')[:k]
+        return [(ids[i], distances[i], metadatas[i]) for i in order]
+
+    def iter_all(self, chunk_size: int = None) -> Iterator[Tuple[List[str], np.ndarray, List[dict]]]:
+        """分块读取全部向量，用于迁移到其他存储"""
+        chunk_size = chunk_size or self.write_chunk_size
+        offset = 0
+        while True:
+            result = self.collection.get(include=['embeddings', 'metadatas'], limit=chunk_size, offset=offset)
+            if not result['ids']:
+                return
+            yield result['ids'], np.asarray(result['embeddings'], dtype=np.float32), result['metadatas']
+            offset += len(result['ids'])
@@ -1,6 +1,6 @@
 from .vector_db import VectorDB
 from .sqlite_db import SQLiteDB
-from .models import FilePathDao, MediaFileDao, VideoFrameDao
+from .models import FilePathDao, MediaFileDao, VideoFrameDao, EmbeddingCacheDao, DirStateDao
 
 
 # 初始化数据库
@@ -9,5 +9,7 @@ def init_db() -> None:
     VectorDB()
 
     FilePathDao.create_table()
+    DirStateDao.create_table()
     MediaFileDao.create_table()
     VideoFrameDao.create_table()
+    EmbeddingCacheDao.create_table()
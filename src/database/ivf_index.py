@@ -0,0 +1,101 @@
+import logging
+import numpy as np
+from typing import List, Tuple
+
+log = logging.getLogger(__name__)
+
+# 每个倒排列表至少需要的训练样本数
+_MIN_LIST_TRAIN_ROWS = 39
+# k-means 迭代次数
+_TRAIN_ITERATIONS = 10
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def nearest_centroids(matrix: np.ndarray, rows: np.ndarray, centroids: np.ndarray, block_rows: int) -> np.ndarray:
+    """分块计算各行最近的聚类中心（内积最大）"""
+    assign = np.empty(len(rows), dtype=np.int32)
+    for start in range(0, len(rows), block_rows):
+        block = np.asarray(matrix[rows[start:start + block_rows]], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+class IvfIndex:
+    """
+    倒排文件（IVF）粗量化索引
+    用球面 k-means 把向量划分到 n_lists 个聚类，压缩矩阵文件时按聚类重排行，每个倒排列表是一段连续的行；
+    之后追加的行位于有序区之后的尾部，单独记录所属聚类，查询时与探测到的列表一起扫描，下次压缩时并入有序区。
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, sorted_rows: int, trained_rows: int):
+        """
+        :param centroids: 归一化的聚类中心 [n_lists, D]
+        :param offsets: 第 i 个倒排列表占用有序区的行 [offsets[i], offsets[i + 1])
+        :param sorted_rows: 有序区的行数
+        :param trained_rows: 训练时的有效向量数，用于判断何时重新训练
+        """
+        self.centroids = centroids
+        self.offsets = offsets
+        self.sorted_rows = sorted_rows
+        self.trained_rows = trained_rows
+        # 尾部各行所属的聚类，第 i 个元素对应第 sorted_rows + i 行
+        self.tail_lists = np.empty(0, dtype=np.int32)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def train(matrix: np.ndarray, live: np.ndarray, n_lists: int, sample_size: int, block_rows: int) -> np.ndarray:
+        """
+        在有效行的随机样本上训练球面 k-means，返回归一化的聚类中心
+        :param n_lists: 聚类数，0 表示按 sqrt(行数) 自动确定
+        """
+        rng = np.random.default_rng(0)
+        if n_lists <= 0:
+            n_lists = int(np.sqrt(len(live)))
+        sample_size = min(len(live), max(sample_size, 1))
+        n_lists = max(1, min(n_lists, sample_size // _MIN_LIST_TRAIN_ROWS))
+        sample = np.sort(rng.choice(live, sample_size, replace=False))
+        data = np.asarray(matrix[sample], dtype=np.float32)
+
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+        all_rows = np.arange(len(data))
+        for _ in range(_TRAIN_ITERATIONS):
+            assign = nearest_centroids(data, all_rows, centroids, block_rows)
+            order = np.argsort(assign, kind='stable')
+            counts = np.bincount(assign, minlength=n_lists)
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+            centroids[nonempty] = np.add.reduceat(data[order], starts, axis=0)
+            # 空聚类重新取随机样本作为中心
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+            centroids = _normalize_rows(centroids)
+        log.info(f"IVF 训练完成，{n_lists} 个聚类，样本 {sample_size} 条")
+        return centroids.astype(np.float32)
+
+    def append(self, lists: np.ndarray) -> None:
+        """记录追加到尾部的行所属的聚类"""
+        self.tail_lists = np.concatenate([self.tail_lists, lists.astype(np.int32)])
+
+    def set_tail_list(self, row: int, list_id: int) -> None:
+        """尾部的行被覆盖写入后更新其所属的聚类"""
+        self.tail_lists[row - self.sorted_rows] = list_id
+
+    def probe(self, query: np.ndarray, nprobe: int, candidates: int) -> Tuple[List[Tuple[int, int]], np.ndarray]:
+        """
+        选出与查询最接近的 nprobe 个倒排列表；列表中的行数不足 candidates 时继续增加探测的列表
+        :return: (有序区中的行范围列表, 尾部中属于这些列表的行号)
+        """
+        order = np.argsort(-(self.centroids @ query))
+        sizes = (self.offsets[1:] - self.offsets[:-1])[order]
+        enough = int(np.searchsorted(np.cumsum(sizes), candidates)) + 1
+        probed = order[:max(nprobe, enough)]
+        ranges = [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in probed if self.offsets[i + 1] > self.offsets[i]]
+        tail = self.sorted_rows + np.flatnonzero(np.isin(self.tail_lists, probed))
+        return ranges, tail
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import List, Tuple
+from .sqlite_db import SQLiteDB
+import numpy as np
+import logging
+
+log = logging.getLogger(__name__)
+
+class MediaFilter:
+    """
+    搜索过滤条件，对应索引时写入 media_files 索引列与向量元数据的属性
+    条件之间为且的关系，未设置的条件不过滤。
+    """
+
+    def __init__(self, folder: str = None, file_type: str = None, captured_after=None, captured_before=None,
+                 min_width: int = None, min_height: int = None):
+        """
+        :param folder: 所属的索引文件夹
+        :param file_type: image 或 video
+        :param captured_after: 拍摄时间下限（含），datetime 或秒级时间戳
+        :param captured_before: 拍摄时间上限（含），datetime 或秒级时间戳
+        :param min_width: 最小宽度（像素）
+        :param min_height: 最小高度（像素）
+        """
+        if file_type not in (None, 'image', 'video'):
+            raise ValueError(f"不支持的文件类型: {file_type}")
+        self.folder = folder
+        self.file_type = file_type
+        self.captured_after = MediaFilter._timestamp(captured_after)
+        self.captured_before = MediaFilter._timestamp(captured_before)
+        self.min_width = min_width
+        self.min_height = min_height
+
+    @staticmethod
+    def _timestamp(value) -> int:
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return int(value.timestamp())
+        return int(value)
+
+    def is_empty(self) -> bool:
+        return all(value is None for value in self.key())
+
+    def key(self) -> tuple:
+        """用于区分查询游标"""
+        return (self.folder, self.file_type, self.captured_after, self.captured_before, self.min_width, self.min_height)
+
+    def _conditions(self) -> List[Tuple[str, str, object]]:
+        """[(列名, 运算符, 值), ...]"""
+        conditions = []
+        if self.folder is not None:
+            conditions.append(('folder', '=', self.folder))
+        if self.captured_after is not None:
+            conditions.append(('captured_at', '>=', self.captured_after))
+        if self.captured_before is not None:
+            conditions.append(('captured_at', '<=', self.captured_before))
+        if self.min_width is not None:
+            conditions.append(('width', '>=', self.min_width))
+        if self.min_height is not None:
+            conditions.append(('height', '>=', self.min_height))
+        return conditions
+
+    def to_sql(self) -> Tuple[str, list]:
+        """转换为 media_files 表的 WHERE 子句与参数"""
+        clauses = [f"{column} {op} ?" for column, op, _ in self._conditions()]
+        params = [value for _, _, value in self._conditions()]
+        if self.file_type is not None:
+            clauses.append("file_type = ?")
+            params.append(self.file_type)
+        return ' AND '.join(clauses) or '1 = 1', params
+
+    def to_chroma_where(self) -> dict:
+        """转换为 Chroma 的元数据过滤条件，视频的向量是各采样帧"""
+        operators = {'=': '$eq', '>=': '$gte', '<=': '$lte'}
+        clauses = [{column: {operators[op]: value}} for column, op, value in self._conditions()]
+        if self.file_type == 'image':
+            clauses.append({'file_type': {'$eq': 'image'}})
+        elif self.file_type == 'video':
+            clauses.append({'file_type': {'$in': ['video', 'video_frame']}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+    def matching_ids(self, limit: int = None) -> np.ndarray:
+        """按索引列查询匹配的媒体文件id，limit 用于只判断匹配数量是否超过阈值"""
+        where, params = self.to_sql()
+        sql = f"SELECT id FROM media_files WHERE {where}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute(sql, params)
+            return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+        except Exception as e:
+            log.exception("查询过滤条件匹配的媒体文件错误:")
+        finally:
+            cursor.close()
+        return np.empty(0, dtype=np.int64)
+
+    def __repr__(self):
+        return f"MediaFilter{self.key()}"
@@ -2,12 +2,18 @@ from typing import List
 from datetime import datetime
 from .sqlite_db import SQLiteDB
 from .vector_db import VectorDB
-from src.utils import generate_id
+from src.config import CACHE_DIR
+from src.utils import generate_id, delete_folder, delete_files
 import json
+import os
 import logging
+import numpy as np
 
 log = logging.getLogger(__name__)
 
+# IN (...) 查询每条 SQL 的最大参数个数
+_SQL_CHUNK_SIZE = 500
+
 class FilePath:
     def __init__(self, id=None, file_path=None, created_at=None, last_modified=None):
         self.id = id
@@ -28,14 +34,49 @@ class FilePath:
         """
         
 
+class DirState:
+    """索引文件夹下每个子目录上次刷新时的修改时间与条目数，目录修改时间未变化时刷新跳过列目录"""
+
+    def create_table_sql() -> str:
+        """创建表SQL"""
+        return """
+            CREATE TABLE IF NOT EXISTS dir_states (
+                dir_path VARCHAR NOT NULL, 
+                root_path VARCHAR NOT NULL, 
+                mtime_ns INTEGER, 
+                entry_count INTEGER, 
+                last_scanned DATETIME, 
+                PRIMARY KEY (dir_path)
+            )
+        """
+
+    def create_table_index_sql() -> str:
+        """索引SQL"""
+        return "CREATE INDEX IF NOT EXISTS idx_dir_states_root_path ON dir_states (root_path)"
+
+
 class MediaFile:
-    def __init__(self, id=None, file_path=None, file_type=None, file_metadata=None, created_at=None, last_modified=None):
+    def __init__(self, id=None, file_path=None, file_type=None, file_metadata=None, created_at=None, last_modified=None,
+                 file_size=None, mtime_ns=None, inode=None, captured_at=None, width=None, height=None, folder=None):
         self.id = id
         self.file_path = file_path
         self.file_type = file_type
         self.file_metadata = file_metadata
         self.created_at = created_at
         self.last_modified = last_modified
+        # 索引时文件的大小、修改时间(纳秒)与 inode，刷新时据此判断文件是否变化
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        # 索引时提取的拍摄时间(秒级时间戳)、画面尺寸与所属的索引文件夹，用于搜索过滤
+        self.captured_at = captured_at
+        self.width = width
+        self.height = height
+        self.folder = folder
+
+    def media_info(self) -> dict:
+        """用于搜索过滤的媒体属性"""
+        return {'captured_at': self.captured_at, 'width': self.width, 'height': self.height, 'folder': self.folder}
 
     def create_table_sql() -> str:
         """创建表SQL"""
@@ -47,14 +88,41 @@ class MediaFile:
                 file_metadata VARCHAR, 
                 created_at DATETIME, 
                 last_modified DATETIME, 
+                file_size INTEGER, 
+                mtime_ns INTEGER, 
+                inode INTEGER, 
+                captured_at INTEGER, 
+                width INTEGER, 
+                height INTEGER, 
+                folder VARCHAR, 
                 PRIMARY KEY (id)
             )
         """
+
+    def add_columns_sql() -> dict:
+        """旧版本数据库缺少的列"""
+        return {
+            'file_size': "ALTER TABLE media_files ADD COLUMN file_size INTEGER",
+            'mtime_ns': "ALTER TABLE media_files ADD COLUMN mtime_ns INTEGER",
+            'inode': "ALTER TABLE media_files ADD COLUMN inode INTEGER",
+            'captured_at': "ALTER TABLE media_files ADD COLUMN captured_at INTEGER",
+            'width': "ALTER TABLE media_files ADD COLUMN width INTEGER",
+            'height': "ALTER TABLE media_files ADD COLUMN height INTEGER",
+            'folder': "ALTER TABLE media_files ADD COLUMN folder VARCHAR"
+        }
     
     def create_table_index_sql() -> str:
         """索引SQL"""
         return "CREATE INDEX IF NOT EXISTS idx_file_path ON media_files (file_path)"
 
+    def create_filter_indexes_sql() -> List[str]:
+        """搜索过滤条件使用的索引SQL"""
+        return [
+            "CREATE INDEX IF NOT EXISTS idx_media_files_folder ON media_files (folder, captured_at)",
+            "CREATE INDEX IF NOT EXISTS idx_media_files_captured_at ON media_files (captured_at)",
+            "CREATE INDEX IF NOT EXISTS idx_media_files_size ON media_files (width, height)"
+        ]
+
 class VideoFrame:
     def __init__(self, id=None, media_file_id=None, frame_number=None, timestamp=None, frame_path=None):
         self.id = id
@@ -79,8 +147,93 @@ class VideoFrame:
     def create_table_index_sql() -> str:
         """索引SQL"""
         return "CREATE INDEX IF NOT EXISTS idx_media_file_id ON video_frames (media_file_id)"
+class EmbeddingCache:
+    """按文件内容哈希缓存的特征向量，视频的采样帧保存在 embedding_cache_frames 中"""
+
+    def create_table_sql() -> str:
+        """创建表SQL"""
+        return """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                content_hash VARCHAR NOT NULL, 
+                file_type VARCHAR NOT NULL, 
+                file_metadata VARCHAR, 
+                embedding BLOB, 
+                created_at DATETIME, 
+                PRIMARY KEY (content_hash)
+            )
+        """
+
+    def create_frames_table_sql() -> str:
+        """创建视频帧缓存表SQL"""
+        return """
+            CREATE TABLE IF NOT EXISTS embedding_cache_frames (
+                content_hash VARCHAR NOT NULL, 
+                frame_number INTEGER NOT NULL, 
+                timestamp FLOAT, 
+                frame_path VARCHAR, 
+                embedding BLOB, 
+                PRIMARY KEY (content_hash, frame_number)
+            )
+        """
 
 
+class PendingWrite:
+    """
+    已提交到写入线程的一批记录，写入线程批量提交成功后才写入对应的特征向量
+    调用方可以先继续处理后续批次，done 为 True 后调用 result 完成写入，不会逐批等待提交。
+    """
+
+    def __init__(self, future, records: list, write_vectors, rollback, after: 'PendingWrite' = None):
+        """
+        :param future: 本批记录的写操作
+        :param records: 本批写入的记录
+        :param write_vectors: 提交成功后写入特征向量
+        :param rollback: 本批记录已提交、但依赖的写入或特征向量写入失败时，删除本批记录与已写入的特征向量
+        :param after: 依赖的写入，例如帧记录依赖视频记录，依赖的写入失败时本批同样视为失败
+        """
+        self.future = future
+        self.records = records
+        self.after = after
+        self._write_vectors = write_vectors
+        self._rollback = rollback
+
+    def futures(self) -> list:
+        """本批及依赖的写操作"""
+        return (self.after.futures() if self.after is not None else []) + [self.future]
+
+    def done(self) -> bool:
+        """写操作是否都已提交或失败"""
+        return all(future.done() for future in self.futures())
+
+    def result(self) -> list:
+        """等待提交完成并写入特征向量，返回写入的记录；任何一步失败时返回空列表，已提交的本批记录被删除"""
+        try:
+            self.future.result()
+        except Exception as e:
+            # 写入失败的事务已回滚，本批记录没有写入
+            log.warning(f"记录写入数据库失败，不写入特征向量: {e}")
+            return []
+        try:
+            for future in self.futures()[:-1]:
+                future.result()
+        except Exception as e:
+            log.warning(f"依赖的记录写入数据库失败，删除本批记录: {e}")
+            self._safe_rollback()
+            return []
+        try:
+            self._write_vectors()
+            return self.records
+        except Exception as e:
+            log.exception("写入特征向量失败，删除本批记录")
+            self._safe_rollback()
+        return []
+
+    def _safe_rollback(self) -> None:
+        try:
+            self._rollback()
+        except Exception as e:
+            log.exception("删除写入失败的记录异常")
+
 
 class FilePathDao:
 
@@ -100,21 +253,19 @@ class FilePathDao:
 
     def add_file_path(file_path: str) -> bool:
         """添加文件路径"""
-        conn = SQLiteDB().get_connection()
-        cursor = conn.cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT COUNT(*) FROM file_paths WHERE file_path = ?", (file_path,))
             count = cursor.fetchone()[0]
             now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             if count <= 0:
-                conn.execute(
-                    "INSERT INTO file_paths (file_path, created_at, last_modified) VALUES (?, ?, ?)",
-                    (file_path, now, now)
+                SQLiteDB().write(
+                    "INSERT OR IGNORE INTO file_paths (file_path, created_at, last_modified) VALUES (?, ?, ?)",
+                    [(file_path, now, now)],
+                    wait=True
                 )
-                conn.commit()
                 return True
         except Exception as e:
-            conn.rollback()
             log.exception("Error adding file path: ")
         finally:
             cursor.close()
@@ -122,8 +273,7 @@ class FilePathDao:
 
     def file_path_count() -> int:
         """统计文件路径总数"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT COUNT(*) FROM file_paths")
             count = cursor.fetchone()[0]
@@ -136,8 +286,7 @@ class FilePathDao:
 
     def get_indexed_folders() -> List[str]:
         """获取所有已索引文件的目录"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT file_path FROM file_paths")
             return [row[0] for row in cursor.fetchall()]
@@ -148,6 +297,48 @@ class FilePathDao:
         return []
 
 
+class DirStateDao:
+
+    def create_table() -> None:
+        """不存在时创建表"""
+        conn = SQLiteDB().get_connection()
+        cursor = SQLiteDB().get_cursor()
+        try:
+            cursor.execute(DirState.create_table_sql())
+            cursor.execute(DirState.create_table_index_sql())
+            conn.commit()
+            log.info("Created dir_states table")
+        except Exception as e:
+            conn.rollback()
+            log.exception("Error creating dir_states table: ")
+        finally:
+            cursor.close()
+
+    def get_dir_states(root_path: str) -> dict:
+        """获取索引文件夹下所有目录的状态 {dir_path: (mtime_ns, entry_count)}"""
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute("SELECT dir_path, mtime_ns, entry_count FROM dir_states WHERE root_path = ?", (root_path,))
+            return {row[0]: (row[1], row[2]) for row in cursor.fetchall() if row[1] is not None}
+        except Exception as e:
+            log.exception("Error getting dir states: ")
+        finally:
+            cursor.close()
+        return {}
+
+    def save_dir_states(root_path: str, dir_states: dict) -> None:
+        """
+        保存一次完整刷新后的目录状态，替换该索引文件夹下的旧状态
+        :param dir_states: {dir_path: (mtime_ns, entry_count)}
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        SQLiteDB().write("DELETE FROM dir_states WHERE root_path = ?", [(root_path,)])
+        SQLiteDB().write(
+            "INSERT OR REPLACE INTO dir_states (dir_path, root_path, mtime_ns, entry_count, last_scanned) VALUES (?, ?, ?, ?, ?)",
+            [(dir_path, root_path, mtime_ns, entry_count, now) for dir_path, (mtime_ns, entry_count) in dir_states.items()]
+        )
+
+
 class MediaFileDao:
 
     def create_table() -> None:
@@ -156,7 +347,15 @@ class MediaFileDao:
         cursor = SQLiteDB().get_cursor()
         try:
             cursor.execute(MediaFile.create_table_sql())
+            # 升级旧版本的表结构
+            cursor.execute("PRAGMA table_info(media_files)")
+            columns = {row[1] for row in cursor.fetchall()}
+            for column, sql in MediaFile.add_columns_sql().items():
+                if column not in columns:
+                    cursor.execute(sql)
             cursor.execute(MediaFile.create_table_index_sql())
+            for sql in MediaFile.create_filter_indexes_sql():
+                cursor.execute(sql)
             conn.commit()
             log.info("Created media_files table")
         except Exception as e:
@@ -170,8 +369,7 @@ class MediaFileDao:
         if not file_path:
             return False
             
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT COUNT(*) as count_1 FROM media_files WHERE file_path = ?", (file_path,))
             count = cursor.fetchone()
@@ -186,8 +384,7 @@ class MediaFileDao:
 
     def is_empty() -> bool:
         """判断数据库中media_files表是否为空"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT COUNT(*) as count_1 FROM media_files")
             value = cursor.fetchone()
@@ -200,37 +397,111 @@ class MediaFileDao:
             cursor.close()
         return True
 
-    def add_media_file(file_path: str, file_type: str, feature_list: List[float] = None, metadata: dict = None) -> MediaFile:
-        """添加媒体文件"""
-        conn = SQLiteDB().get_connection()
+    def add_media_file(file_path: str, file_type: str, feature_list: List[float] = None, metadata: dict = None, id: int = None,
+                       file_stat: tuple = None, media_info: dict = None) -> MediaFile:
+        """
+        添加媒体文件，等待写入线程提交成功后再写入特征向量，失败时返回 None
+        :param file_stat: 索引时文件的 (大小, 修改时间纳秒, inode)
+        :param media_info: 用于搜索过滤的 {captured_at, width, height, folder}
+        """
         try:
-            file_metadata = json.dumps(metadata) if metadata is not None else None
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            id = generate_id()
-            conn.execute(
-                "INSERT INTO media_files (id, file_path, file_type, file_metadata, created_at, last_modified) VALUES (?, ?, ?, ?, ?, ?)",
-                (id, file_path, file_type, file_metadata, now, now)
-            )
-            conn.commit()
+            media_files = MediaFileDao.submit_media_file(file_path, file_type, feature_list, metadata, id, file_stat, media_info).result()
+            return media_files[0] if media_files else None
+        except Exception as e:
+            log.exception("添加媒体文件异常")
+        return None
 
+    def submit_media_file(file_path: str, file_type: str, feature_list: List[float] = None, metadata: dict = None, id: int = None,
+                          file_stat: tuple = None, media_info: dict = None) -> PendingWrite:
+        """提交单个媒体文件记录，不等待提交完成；视频记录没有特征向量，帧记录可以依赖它的提交结果"""
+        file_metadata = json.dumps(metadata) if metadata is not None else None
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if id is None:
+            id = generate_id()
+        file_size, mtime_ns, inode = file_stat or (None, None, None)
+        media_file = MediaFile(
+            id=id,
+            file_path=file_path,
+            file_type=file_type,
+            file_metadata=file_metadata,
+            file_size=file_size,
+            mtime_ns=mtime_ns,
+            inode=inode,
+            **(media_info or {})
+        )
+        future = SQLiteDB().write(MediaFileDao._INSERT_SQL, [MediaFileDao._insert_row(media_file, now)])
+
+        def write_vectors():
             if feature_list is not None:
-                VectorDB().add_feature_vector_media_file(id, file_path, file_type, feature_list)
+                VectorDB().add_feature_vector_media_file(id, file_path, file_type, feature_list, media_file.media_info())
+
+        return PendingWrite(future, [media_file], write_vectors, lambda: MediaFileDao._rollback_media_files([media_file]))
+
+    _INSERT_SQL = ("INSERT INTO media_files (id, file_path, file_type, file_metadata, created_at, last_modified, file_size, mtime_ns, inode, "
+                   "captured_at, width, height, folder) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
 
-            return MediaFile(
-                id=id,
+    def _insert_row(mf: MediaFile, now: str) -> tuple:
+        return (mf.id, mf.file_path, mf.file_type, mf.file_metadata, now, now, mf.file_size, mf.mtime_ns, mf.inode,
+                mf.captured_at, mf.width, mf.height, mf.folder)
+
+    def add_media_files(file_paths: List[str], file_type: str, features, file_stats: List[tuple] = None,
+                        media_infos: List[dict] = None, thumbnails: List[str] = None) -> List[MediaFile]:
+        """批量添加同一类型的媒体文件，等待本批提交并写入特征向量，失败时返回空列表，参数见 submit_media_files"""
+        try:
+            return MediaFileDao.submit_media_files(file_paths, file_type, features, file_stats, media_infos, thumbnails).result()
+        except Exception as e:
+            log.exception("批量添加媒体文件异常")
+        return []
+
+    def submit_media_files(file_paths: List[str], file_type: str, features, file_stats: List[tuple] = None,
+                           media_infos: List[dict] = None, thumbnails: List[str] = None) -> PendingWrite:
+        """
+        批量提交同一类型的媒体文件记录，不等待提交完成，由写入线程与其他批次合并提交
+        提交成功后调用返回值的 result 批量写入特征向量。
+        :param features: 特征矩阵 [N, D]
+        :param file_stats: 每个文件索引时的 (大小, 修改时间纳秒, inode)
+        :param media_infos: 每个文件用于搜索过滤的 {captured_at, width, height, folder}
+        :param thumbnails: 每个文件的缩略图路径，写入向量元数据
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if file_stats is None:
+            file_stats = [None] * len(file_paths)
+        if media_infos is None:
+            media_infos = [None] * len(file_paths)
+        media_files = []
+        for file_path, file_stat, media_info in zip(file_paths, file_stats, media_infos):
+            file_size, mtime_ns, inode = file_stat or (None, None, None)
+            media_files.append(MediaFile(
+                id=generate_id(),
                 file_path=file_path,
                 file_type=file_type,
-                file_metadata=file_metadata
+                file_size=file_size,
+                mtime_ns=mtime_ns,
+                inode=inode,
+                **(media_info or {})
+            ))
+        future = SQLiteDB().write(MediaFileDao._INSERT_SQL, [MediaFileDao._insert_row(mf, now) for mf in media_files])
+
+        def write_vectors():
+            VectorDB().add_media_files_bulk(
+                [mf.id for mf in media_files],
+                file_paths,
+                [file_type] * len(media_files),
+                features,
+                media_infos=[mf.media_info() for mf in media_files],
+                thumbnails=thumbnails
             )
-        except Exception as e:
-            conn.rollback()
-            log.exception("添加媒体文件异常")
-        return None
+
+        return PendingWrite(future, media_files, write_vectors, lambda: MediaFileDao._rollback_media_files(media_files))
+
+    def _rollback_media_files(media_files: List[MediaFile]) -> None:
+        """删除写入失败的一批媒体文件记录及可能已部分写入的特征向量，文件下次刷新时重新索引"""
+        SQLiteDB().write("DELETE FROM media_files WHERE id = ?", [(mf.id,) for mf in media_files])
+        VectorDB().delete_feature_vector_by_ids([str(mf.id) for mf in media_files])
 
     def get_media_files_by_id(id: int) -> MediaFile:
         """根据id获取媒体文件"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT * FROM media_files WHERE id = ?", (id,))
             row = cursor.fetchone()
@@ -243,10 +514,26 @@ class MediaFileDao:
             cursor.close()
         return None
 
+    def get_media_files_by_ids(ids: List[int]) -> dict:
+        """根据id批量获取媒体文件，每批id一次 IN 查询，返回 {id: MediaFile}，不存在的id不在结果中"""
+        ids = list(dict.fromkeys(ids))
+        media_files = {}
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            for start in range(0, len(ids), _SQL_CHUNK_SIZE):
+                chunk = ids[start:start + _SQL_CHUNK_SIZE]
+                cursor.execute(f"SELECT * FROM media_files WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                for row in cursor.fetchall():
+                    media_files[row[0]] = MediaFile(*row)
+        except Exception as e:
+            log.exception("Error getting media files by ids: ")
+        finally:
+            cursor.close()
+        return media_files
+
     def get_media_files_by_folder(folder_path: str) -> List[str]:
         """获取数据库中该文件夹的所有文件"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT * FROM media_files WHERE file_path LIKE ?", (f"{folder_path}%",))
             values = cursor.fetchall()
@@ -261,8 +548,7 @@ class MediaFileDao:
 
     def get_media_files_by_file_path(file_path: str) -> List[MediaFile]:
         """根据file_path获取媒体文件"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT * FROM media_files WHERE file_path = ?", (file_path,))
             return [MediaFile(*row) for row in cursor.fetchall()]
@@ -272,19 +558,84 @@ class MediaFileDao:
             cursor.close()
         return []
 
-    def delete_media_file(media_file: MediaFile):
-        """删除媒体文件"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+    def get_media_files_in_folder(folder_path: str) -> List[MediaFile]:
+        """一次查询获取该文件夹（含子文件夹）下的所有媒体文件记录"""
+        prefix = os.path.join(folder_path, '')
+        cursor = SQLiteDB().get_read_cursor()
         try:
-            cursor.execute("DELETE FROM media_files WHERE id = ?", (media_file.id,))
-            conn.commit()
-            VectorDB().delete_feature_vector_by_ids([str(media_file.id)])
+            # 不使用 LIKE，避免路径中的 % 和 _ 被当作通配符
+            cursor.execute("SELECT * FROM media_files WHERE substr(file_path, 1, ?) = ?", (len(prefix), prefix))
+            return [MediaFile(*row) for row in cursor.fetchall()]
         except Exception as e:
-            conn.rollback()
-            log.exception("Error deleting media file: ")
+            log.exception("Error getting media files in folder: ")
+        finally:
+            cursor.close()
+        return []
+
+    def update_file_stats(media_files: List[MediaFile]) -> None:
+        """更新文件路径与 (大小, 修改时间, inode)，用于文件移动和补全旧记录"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        SQLiteDB().write(
+            "UPDATE media_files SET file_path = ?, file_size = ?, mtime_ns = ?, inode = ?, last_modified = ? WHERE id = ?",
+            [(mf.file_path, mf.file_size, mf.mtime_ns, mf.inode, now, mf.id) for mf in media_files]
+        )
+
+    def get_media_files_without_info(folder_path: str) -> List[MediaFile]:
+        """获取该文件夹下旧版本索引、缺少搜索过滤属性的记录"""
+        prefix = os.path.join(folder_path, '')
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute("SELECT * FROM media_files WHERE folder IS NULL AND substr(file_path, 1, ?) = ?", (len(prefix), prefix))
+            return [MediaFile(*row) for row in cursor.fetchall()]
+        except Exception as e:
+            log.exception("Error getting media files without info: ")
         finally:
             cursor.close()
+        return []
+
+    def update_media_info(media_files: List[MediaFile]) -> None:
+        """更新拍摄时间、尺寸与所属文件夹，同时更新特征向量的元数据"""
+        if not media_files:
+            return
+        try:
+            SQLiteDB().write(
+                "UPDATE media_files SET captured_at = ?, width = ?, height = ?, folder = ? WHERE id = ?",
+                [(mf.captured_at, mf.width, mf.height, mf.folder, mf.id) for mf in media_files]
+            )
+            VectorDB().update_media_info({mf.id: mf.media_info() for mf in media_files})
+        except Exception as e:
+            log.exception("Error updating media info: ")
+
+    def move_media_files(media_files: List[MediaFile]) -> None:
+        """文件被移动或重命名，只更新记录中的路径与所属文件夹，不重新提取特征"""
+        try:
+            MediaFileDao.update_file_stats(media_files)
+            VectorDB().update_file_paths({mf.id: mf.file_path for mf in media_files})
+            moved_folders = [mf for mf in media_files if mf.folder is not None]
+            if moved_folders:
+                MediaFileDao.update_media_info(moved_folders)
+        except Exception as e:
+            log.exception("Error moving media files: ")
+
+    def delete_media_files(media_files: List[MediaFile]) -> None:
+        """批量删除媒体文件及其视频帧、特征向量、帧图片和不再被引用的缩略图"""
+        if not media_files:
+            return
+        try:
+            ids = [mf.id for mf in media_files]
+            video_ids = [(mf.id,) for mf in media_files if mf.file_type == 'video']
+            if video_ids:
+                SQLiteDB().write("DELETE FROM video_frames WHERE media_file_id = ?", video_ids)
+            SQLiteDB().write("DELETE FROM media_files WHERE id = ?", [(id,) for id in ids])
+            delete_files(VectorDB().delete_feature_vectors_by_media_file_ids(ids))
+            for (id,) in video_ids:
+                delete_folder(os.path.join(CACHE_DIR, 'video_frames', str(id)))
+        except Exception as e:
+            log.exception("Error deleting media files: ")
+
+    def delete_media_file(media_file: MediaFile):
+        """删除媒体文件及其视频帧、特征向量、帧图片和不再被引用的缩略图"""
+        MediaFileDao.delete_media_files([media_file])
 
 class VideoFrameDao:
 
@@ -304,39 +655,75 @@ class VideoFrameDao:
             cursor.close()
 
     def add_video_frame(media_file_id: int, frame_number: int, timestamp: float, frame_path: str, file_path: str, feature_list: List[float] = None) -> VideoFrame:
-        """添加视频帧"""
-        conn = SQLiteDB().get_connection()
+        """添加视频帧，等待写入线程提交成功后再写入特征向量，失败时返回 None"""
         try:
-            id = generate_id()
-            conn.execute(
-                "INSERT INTO video_frames (id, media_file_id, frame_number, timestamp, frame_path) VALUES (?, ?, ?, ?, ?)",
-                (id, media_file_id, frame_number, timestamp, frame_path)
-            )
-            conn.commit()
-            if feature_list is not None:
-                VectorDB().add_feature_vector_video_frame(
-                    id,
-                    media_file_id,
-                    frame_path,
-                    file_path,
-                    timestamp,
-                    feature_list
-                )
-            return VideoFrame(
-                id=id,
+            video_frames = VideoFrameDao.submit_video_frames(
+                media_file_id, file_path, [(frame_number, timestamp, frame_path)],
+                None if feature_list is None else [feature_list]
+            ).result()
+            return video_frames[0] if video_frames else None
+        except Exception as e:
+            log.exception("Error adding video frame: ")
+        return None
+
+    def add_video_frames(media_file_id: int, file_path: str, frames: List[tuple], features, media_info: dict = None,
+                         thumbnails: List[str] = None) -> List[VideoFrame]:
+        """批量添加同一视频的多个帧，等待本批提交并写入特征向量，失败时返回空列表，参数见 submit_video_frames"""
+        try:
+            return VideoFrameDao.submit_video_frames(media_file_id, file_path, frames, features, media_info, thumbnails).result()
+        except Exception as e:
+            log.exception("Error adding video frames: ")
+        return []
+
+    def submit_video_frames(media_file_id: int, file_path: str, frames: List[tuple], features, media_info: dict = None,
+                            thumbnails: List[str] = None, after: PendingWrite = None) -> PendingWrite:
+        """
+        批量提交同一视频的多个帧记录，不等待提交完成，提交成功后调用返回值的 result 批量写入特征向量
+        :param frames: [(frame_number, timestamp, frame_path), ...]
+        :param features: 特征矩阵 [N, D]，为空时不写入特征向量
+        :param media_info: 视频用于搜索过滤的 {captured_at, width, height, folder}，写入每个帧的向量元数据
+        :param thumbnails: 每个帧的缩略图路径，写入向量元数据
+        :param after: 视频记录的写入，视频记录提交失败时本批帧同样视为失败
+        """
+        video_frames = [
+            VideoFrame(
+                id=generate_id(),
                 media_file_id=media_file_id,
                 frame_number=frame_number,
                 timestamp=timestamp,
                 frame_path=frame_path
             )
-        except Exception as e:
-            conn.rollback()
-            log.exception("Error adding video frame: ")
+            for frame_number, timestamp, frame_path in frames
+        ]
+        future = SQLiteDB().write(
+            "INSERT INTO video_frames (id, media_file_id, frame_number, timestamp, frame_path) VALUES (?, ?, ?, ?, ?)",
+            [(vf.id, vf.media_file_id, vf.frame_number, vf.timestamp, vf.frame_path) for vf in video_frames]
+        )
+
+        def write_vectors():
+            if features is None:
+                return
+            VectorDB().add_video_frames_bulk(
+                [vf.id for vf in video_frames],
+                [media_file_id] * len(video_frames),
+                [vf.frame_path for vf in video_frames],
+                [file_path] * len(video_frames),
+                [vf.timestamp for vf in video_frames],
+                features,
+                media_info=media_info,
+                thumbnails=thumbnails
+            )
+
+        return PendingWrite(future, video_frames, write_vectors, lambda: VideoFrameDao._rollback_video_frames(video_frames), after)
+
+    def _rollback_video_frames(video_frames: List[VideoFrame]) -> None:
+        """删除写入失败的一批帧记录及可能已部分写入的特征向量"""
+        SQLiteDB().write("DELETE FROM video_frames WHERE id = ?", [(vf.id,) for vf in video_frames])
+        VectorDB().delete_feature_vector_by_ids([str(vf.media_file_id) + '-' + str(vf.id) for vf in video_frames])
 
     def get_video_frames_by_media_file_id(media_file_id: int) -> List[VideoFrame]:
         """根据media_file_id获取视频帧"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
+        cursor = SQLiteDB().get_read_cursor()
         try:
             cursor.execute("SELECT * FROM video_frames WHERE media_file_id = ?", (media_file_id,))
             return [VideoFrame(*row) for row in cursor.fetchall()]
@@ -348,28 +735,117 @@ class VideoFrameDao:
 
     def delete_video_frame(video_frame: VideoFrame):
         """删除视频帧"""
-        conn = SQLiteDB().get_connection()
-        cursor = SQLiteDB().get_cursor()
         try:
-            cursor.execute("DELETE FROM video_frames WHERE id = ?", (video_frame.id,))
-            conn.commit()
+            SQLiteDB().write("DELETE FROM video_frames WHERE id = ?", [(video_frame.id,)])
             VectorDB().delete_feature_vector_by_ids([str(video_frame.media_file_id) + '-' + str(video_frame.id)])
         except Exception as e:
-            conn.rollback()
             log.exception("Error deleting video frame: ")
+
+    def delete_video_frame_by_id(video_frame_id: int) -> None:
+        """根据video_frame_id删除视频帧，帧的向量id由所属媒体文件id与帧id组成"""
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute("SELECT media_file_id FROM video_frames WHERE id = ?", (video_frame_id,))
+            row = cursor.fetchone()
+            SQLiteDB().write("DELETE FROM video_frames WHERE id = ?", [(video_frame_id,)])
+            if row is not None:
+                VectorDB().delete_feature_vector_by_ids([str(row[0]) + '-' + str(video_frame_id)])
+        except Exception as e:
+            log.exception("Error deleting video frame by id: ")
         finally:
             cursor.close()
 
-    def delete_video_frame_by_id(video_frame_id: int) -> None:
-        """根据video_frame_id删除视频帧"""
+class EmbeddingCacheDao:
+
+    def create_table() -> None:
+        """不存在时创建表"""
         conn = SQLiteDB().get_connection()
         cursor = SQLiteDB().get_cursor()
         try:
-            cursor.execute("DELETE FROM video_frames WHERE id = ?", (video_frame_id,))
+            cursor.execute(EmbeddingCache.create_table_sql())
+            cursor.execute(EmbeddingCache.create_frames_table_sql())
             conn.commit()
-            VectorDB().delete_feature_vector_by_ids([str(video_frame_id)])
+            log.info("embedding_cache table created")
         except Exception as e:
             conn.rollback()
-            log.exception("Error deleting video frame by id: ")
+            log.exception("Error creating embedding_cache table: ")
+        finally:
+            cursor.close()
+
+    def get_image_embedding(content_hash: str) -> np.ndarray:
+        """获取图片的缓存特征向量，不存在时返回 None"""
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute("SELECT embedding FROM embedding_cache WHERE content_hash = ? AND file_type = 'image'", (content_hash,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                return np.frombuffer(row[0], dtype=np.float32)
+        except Exception as e:
+            log.exception("Error getting cached image embedding: ")
+        finally:
+            cursor.close()
+        return None
+
+    def get_video_embeddings(content_hash: str) -> tuple:
+        """
+        获取视频的缓存元数据与采样帧特征向量，不存在时返回 None
+        :return: (metadata, [(frame_number, timestamp, frame_path, embedding), ...])
+        """
+        cursor = SQLiteDB().get_read_cursor()
+        try:
+            cursor.execute("SELECT file_metadata FROM embedding_cache WHERE content_hash = ? AND file_type = 'video'", (content_hash,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute(
+                "SELECT frame_number, timestamp, frame_path, embedding FROM embedding_cache_frames WHERE content_hash = ? ORDER BY frame_number",
+                (content_hash,)
+            )
+            frames = [
+                (frame_number, timestamp, frame_path, np.frombuffer(embedding, dtype=np.float32))
+                for frame_number, timestamp, frame_path, embedding in cursor.fetchall()
+            ]
+            if not frames:
+                return None
+            return json.loads(row[0]) if row[0] else {}, frames
+        except Exception as e:
+            log.exception("Error getting cached video embeddings: ")
         finally:
             cursor.close()
+        return None
+
+    def add_image_embeddings(content_hashes: List[str], features) -> None:
+        """
+        批量缓存图片特征向量
+        :param features: 特征矩阵 [N, D]
+        """
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        SQLiteDB().write(
+            "INSERT OR REPLACE INTO embedding_cache (content_hash, file_type, file_metadata, embedding, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (content_hash, 'image', None, np.asarray(feature, dtype=np.float32).tobytes(), now)
+                for content_hash, feature in zip(content_hashes, features)
+            ]
+        )
+
+    def add_video_frame_embeddings(content_hash: str, frames: List[tuple], features) -> None:
+        """
+        缓存视频的一批采样帧特征向量
+        :param frames: [(frame_number, timestamp, frame_path), ...]
+        :param features: 特征矩阵 [N, D]
+        """
+        SQLiteDB().write(
+            "INSERT OR REPLACE INTO embedding_cache_frames (content_hash, frame_number, timestamp, frame_path, embedding) VALUES (?, ?, ?, ?, ?)",
+            [
+                (content_hash, frame_number, timestamp, frame_path, np.asarray(feature, dtype=np.float32).tobytes())
+                for (frame_number, timestamp, frame_path), feature in zip(frames, features)
+            ]
+        )
+
+    def add_video(content_hash: str, metadata: dict) -> None:
+        """所有采样帧缓存后写入视频记录，之后该视频的缓存才可用"""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        SQLiteDB().write(
+            "INSERT OR REPLACE INTO embedding_cache (content_hash, file_type, file_metadata, embedding, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(content_hash, 'video', json.dumps(metadata), None, now)]
+        )
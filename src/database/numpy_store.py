@@ -0,0 +1,680 @@
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, List, Set, Tuple
+from src.config import (
+    VECTOR_NUMPY_PATH, VECTOR_SEARCH_BLOCK_ROWS, VECTOR_COMPACT_RATIO, VECTOR_NUMPY_STORAGE, VECTOR_RERANK_FACTOR,
+    VECTOR_INDEX_TYPE, VECTOR_IVF_LISTS, VECTOR_IVF_NPROBE, VECTOR_IVF_TRAIN_SAMPLE, VECTOR_PROJECTION_DIMS
+)
+from .ivf_index import IvfIndex, nearest_centroids
+from .media_filter import MediaFilter
+from .projection import PcaProjection
+
+log = logging.getLogger(__name__)
+
+# 矩阵文件的最小行数，也是触发压缩所需的最少删除行数
+_MIN_CAPACITY = 1024
+# 搜索矩阵的存储格式 → (numpy 类型, 文件扩展名)，float32 只在使用 PCA 投影时单独存放
+_STORAGE_TYPES = {
+    'float32': (np.float32, 'p32'),
+    'float16': (np.float16, 'f16'),
+    'int8': (np.int8, 'i8'),
+}
+# int8 量化参数拟合所需的最少行数，不足时使用对称的保守范围
+_MIN_FIT_ROWS = 256
+# 行数增长到拟合时的多少倍后重新拟合 int8 量化参数
+_REFIT_GROWTH = 4
+# 有效向量达到该数量后才训练 IVF，之前使用精确搜索
+_IVF_MIN_TRAIN_ROWS = 10000
+# IVF 尾部（训练或重排之后追加的行）超过有序区的该比例时重排
+_IVF_TAIL_RATIO = 0.1
+# 有效向量达到该数量后才拟合 PCA 投影
+_PCA_MIN_FIT_ROWS = 2000
+# 拟合 PCA 使用的最大样本数
+_PCA_FIT_SAMPLE = 100000
+# 按行号查询元数据时每条 SQL 的最大参数个数
+_SQL_CHUNK_SIZE = 500
+
+class NumpyVectorStore:
+    """
+    基于内存映射矩阵的精确向量搜索
+    归一化后的向量按行连续存放在 float32 原始文件中，通过 mmap 打开，启动时不需要把向量读入内存；
+    向量id、媒体文件id与元数据保存在同目录的 SQLite 中。删除只标记墓碑，墓碑比例超过阈值时重写矩阵文件压缩。
+    查询按块做矩阵乘法并用 argpartition 取 top-k，内存占用只与块大小有关。
+    使用 float16 或 int8 压缩存储时，查询先扫描压缩矩阵取出 k * rerank_factor 个候选，
+    再从 float32 旁路文件读取候选的原始向量重新排序；原始向量只在重排和压缩时访问，不需要常驻内存。
+    索引类型为 ivf 时，压缩矩阵文件的同时按 k-means 聚类重排行，查询只扫描最接近的 nprobe 个倒排列表。
+    配置 PCA 投影时，搜索矩阵保存投影后的低维向量，同样用 float32 原始向量重排候选；
+    投影有版本号，搜索矩阵与生成它的投影在同一个事务中切换，不会混用。
+    过滤查询按媒体文件id屏蔽不匹配的行：匹配的行不超过一个块时直接精确扫描这些行，否则在原有的扫描方式中跳过其余的行。
+    """
+
+    # 不保存可过滤的元数据列，过滤条件需要先转换为媒体文件id
+    supports_where = False
+
+    def __init__(self, path: str = VECTOR_NUMPY_PATH, block_rows: int = VECTOR_SEARCH_BLOCK_ROWS, compact_ratio: float = VECTOR_COMPACT_RATIO,
+                 storage: str = VECTOR_NUMPY_STORAGE, rerank_factor: int = VECTOR_RERANK_FACTOR,
+                 index_type: str = VECTOR_INDEX_TYPE, ivf_lists: int = VECTOR_IVF_LISTS, nprobe: int = VECTOR_IVF_NPROBE,
+                 train_sample: int = VECTOR_IVF_TRAIN_SAMPLE, projection_dims: int = VECTOR_PROJECTION_DIMS):
+        """
+        :param storage: float32 不压缩，float16 半精度，int8 按维度线性量化
+        :param rerank_factor: 压缩存储时重排的候选数量倍数
+        :param index_type: flat 精确搜索，ivf 倒排文件近似搜索
+        :param ivf_lists: IVF 聚类数，0 表示按 sqrt(行数) 自动确定
+        :param nprobe: IVF 查询时探测的倒排列表数
+        :param train_sample: IVF 训练使用的最大样本数
+        :param projection_dims: PCA 投影后的维度，0 表示不投影
+        """
+        if storage not in _STORAGE_TYPES:
+            raise ValueError(f"不支持的向量存储格式: {storage}")
+        if index_type not in ('flat', 'ivf'):
+            raise ValueError(f"不支持的向量索引类型: {index_type}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.block_rows = max(1, block_rows)
+        self.compact_ratio = compact_ratio
+        self.storage = storage
+        self.rerank_factor = max(1, rerank_factor)
+        self.index_type = index_type
+        self.ivf_lists = ivf_lists
+        self.nprobe = max(1, nprobe)
+        self.train_sample = train_sample
+        self.projection_dims = max(0, projection_dims)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, 'vectors.db'), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS vectors (
+                row INTEGER PRIMARY KEY,
+                vector_id TEXT NOT NULL UNIQUE,
+                media_file_id INTEGER,
+                metadata TEXT NOT NULL
+            )
+        ''')
+        self._conn.commit()
+        self._load()
+
+    def _load(self) -> None:
+        """读取行映射并打开矩阵文件"""
+        meta = dict(self._conn.execute('SELECT key, value FROM meta'))
+        self.dim = int(meta.get('dim', 0))
+        self._capacity = int(meta.get('capacity', 0))
+        self._generation = int(meta.get('generation', 0))
+        records = self._conn.execute('SELECT row, vector_id, media_file_id FROM vectors').fetchall()
+        self._n_rows = max(int(meta.get('n_rows', 0)), max((row for row, _, _ in records), default=-1) + 1)
+        self._capacity = max(self._capacity, self._n_rows)
+
+        # 行号 → 向量id，已删除的行为 None
+        self._ids = [None] * self._n_rows
+        # 向量id → 行号
+        self._row_of = {}
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._media_ids = np.full(self._capacity, -1, dtype=np.int64)
+        for row, vector_id, media_file_id in records:
+            self._ids[row] = vector_id
+            self._row_of[vector_id] = row
+            self._alive[row] = True
+            self._media_ids[row] = -1 if media_file_id is None else media_file_id
+
+        # 当前矩阵文件实际使用的存储格式与 int8 量化参数
+        self._stored_as = meta.get('storage', 'float32')
+        quant = json.loads(meta['quant']) if 'quant' in meta else None
+        self._scale = None if quant is None else np.asarray(quant['scale'], dtype=np.float32)
+        self._offset = None if quant is None else np.asarray(quant['offset'], dtype=np.float32)
+        self._quant_rows = 0 if quant is None else quant['rows']
+        # 最近一次分配的投影版本号，停用投影后也保留，版本号不会重复使用
+        self._projection_seq = int(meta.get('projection_version', 0))
+        self._projection = None
+        if 'projection' in meta:
+            self._projection = PcaProjection.load(self._projection_file(json.loads(meta['projection'])['version']))
+
+        self._vectors = self._open_matrix(self._matrix_file(self._generation), self._capacity, np.float32, self.dim) if self.dim else None
+        self._codes = None
+        if self.dim and self._uses_codes(self._stored_as, self._projection):
+            self._codes = self._open_codes(self._generation, self._capacity, self._stored_as, self._projection)
+        self._ivf = None
+        if 'ivf' in meta:
+            if self.index_type == 'ivf':
+                self._ivf = self._load_ivf(json.loads(meta['ivf']))
+            else:
+                self._conn.execute("DELETE FROM meta WHERE key = 'ivf'")
+                self._conn.commit()
+        self._remove_stale_files()
+        log.info(f"NumPy 向量索引已加载 {len(self._row_of)} 条向量，维度 {self.dim}，存储格式 {self._stored_as}，"
+                 f"IVF 聚类数 {self._ivf.n_lists if self._ivf else 0}，"
+                 f"投影 {'v%d %d 维' % (self._projection.version, self._projection.dims) if self._projection else '无'}")
+
+        if self.dim and (self._stored_as != self.storage or self._projection_outdated()):
+            # 配置的存储格式或投影维度变化后从 float32 原始向量重新生成
+            log.info(f"向量存储格式由 {self._stored_as} 转换为 {self.storage}，投影维度 {self.projection_dims}")
+            self.compact(refit_projection=self._projection_outdated())
+        elif self._stored_as != self.storage:
+            self._stored_as = self.storage
+            self._set_meta(storage=self.storage)
+            self._conn.commit()
+        elif self._needs_training():
+            self.compact(retrain=True)
+
+    def _centroids_file(self, generation: int) -> str:
+        return os.path.join(self.path, f'centroids-{generation}.npy')
+
+    def _load_ivf(self, state: dict) -> IvfIndex:
+        """读取聚类中心，并重新计算尾部各行所属的聚类"""
+        ivf = IvfIndex(
+            np.load(self._centroids_file(self._generation)),
+            np.asarray(state['offsets'], dtype=np.int64),
+            state['sorted_rows'],
+            state['trained_rows']
+        )
+        ivf.append(nearest_centroids(self._vectors, np.arange(ivf.sorted_rows, self._n_rows), ivf.centroids, self.block_rows))
+        return ivf
+
+    def _projection_file(self, version: int) -> str:
+        return os.path.join(self.path, f'projection-{version}.npz')
+
+    def _projection_outdated(self) -> bool:
+        """投影维度与配置不一致，或数据量足够但尚未拟合、拟合后已增长数倍时需要重新拟合"""
+        if self.projection_dims <= 0:
+            return self._projection is not None
+        if self._projection is None:
+            return len(self._row_of) >= _PCA_MIN_FIT_ROWS
+        return (self._projection.dims != min(self.projection_dims, self.dim)
+                or len(self._row_of) >= self._projection.fitted_rows * _REFIT_GROWTH)
+
+    def _needs_training(self) -> bool:
+        """IVF 尚未训练且数据量足够，或训练后数据量已增长数倍时需要重新训练"""
+        if self.index_type != 'ivf':
+            return False
+        if self._ivf is None:
+            return len(self._row_of) >= _IVF_MIN_TRAIN_ROWS
+        return len(self._row_of) >= self._ivf.trained_rows * _REFIT_GROWTH
+
+    def _matrix_file(self, generation: int) -> str:
+        """float32 原始向量文件"""
+        return os.path.join(self.path, f'vectors-{generation}.f32')
+
+    def _codes_file(self, generation: int, storage: str) -> str:
+        """搜索矩阵文件"""
+        return os.path.join(self.path, f'vectors-{generation}.{_STORAGE_TYPES[storage][1]}')
+
+    @staticmethod
+    def _uses_codes(storage: str, projection: PcaProjection) -> bool:
+        """压缩存储或使用投影时，搜索矩阵与原始向量分开存放"""
+        return storage != 'float32' or projection is not None
+
+    @staticmethod
+    def _open_matrix(file: str, capacity: int, dtype, dim: int) -> np.memmap:
+        """以读写方式映射矩阵文件，文件不足指定行数时扩展"""
+        dtype = np.dtype(dtype)
+        size = capacity * dim * dtype.itemsize
+        with open(file, 'a+b') as f:
+            if os.fstat(f.fileno()).st_size < size:
+                f.truncate(size)
+        return np.memmap(file, dtype=dtype, mode='r+', shape=(capacity, dim))
+
+    def _open_codes(self, generation: int, capacity: int, storage: str, projection: PcaProjection) -> np.memmap:
+        dim = projection.dims if projection is not None else self.dim
+        return self._open_matrix(self._codes_file(generation, storage), capacity, _STORAGE_TYPES[storage][0], dim)
+
+    def _remove_stale_files(self) -> None:
+        """删除压缩中断或旧版本遗留的矩阵文件"""
+        current = {
+            self._matrix_file(self._generation),
+            self._codes_file(self._generation, self._stored_as),
+            self._centroids_file(self._generation)
+        }
+        if self._projection is not None:
+            current.add(self._projection_file(self._projection.version))
+        stale = []
+        for pattern in ('vectors-*.*', 'centroids-*.npy', 'projection-*.npz'):
+            stale.extend(glob.glob(os.path.join(self.path, pattern)))
+        for file in stale:
+            if file not in current:
+                try:
+                    os.remove(file)
+                except OSError as e:
+                    log.warning(f"无法删除旧的向量文件 {file}: {e}")
+
+    def _set_meta(self, **values) -> None:
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """容量不足时按倍数扩展矩阵文件"""
+        if rows <= self._capacity and self._vectors is not None:
+            return
+        capacity = max(rows, self._capacity * 2, _MIN_CAPACITY)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = self._open_matrix(self._matrix_file(self._generation), capacity, np.float32, self.dim)
+        if self._uses_codes(self._stored_as, self._projection):
+            if self._codes is not None:
+                self._codes.flush()
+            self._codes = self._open_codes(self._generation, capacity, self._stored_as, self._projection)
+        grow = capacity - len(self._alive)
+        self._alive = np.concatenate([self._alive, np.zeros(grow, dtype=bool)])
+        self._media_ids = np.concatenate([self._media_ids, np.full(grow, -1, dtype=np.int64)])
+        self._capacity = capacity
+        self._set_meta(capacity=capacity)
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    def _fit_quantization(self, vectors: np.ndarray, rows: int, projection: PcaProjection) -> None:
+        """
+        按维度拟合 int8 量化的缩放与偏移，覆盖前 rows 行（投影后）每个维度的取值范围
+        样本太少时范围不可靠，使用按最大绝对值放大一倍的对称范围，之后数据增多时再重新拟合。
+        """
+        low = high = None
+        for start in range(0, rows, self.block_rows):
+            block = np.asarray(vectors[start:min(rows, start + self.block_rows)])
+            if projection is not None:
+                block = projection.project(block)
+            low = block.min(axis=0) if low is None else np.minimum(low, block.min(axis=0))
+            high = block.max(axis=0) if high is None else np.maximum(high, block.max(axis=0))
+        if rows < _MIN_FIT_ROWS:
+            bound = max(float(np.abs(np.concatenate([low, high])).max()) * 2, 1e-3)
+            low = np.full(len(low), -bound, dtype=np.float32)
+            high = np.full(len(high), bound, dtype=np.float32)
+        self._offset = low.astype(np.float32)
+        self._scale = np.maximum((high - low) / 255, 1e-8).astype(np.float32)
+        self._quant_rows = rows
+        self._set_meta(quant=json.dumps({
+            'scale': self._scale.tolist(),
+            'offset': self._offset.tolist(),
+            'rows': rows
+        }))
+
+    def _encode(self, embeddings: np.ndarray, storage: str, projection: PcaProjection) -> np.ndarray:
+        """把归一化后的 float32 向量转换为搜索矩阵的格式"""
+        if projection is not None:
+            embeddings = projection.project(embeddings)
+        if storage != 'int8':
+            return embeddings.astype(_STORAGE_TYPES[storage][0])
+        codes = np.rint((embeddings - self._offset) / self._scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def count(self) -> int:
+        """向量总数（不含已删除的行）"""
+        return len(self._row_of)
+
+    def add(self, ids: List[str], embeddings: np.ndarray, metadatas: List[dict], skip_existing: bool) -> None:
+        """写入特征向量，已存在的id覆盖原来的行，skip_existing 为 True 时跳过"""
+        embeddings = self._normalize(embeddings)
+        with self._lock:
+            if not self.dim:
+                self.dim = embeddings.shape[1]
+                self._set_meta(dim=self.dim)
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"向量维度 {embeddings.shape[1]} 与索引维度 {self.dim} 不一致")
+
+            positions = []
+            rows = []
+            # 同一批次中重复的id只写入最后一次出现的向量，一个id只占用一行
+            last_position = {vector_id: i for i, vector_id in enumerate(ids)}
+            # IVF 有序区中被覆盖的行改为追加新行，原来的行标记删除，避免行落在错误的倒排列表中
+            moved = []
+            next_row = self._n_rows
+            for i, vector_id in enumerate(ids):
+                if last_position[vector_id] != i:
+                    continue
+                row = self._row_of.get(vector_id)
+                if row is not None and not skip_existing and self._ivf is not None and row < self._ivf.sorted_rows:
+                    moved.append(row)
+                    row = None
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                elif skip_existing:
+                    continue
+                positions.append(i)
+                rows.append(row)
+            if not rows:
+                return
+
+            self._ensure_capacity(next_row)
+            self._vectors[rows] = embeddings[positions]
+            self._vectors.flush()
+            if self._codes is not None:
+                if self._stored_as == 'int8' and self._scale is None:
+                    self._fit_quantization(embeddings[positions], len(rows), self._projection)
+                self._codes[rows] = self._encode(embeddings[positions], self._stored_as, self._projection)
+                self._codes.flush()
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO vectors (row, vector_id, media_file_id, metadata) VALUES (?, ?, ?, ?)',
+                [
+                    (row, ids[i], metadatas[i].get('id'), json.dumps(metadatas[i], ensure_ascii=False))
+                    for i, row in zip(positions, rows)
+                ]
+            )
+            self._set_meta(n_rows=next_row)
+            self._conn.commit()
+
+            if self._ivf is not None:
+                lists = nearest_centroids(embeddings, np.asarray(positions), self._ivf.centroids, self.block_rows)
+                tail = []
+                for row, list_id in zip(rows, lists):
+                    if row < self._n_rows:
+                        self._ivf.set_tail_list(row, list_id)
+                    else:
+                        tail.append(list_id)
+                self._ivf.append(np.asarray(tail, dtype=np.int32))
+            self._ids.extend([None] * (next_row - self._n_rows))
+            if moved:
+                self._alive[moved] = False
+                self._media_ids[moved] = -1
+                for row in moved:
+                    self._ids[row] = None
+            for i, row in zip(positions, rows):
+                self._ids[row] = ids[i]
+                self._row_of[ids[i]] = row
+                self._media_ids[row] = metadatas[i].get('id', -1)
+            self._n_rows = next_row
+            # 向量写完后才标记为有效，并发查询不会读到未写入的行
+            self._alive[rows] = True
+
+            # 数据量增长较多后，压缩时按全部向量重新拟合投影与 int8 量化参数、重新训练 IVF；IVF 尾部过长时重排
+            if self._needs_training() or self._projection_outdated():
+                self.compact(retrain=self._needs_training(), refit_projection=self._projection_outdated())
+            elif self._stored_as == 'int8' and len(self._row_of) >= max(_MIN_FIT_ROWS, self._quant_rows * _REFIT_GROWTH):
+                self.compact()
+            elif self._ivf is not None and self._n_rows - self._ivf.sorted_rows > max(_MIN_CAPACITY, self._ivf.sorted_rows * _IVF_TAIL_RATIO):
+                self.compact()
+
+    def delete(self, ids: List[str]) -> None:
+        """按向量id删除"""
+        with self._lock:
+            self._delete_rows([self._row_of[id] for id in ids if id in self._row_of])
+
+    def delete_by_media_file_ids(self, media_file_ids: List[int]) -> None:
+        """删除媒体文件及其所有视频帧的特征向量"""
+        with self._lock:
+            self._delete_rows(self._rows_of_media_files(media_file_ids))
+
+    def thumbnails_of_media_files(self, media_file_ids: List[int]) -> Set[str]:
+        """媒体文件及其视频帧引用的缩略图路径"""
+        with self._lock:
+            metadatas = self._load_metadatas(self._rows_of_media_files(media_file_ids))
+        return {metadata['thumbnail'] for metadata in metadatas.values() if metadata.get('thumbnail')}
+
+    def thumbnails_in_use(self, thumbnails: List[str]) -> Set[str]:
+        """仍被特征向量引用的缩略图路径，缩略图按内容命名，可能被多条记录共用"""
+        in_use = set()
+        with self._lock:
+            for start in range(0, len(thumbnails), _SQL_CHUNK_SIZE):
+                chunk = thumbnails[start:start + _SQL_CHUNK_SIZE]
+                cursor = self._conn.execute(
+                    f"SELECT DISTINCT json_extract(metadata, '$.thumbnail') FROM vectors "
+                    f"WHERE json_extract(metadata, '$.thumbnail') IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                in_use.update(row[0] for row in cursor)
+        return in_use
+
+    def _rows_of_media_files(self, media_file_ids: List[int]) -> List[int]:
+        mask = np.isin(self._media_ids[:self._n_rows], np.asarray(media_file_ids, dtype=np.int64))
+        return np.flatnonzero(mask & self._alive[:self._n_rows]).tolist()
+
+    def _delete_rows(self, rows: List[int]) -> None:
+        """标记墓碑，删除的行数超过阈值时压缩"""
+        if not rows:
+            return
+        self._alive[rows] = False
+        self._media_ids[rows] = -1
+        for row in rows:
+            self._row_of.pop(self._ids[row], None)
+            self._ids[row] = None
+        self._conn.executemany('DELETE FROM vectors WHERE row = ?', [(row,) for row in rows])
+        self._conn.commit()
+
+        dead = self._n_rows - len(self._row_of)
+        if dead >= _MIN_CAPACITY and dead > self._n_rows * self.compact_ratio:
+            self.compact()
+
+    def update_metadata(self, updates: dict) -> None:
+        """更新媒体文件及其视频帧的元数据字段 {media_file_id: {字段: 新值}}"""
+        with self._lock:
+            rows = self._rows_of_media_files(list(updates.keys()))
+            changes = []
+            for row, metadata in self._load_metadatas(rows).items():
+                metadata.update(updates[metadata['id']])
+                changes.append((json.dumps(metadata, ensure_ascii=False), row))
+            self._conn.executemany('UPDATE vectors SET metadata = ? WHERE row = ?', changes)
+            self._conn.commit()
+
+    def _load_metadatas(self, rows: List[int]) -> Dict[int, dict]:
+        """按行号读取元数据"""
+        metadatas = {}
+        for start in range(0, len(rows), _SQL_CHUNK_SIZE):
+            chunk = rows[start:start + _SQL_CHUNK_SIZE]
+            cursor = self._conn.execute(
+                f"SELECT row, metadata FROM vectors WHERE row IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for row, metadata in cursor:
+                metadatas[row] = json.loads(metadata)
+        return metadatas
+
+    def compact(self, retrain: bool = False, refit_projection: bool = False) -> None:
+        """
+        把有效行复制到新的矩阵文件，并在同一个事务中重排行号和切换文件
+        压缩存储或投影时同时按配置重新生成搜索矩阵，int8 量化参数按全部有效向量重新拟合；
+        使用 IVF 时按聚类重排行，使每个倒排列表连续存放。
+        :param retrain: 重新训练 IVF 聚类中心
+        :param refit_projection: 重新拟合 PCA 投影，生成新的投影版本
+        """
+        with self._lock:
+            if not self.dim:
+                return
+            live = np.flatnonzero(self._alive[:self._n_rows])
+            generation = self._generation + 1
+            capacity = max(len(live), _MIN_CAPACITY)
+
+            ivf = None
+            if self.index_type == 'ivf' and len(live) >= _IVF_MIN_TRAIN_ROWS:
+                if retrain or self._ivf is None:
+                    centroids = IvfIndex.train(self._vectors, live, self.ivf_lists, self.train_sample, self.block_rows)
+                    trained_rows = len(live)
+                else:
+                    centroids, trained_rows = self._ivf.centroids, self._ivf.trained_rows
+                lists = nearest_centroids(self._vectors, live, centroids, self.block_rows)
+                order = np.argsort(lists, kind='stable')
+                live = live[order]
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(centroids)))])
+                ivf = IvfIndex(centroids, offsets, len(live), trained_rows)
+                np.save(self._centroids_file(generation), centroids)
+
+            projection = self._projection if self.projection_dims > 0 else None
+            projection_seq = self._projection_seq
+            if self.projection_dims > 0 and (refit_projection or projection is None) and len(live) >= _PCA_MIN_FIT_ROWS:
+                projection_seq += 1
+                projection = PcaProjection.fit(self._vectors, live, min(self.projection_dims, self.dim), _PCA_FIT_SAMPLE,
+                                               self.block_rows, projection_seq)
+                projection.save(self._projection_file(projection.version))
+
+            vectors = self._open_matrix(self._matrix_file(generation), capacity, np.float32, self.dim)
+            for start in range(0, len(live), self.block_rows):
+                block = live[start:start + self.block_rows]
+                vectors[start:start + len(block)] = self._vectors[block]
+            vectors.flush()
+
+            codes = None
+            if self._uses_codes(self.storage, projection):
+                if self.storage == 'int8':
+                    self._fit_quantization(vectors, len(live), projection)
+                codes = self._open_codes(generation, capacity, self.storage, projection)
+                for start in range(0, len(live), self.block_rows):
+                    end = min(len(live), start + self.block_rows)
+                    codes[start:end] = self._encode(np.asarray(vectors[start:end]), self.storage, projection)
+                codes.flush()
+
+            # 先把行号改为负数再取反，任意顺序的重排都不会与尚未移动的行冲突
+            self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS row_map (old_row INTEGER PRIMARY KEY, new_row INTEGER NOT NULL)')
+            self._conn.execute('DELETE FROM row_map')
+            self._conn.executemany(
+                'INSERT INTO row_map (old_row, new_row) VALUES (?, ?)',
+                [(int(old_row), new_row) for new_row, old_row in enumerate(live) if new_row != old_row]
+            )
+            self._conn.execute('UPDATE vectors SET row = -1 - (SELECT new_row FROM row_map WHERE old_row = vectors.row) WHERE row IN (SELECT old_row FROM row_map)')
+            self._conn.execute('UPDATE vectors SET row = -1 - row WHERE row < 0')
+            self._conn.execute('DELETE FROM row_map')
+            self._set_meta(generation=generation, capacity=capacity, n_rows=len(live), storage=self.storage)
+            if ivf is not None:
+                self._set_meta(ivf=json.dumps({
+                    'offsets': ivf.offsets.tolist(),
+                    'sorted_rows': ivf.sorted_rows,
+                    'trained_rows': ivf.trained_rows
+                }))
+            else:
+                self._conn.execute("DELETE FROM meta WHERE key = 'ivf'")
+            self._set_meta(projection_version=projection_seq)
+            if projection is not None:
+                self._set_meta(projection=json.dumps({'version': projection.version, 'dims': projection.dims}))
+            else:
+                self._conn.execute("DELETE FROM meta WHERE key = 'projection'")
+            self._conn.commit()
+
+            old_files = {
+                self._matrix_file(self._generation),
+                self._codes_file(self._generation, self._stored_as),
+                self._centroids_file(self._generation)
+            }
+            if self._projection is not None and self._projection is not projection:
+                old_files.add(self._projection_file(self._projection.version))
+            removed = self._n_rows - len(live)
+            self._vectors = vectors
+            self._codes = codes
+            self._ivf = ivf
+            self._projection = projection
+            self._projection_seq = projection_seq
+            self._stored_as = self.storage
+            self._generation = generation
+            self._capacity = capacity
+            self._ids = [self._ids[row] for row in live]
+            self._row_of = {vector_id: row for row, vector_id in enumerate(self._ids)}
+            alive = np.zeros(capacity, dtype=bool)
+            alive[:len(live)] = True
+            media_ids = np.full(capacity, -1, dtype=np.int64)
+            media_ids[:len(live)] = self._media_ids[live]
+            self._alive = alive
+            self._media_ids = media_ids
+            self._n_rows = len(live)
+            for old_file in old_files:
+                if not os.path.exists(old_file):
+                    continue
+                try:
+                    os.remove(old_file)
+                except OSError as e:
+                    # 正在进行的查询仍映射着旧文件时（Windows）无法删除，下次启动时清理
+                    log.warning(f"无法删除旧的向量文件 {old_file}: {e}")
+            log.info(f"NumPy 向量索引压缩完成，移除 {removed} 个墓碑，剩余 {len(live)} 条向量")
+
+    def query(self, query_embedding: np.ndarray, k: int, where: MediaFilter = None, media_file_ids: np.ndarray = None) -> List[Tuple[str, float, dict]]:
+        """
+        查询最近的 k 个向量，返回按余弦距离升序排列的 (id, 距离, 元数据)；未使用 IVF 时为精确搜索
+        :param media_file_ids: 只返回这些媒体文件的向量
+        """
+        if where is not None:
+            raise ValueError("NumPy 向量存储不支持元数据过滤，请使用 media_file_ids")
+        query = self._normalize(query_embedding)[0]
+        while True:
+            with self._lock:
+                if self._vectors is None or k <= 0:
+                    return []
+                generation = self._generation
+                vectors, codes, alive, n_rows = self._vectors, self._codes, self._alive, self._n_rows
+                stored_as, scale, ivf, projection = self._stored_as, self._scale, self._ivf, self._projection
+                candidates = k * self.rerank_factor if codes is not None else k
+                if media_file_ids is not None:
+                    alive = alive[:n_rows] & np.isin(self._media_ids[:n_rows], media_file_ids)
+                    subset = np.flatnonzero(alive)
+                    if len(subset) == 0:
+                        return []
+                if media_file_ids is not None and (len(subset) <= self.block_rows or (ivf is None and len(subset) * 2 <= n_rows)):
+                    # 匹配的行较少时只读取这些行精确扫描
+                    ranges, extra_rows = [], subset
+                elif ivf is not None:
+                    if media_file_ids is not None:
+                        # 按匹配比例多探测一些列表，使探测到的行中匹配的行仍足够多
+                        candidates = int(candidates * len(self._row_of) / len(subset))
+                    ranges, extra_rows = ivf.probe(query, self.nprobe, candidates)
+                else:
+                    ranges, extra_rows = [(0, n_rows)], None
+            if codes is None:
+                rows, scores = self._top_k(vectors, alive, ranges, extra_rows, query, k)
+            else:
+                # 先在压缩或投影后的搜索矩阵上取出较多候选，再用原始向量重排
+                weights = projection.project_query(query) if projection is not None else query
+                if stored_as == 'int8':
+                    weights = weights * scale
+                rows, _ = self._top_k(codes, alive, ranges, extra_rows, weights, k * self.rerank_factor)
+                rows = np.sort(rows)
+                scores = np.asarray(vectors[rows] @ query) if len(rows) else np.empty(0, dtype=np.float32)
+                order = np.argsort(-scores, kind='stable')[:k]
+                rows, scores = rows[order], scores[order]
+            with self._lock:
+                # 查询期间发生压缩时行号已变化，重新查询
+                if generation != self._generation:
+                    continue
+                metadatas = self._load_metadatas(rows.tolist())
+                return [
+                    (self._ids[row], 1.0 - float(score), metadatas[row])
+                    for row, score in zip(rows.tolist(), scores)
+                    if row in metadatas
+                ]
+
+    def refit_projection(self) -> None:
+        """重新拟合 PCA 投影并原地重新生成搜索矩阵"""
+        if self.projection_dims <= 0:
+            raise ValueError("未配置 PCA 投影维度 projection_dims")
+        with self._lock:
+            if len(self._row_of) < _PCA_MIN_FIT_ROWS:
+                raise ValueError(f"向量数不足 {_PCA_MIN_FIT_ROWS}，无法拟合 PCA 投影")
+            self.compact(refit_projection=True)
+
+    def _iter_blocks(self, matrix: np.ndarray, ranges: List[Tuple[int, int]], extra_rows: np.ndarray):
+        """按块返回 (矩阵块, 行号)，连续的行范围直接切片，零散的行按块读取"""
+        for start, end in ranges:
+            for block_start in range(start, end, self.block_rows):
+                block_end = min(end, block_start + self.block_rows)
+                yield matrix[block_start:block_end], np.arange(block_start, block_end)
+        if extra_rows is not None:
+            for start in range(0, len(extra_rows), self.block_rows):
+                rows = extra_rows[start:start + self.block_rows]
+                yield matrix[rows], rows
+
+    def _top_k(self, matrix: np.ndarray, alive: np.ndarray, ranges: List[Tuple[int, int]], extra_rows: np.ndarray,
+               weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        分块计算内积并保留得分最高的 k 行
+        压缩矩阵按块转换为 float32 后计算，int8 的偏移项对所有行相同，不影响排序，因此省略。
+        """
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for block, rows in self._iter_blocks(matrix, ranges, extra_rows):
+            scores = np.asarray(block, dtype=np.float32) @ weights
+            scores[~alive[rows]] = -np.inf
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, rows[top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_scores) > k:
+                top = np.argpartition(best_scores, -k)[-k:]
+                best_rows, best_scores = best_rows[top], best_scores[top]
+
+        order = np.argsort(-best_scores, kind='stable')
+        order = order[np.isfinite(best_scores[order])]
+        return best_rows[order], best_scores[order]
@@ -0,0 +1,64 @@
+import logging
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+class PcaProjection:
+    """
+    PCA 线性投影，把特征向量降到较低维度用于搜索
+    存储 y = (x - mean) @ components.T，查询只投影不中心化：q · x = q · mean + q · (x - mean)，
+    第一项对所有行相同，因此 y · (components @ q) 的排序与降维后的内积排序一致。
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, version: int, fitted_rows: int):
+        """
+        :param mean: 拟合样本的均值 [D]
+        :param components: 主成分 [dims, D]，按方差从大到小排列
+        :param version: 投影版本号，每次拟合递增，索引文件与投影版本一一对应
+        :param fitted_rows: 拟合时的有效向量数
+        """
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.version = version
+        self.fitted_rows = fitted_rows
+
+    @property
+    def dims(self) -> int:
+        return len(self.components)
+
+    @staticmethod
+    def fit(matrix: np.ndarray, live: np.ndarray, dims: int, sample_size: int, block_rows: int, version: int) -> 'PcaProjection':
+        """在有效行的随机样本上拟合 PCA"""
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, min(len(live), max(sample_size, dims)), replace=False))
+        dim = matrix.shape[1]
+        total = np.zeros(dim, dtype=np.float64)
+        gram = np.zeros((dim, dim), dtype=np.float64)
+        for start in range(0, len(sample), block_rows):
+            block = np.asarray(matrix[sample[start:start + block_rows]], dtype=np.float64)
+            total += block.sum(axis=0)
+            gram += block.T @ block
+        mean = total / len(sample)
+        covariance = gram / len(sample) - np.outer(mean, mean)
+        values, vectors = np.linalg.eigh(covariance)
+        order = np.argsort(values)[::-1][:dims]
+        explained = values[order].sum() / max(values.sum(), 1e-12)
+        log.info(f"PCA 投影 v{version} 拟合完成，{dim} 维 → {dims} 维，样本 {len(sample)} 条，保留方差 {explained:.1%}")
+        return PcaProjection(mean, vectors[:, order].T, version, len(live))
+
+    def project(self, embeddings: np.ndarray) -> np.ndarray:
+        """投影存储的向量"""
+        return (np.asarray(embeddings, dtype=np.float32) - self.mean) @ self.components.T
+
+    def project_query(self, query: np.ndarray) -> np.ndarray:
+        """投影查询向量"""
+        return self.components @ query
+
+    def save(self, file: str) -> None:
+        with open(file, 'wb') as f:
+            np.savez(f, mean=self.mean, components=self.components, version=self.version, fitted_rows=self.fitted_rows)
+
+    @staticmethod
+    def load(file: str) -> 'PcaProjection':
+        with np.load(file) as data:
+            return PcaProjection(data['mean'], data['components'], int(data['version']), int(data['fitted_rows']))
@@ -1,10 +1,120 @@
+import atexit
+import concurrent.futures
 import logging
+import pathlib
+import queue
 import sqlite3
-from time import sleep
-from src.config import DB_PATH
+import threading
+import time
+from typing import List
+from src.config import DB_PATH, DB_WRITE_BATCH_ROWS, DB_WRITE_FLUSH_INTERVAL
 
 log = logging.getLogger(__name__)
 
+def _connect(database: str, uri: bool = False) -> sqlite3.Connection:
+    """创建数据库连接"""
+    conn = sqlite3.connect(
+        database,
+        timeout=30,
+        check_same_thread=False,
+        uri=uri
+    )
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
+
+class SQLiteWriter:
+    """单线程写入，把多次写操作合并为批量事务并使用 executemany"""
+
+    def __init__(self, db_path: str, batch_rows: int = DB_WRITE_BATCH_ROWS, flush_interval: float = DB_WRITE_FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.batch_rows = max(1, batch_rows)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='SQLiteWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, rows: List[tuple]) -> concurrent.futures.Future:
+        """提交写操作，不等待提交完成，返回的 Future 在提交成功或失败后完成"""
+        future = concurrent.futures.Future()
+        if rows:
+            self._queue.put((sql, rows, future))
+        else:
+            future.set_result(None)
+        return future
+
+    def flush(self) -> None:
+        """等待此前提交的写操作全部提交到数据库"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def _run(self) -> None:
+        conn = _connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        pending = []
+        pending_rows = 0
+        waiters = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item is not None:
+                pending.append(item)
+                pending_rows += len(item[1])
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            # 达到批量大小、超时或有等待者时提交
+            if pending and (item is None or waiters or pending_rows >= self.batch_rows):
+                self._commit(conn, pending)
+                pending = []
+                pending_rows = 0
+                deadline = None
+
+            if waiters and not pending:
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def _commit(self, conn: sqlite3.Connection, pending: List[tuple]) -> None:
+        """在一个事务中执行所有写操作，相邻的相同语句合并执行，完成后设置各写操作的 Future"""
+        groups = []
+        for sql, rows, _ in pending:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].extend(rows)
+            else:
+                groups.append((sql, list(rows)))
+
+        try:
+            for sql, rows in groups:
+                conn.executemany(sql, rows)
+            conn.commit()
+            for _, _, future in pending:
+                future.set_result(None)
+            return
+        except Exception as e:
+            conn.rollback()
+            log.warning(f"批量写入失败，逐条重试: {e}")
+
+        # 逐个写操作重试，找出出错的语句，失败的写操作把异常交给调用方
+        for sql, rows, future in pending:
+            try:
+                conn.executemany(sql, rows)
+                conn.commit()
+                future.set_result(None)
+            except Exception as e:
+                conn.rollback()
+                log.exception(f"写入数据库失败 sql: {sql}")
+                future.set_exception(e)
+
 class SQLiteDB:
     _instance = None
 
@@ -19,17 +129,18 @@ class SQLiteDB:
         """初始化数据库"""
         try:
             # 创建数据库连接
-            self.conn = sqlite3.connect(
-                DB_PATH,
-                timeout=30,
-                check_same_thread=False
-            )
+            self.conn = _connect(DB_PATH)
             self.conn.execute('PRAGMA journal_mode=WAL')
             self.conn.execute('PRAGMA synchronous=NORMAL')
-            self.conn.execute('PRAGMA busy_timeout=30000')
             # 测试数据库连接
             self.conn.execute("SELECT 1")
             log.info("数据库连接测试成功")
+
+            # 写入线程与每个线程独立的只读连接
+            self.writer = SQLiteWriter(DB_PATH)
+            self._read_uri = pathlib.Path(DB_PATH).absolute().as_uri() + '?mode=ro'
+            self._local = threading.local()
+            atexit.register(self.writer.flush)
         except Exception as e:
             log.exception(f"Error initializing database:")
             raise
@@ -40,19 +151,28 @@ class SQLiteDB:
 
     def get_cursor(self):
         """获取数据库游标"""
-        max_retries = 3
-        retry_delay = 1  # 秒
+        return self.get_connection().cursor()
 
-        for attempt in range(max_retries):
-            try:
-                cursor = self.get_connection().cursor()
-                # 测试连接
-                cursor.execute("SELECT 1")
-                return cursor
-            except sqlite3.OperationalError as e:
-                if "database is locked" in str(e) and attempt < max_retries - 1:
-                    log.warning(f"Database locked, retrying in {retry_delay} seconds...")
-                    sleep(retry_delay)
-                    retry_delay *= 2  # 指数回退
-                    continue
-                raise
+    def get_read_cursor(self):
+        """获取当前线程的只读游标，读取不会被写入阻塞"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = _connect(self._read_uri, uri=True)
+            self._local.conn = conn
+        return conn.cursor()
+
+    def write(self, sql: str, rows: List[tuple], wait: bool = False) -> concurrent.futures.Future:
+        """
+        通过写入线程执行写操作
+        :param rows: executemany 的参数列表
+        :param wait: 是否等待写入提交完成，提交失败时抛出写入时的异常
+        """
+        future = self.writer.submit(sql, rows)
+        if wait:
+            self.writer.flush()
+            future.result()
+        return future
+
+    def flush(self) -> None:
+        """等待所有已提交的写操作完成"""
+        self.writer.flush()
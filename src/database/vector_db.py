@@ -1,10 +1,29 @@
 import logging
-import chromadb
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
 from typing import List
-from src.config import VECTOR_DB_PATH, MAX_SEARCH_RESULT_SIZE
+from src.config import (VECTOR_DB_BACKEND, VECTOR_DB_PATH, VECTOR_PROJECTION_DIMS, MAX_SEARCH_RESULT_SIZE, SEARCH_INITIAL_K,
+                        SEARCH_FILTER_EXACT_MAX)
+from .media_filter import MediaFilter
 
 log = logging.getLogger(__name__)
 
+# 最多保留的查询游标数
+_MAX_CURSORS = 16
+# 写入向量元数据、用于搜索过滤的媒体属性
+_FILTER_FIELDS = ('captured_at', 'width', 'height', 'folder')
+
+def _filter_fields(media_info: dict) -> dict:
+    """取出有值的过滤属性，Chroma 的元数据不能为 None"""
+    if not media_info:
+        return {}
+    return {key: media_info[key] for key in _FILTER_FIELDS if media_info.get(key) is not None}
+
+def _thumbnail_field(thumbnail: str) -> dict:
+    return {'thumbnail': thumbnail} if thumbnail else {}
+
 class VectorDB:
     _instance = None
 
@@ -16,94 +35,245 @@ class VectorDB:
         return cls._instance
 
     def _init_db(self) -> None:
-        """初始化向量数据库"""
-        self.client = chromadb.PersistentClient(path = VECTOR_DB_PATH)
-        # 支持的 hnsw:space 选项包括：
-        # "cosine"：余弦相似度（默认）
-        # "l2"：欧几里得距离
-        # "ip"：内积（Inner Product）
-        self.collection = self.client.get_or_create_collection(name='media_search', metadata={"hnsw:space": "cosine"})
-
-    def add_feature_vector_media_file(self, id: int, file_path: str, file_type: str, feature_list: List[float]) -> None:
-        """向集合中添加多个特征向量"""
-        self._add_feature_vector(
-            str(id),
-            feature_list,
-            {
-                'id': id,
-                'file_path': file_path,
-                'file_type': file_type
-            }
-        )
-    
+        """初始化向量数据库，按配置选择存储后端"""
+        if VECTOR_DB_BACKEND == 'numpy':
+            from .numpy_store import NumpyVectorStore
+            self.store = NumpyVectorStore()
+            self._migrate_from_chroma()
+        else:
+            from .chroma_store import ChromaVectorStore
+            self.store = ChromaVectorStore()
+            if VECTOR_PROJECTION_DIMS > 0:
+                log.warning("PCA 投影需要原始向量重排，仅 numpy 后端支持，Chroma 后端忽略 projection_dims")
+        log.info(f"向量数据库后端: {type(self.store).__name__}")
+        # 查询游标，集合每次写入后版本号增加，旧游标失效
+        self._cursors = OrderedDict()
+        self._cursors_lock = threading.Lock()
+        self._version = 0
+
+    def _migrate_from_chroma(self) -> None:
+        """NumPy 后端为空而 Chroma 中已有向量时，一次性导入，不需要重新索引"""
+        if self.store.count() > 0 or not os.path.isdir(VECTOR_DB_PATH):
+            return
+        try:
+            from .chroma_store import ChromaVectorStore
+            chroma = ChromaVectorStore()
+        except Exception as e:
+            log.warning(f"无法读取原有的 Chroma 向量库，跳过迁移: {e}")
+            return
+        total = 0
+        for ids, embeddings, metadatas in chroma.iter_all():
+            self.store.add(ids, embeddings, metadatas, skip_existing=False)
+            total += len(ids)
+        if total:
+            log.info(f"已从 Chroma 导入 {total} 条向量")
+
+    def add_feature_vector_media_file(self, id: int, file_path: str, file_type: str, feature_list: List[float], media_info: dict = None) -> None:
+        """向集合中添加单个媒体文件的特征向量"""
+        self.add_media_files_bulk([id], [file_path], [file_type], [feature_list], skip_existing=True, media_infos=[media_info])
+
     def add_feature_vector_video_frame(self, id: int, media_file_id: int, frame_path: str, file_path: str, timestamp: float, feature_list: List[float]) -> None:
-        """向集合中添加多个特征向量"""
-        self._add_feature_vector(
-            str(media_file_id) + '-' + str(id),
-            feature_list,
-            {
-                'id': media_file_id,
-                'video_frame_id': id,
-                'file_path': file_path,
-                'file_type': 'video_frame',
-                'frame_path': frame_path,
-                'timestamp': timestamp
-            }
+        """向集合中添加单个视频帧的特征向量"""
+        self.add_video_frames_bulk([id], [media_file_id], [frame_path], [file_path], [timestamp], [feature_list], skip_existing=True)
+
+    def add_media_files_bulk(self, ids: List[int], file_paths: List[str], file_types: List[str], embeddings, skip_existing: bool = False,
+                             media_infos: List[dict] = None, thumbnails: List[str] = None) -> None:
+        """
+        批量添加媒体文件特征向量
+        :param embeddings: 特征矩阵 [N, D]
+        :param skip_existing: 为 True 时跳过已存在的id，否则直接覆盖写入
+        :param media_infos: 每个文件用于搜索过滤的 {captured_at, width, height, folder}
+        :param thumbnails: 每个文件的缩略图路径
+        """
+        if media_infos is None:
+            media_infos = [None] * len(ids)
+        if thumbnails is None:
+            thumbnails = [None] * len(ids)
+        self._add_feature_vectors(
+            [str(id) for id in ids],
+            embeddings,
+            [
+                {
+                    'id': id,
+                    'file_path': file_path,
+                    'file_type': file_type,
+                    **_filter_fields(media_info),
+                    **_thumbnail_field(thumbnail)
+                }
+                for id, file_path, file_type, media_info, thumbnail in zip(ids, file_paths, file_types, media_infos, thumbnails)
+            ],
+            skip_existing
         )
 
-    def _add_feature_vector(self, id: str, embedding: List[float], metadata: dict) -> None:
-        """向集合中添加单个特征向量"""
-        item = self.collection.get(ids=[id])
-        if item['ids'] == []:
-            self.collection.add(
-                ids=[id],
-                embeddings=[embedding],
-                metadatas=[metadata]
-            )
+    def add_video_frames_bulk(self, ids: List[int], media_file_ids: List[int], frame_paths: List[str], file_paths: List[str], timestamps: List[float], embeddings, skip_existing: bool = False,
+                              media_info: dict = None, thumbnails: List[str] = None) -> None:
+        """
+        批量添加视频帧特征向量
+        :param embeddings: 特征矩阵 [N, D]
+        :param skip_existing: 为 True 时跳过已存在的id，否则直接覆盖写入
+        :param media_info: 所属视频用于搜索过滤的 {captured_at, width, height, folder}
+        :param thumbnails: 每个帧的缩略图路径
+        """
+        fields = _filter_fields(media_info)
+        if thumbnails is None:
+            thumbnails = [None] * len(ids)
+        self._add_feature_vectors(
+            [str(media_file_id) + '-' + str(id) for id, media_file_id in zip(ids, media_file_ids)],
+            embeddings,
+            [
+                {
+                    'id': media_file_id,
+                    'video_frame_id': id,
+                    'file_path': file_path,
+                    'file_type': 'video_frame',
+                    'frame_path': frame_path,
+                    'timestamp': timestamp,
+                    **fields,
+                    **_thumbnail_field(thumbnail)
+                }
+                for id, media_file_id, frame_path, file_path, timestamp, thumbnail in zip(ids, media_file_ids, frame_paths, file_paths, timestamps, thumbnails)
+            ],
+            skip_existing
+        )
+
+    def _add_feature_vectors(self, ids: List[str], embeddings, metadatas: List[dict], skip_existing: bool) -> None:
+        """批量写入特征向量"""
+        self._version += 1
+        self.store.add(ids, np.asarray(embeddings, dtype=np.float32), metadatas, skip_existing)
 
     def delete_feature_vector_by_ids(self, ids: List[str]) -> None:
         """删除集合中的特征向量"""
-        self.collection.delete(ids=ids)
+        self._version += 1
+        self.store.delete(ids)
+
+    def delete_feature_vectors_by_media_file_ids(self, media_file_ids: List[int]) -> List[str]:
+        """删除媒体文件及其所有视频帧的特征向量，返回不再被任何特征向量引用的缩略图路径"""
+        self._version += 1
+        thumbnails = self.store.thumbnails_of_media_files(media_file_ids)
+        self.store.delete_by_media_file_ids(media_file_ids)
+        if not thumbnails:
+            return []
+        return sorted(thumbnails - self.store.thumbnails_in_use(sorted(thumbnails)))
 
-    def query(self, query_embeddings: List[float], page_size: int = 20, page_number: int = 1, n_results: int = 200) -> List[dict]:
+    def update_file_paths(self, file_paths: dict) -> None:
         """
-        查询相似向量并返回格式化结果
+        更新特征向量元数据中的文件路径，媒体文件与其视频帧一起更新
+        :param file_paths: {media_file_id: 新的文件路径}
+        """
+        self._version += 1
+        self.store.update_metadata({id: {'file_path': file_path} for id, file_path in file_paths.items()})
+
+    def update_media_info(self, media_infos: dict) -> None:
+        """
+        更新特征向量元数据中用于搜索过滤的属性，媒体文件与其视频帧一起更新
+        :param media_infos: {media_file_id: {captured_at, width, height, folder}}
+        """
+        self._version += 1
+        self.store.update_metadata({id: _filter_fields(media_info) for id, media_info in media_infos.items()})
+
+    def refit_projection(self) -> None:
+        """重新拟合 PCA 投影并原地重新投影索引"""
+        if not hasattr(self.store, 'refit_projection'):
+            raise RuntimeError("PCA 投影仅支持 numpy 向量后端")
+        self._version += 1
+        self.store.refit_projection()
+
+    def query(self, query_embeddings: np.ndarray, page_size: int = 20, page_number: int = 1, media_filter: MediaFilter = None) -> List[dict]:
+        """
+        查询相似向量并返回指定页的格式化结果
+        同一查询向量的游标会被保留，翻页时复用已取回的结果，不够时才扩大近邻数量重新查询
         :param page_size: 每页结果数
         :param page_number: 当前页码（从 1 开始）
-        :param n_results: 总共需要的结果数
+        :param media_filter: 过滤条件，只返回匹配的媒体文件
         """
-        # offset = (page_number - 1) * page_size
-        # limit = page_size
-
+        offset = (max(1, page_number) - 1) * page_size
+        limit = offset + page_size
         if MAX_SEARCH_RESULT_SIZE > 0:
-            n_results = MAX_SEARCH_RESULT_SIZE
-
-        result = self.collection.query(
-            query_embeddings=[query_embeddings],
-            n_results=n_results,
-            include=[
-                'distances',
-                'metadatas'
-            ]
-        )
+            limit = min(limit, MAX_SEARCH_RESULT_SIZE)
+        if offset >= limit:
+            return []
+
+        if media_filter is not None and media_filter.is_empty():
+            media_filter = None
+        cursor = self._get_cursor(query_embeddings, media_filter)
+        with cursor.lock:
+            while len(cursor.results) < limit and not cursor.exhausted:
+                self._fetch_more(cursor, limit)
+            return cursor.results[offset:limit]
+
+    def _get_cursor(self, query_embeddings: np.ndarray, media_filter: MediaFilter = None) -> 'QueryCursor':
+        """获取查询向量与过滤条件对应的游标，集合有写入后旧游标失效"""
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        key = (query_embeddings.tobytes(), media_filter.key() if media_filter is not None else None)
+        with self._cursors_lock:
+            cursor = self._cursors.get(key)
+            if cursor is None or cursor.version != self._version:
+                cursor = QueryCursor(query_embeddings, self._version, media_filter)
+                self._cursors[key] = cursor
+            self._cursors.move_to_end(key)
+            while len(self._cursors) > _MAX_CURSORS:
+                self._cursors.popitem(last=False)
+            return cursor
 
-        # 将QueryResult转换为包含元数据和相似度得分的字典列表
-        formatted_results = []
-        for i in range(len(result['ids'][0])):
-            distance = result['distances'][0][i]
-            metadata = result['metadatas'][0][i]
-            # 将距离转换为相似度得分 确保相似度得分在合理范围内
-            score = (distance + 1) / 2
- 
-            log.debug(f"相似度得分 Score: {score}; Distance: {distance};")
-
-            formatted_results.append({
-                'id': result['ids'][0][i],
+    def _plan_filter(self, cursor: 'QueryCursor') -> None:
+        """
+        选择过滤查询的方式：匹配的文件不超过 SEARCH_FILTER_EXACT_MAX 个时，只对这些文件的向量做精确扫描；
+        否则把条件下推到向量查询，不支持元数据过滤的存储使用匹配的媒体文件id过滤
+        """
+        limit = SEARCH_FILTER_EXACT_MAX if self.store.supports_where else None
+        media_file_ids = cursor.media_filter.matching_ids(None if limit is None else limit + 1)
+        if limit is None or len(media_file_ids) <= limit:
+            cursor.media_file_ids = media_file_ids
+        else:
+            cursor.where = cursor.media_filter
+        log.debug(f"过滤条件 {cursor.media_filter} "
+                  + (f"匹配 {len(media_file_ids)} 个文件" if cursor.where is None else f"匹配超过 {limit} 个文件，下推到向量查询"))
+
+    def _fetch_more(self, cursor: 'QueryCursor', needed: int) -> None:
+        """按倍数扩大近邻数量重新查询，只追加之前没有取回的结果"""
+        if cursor.media_filter is not None and cursor.k == 0:
+            self._plan_filter(cursor)
+            if cursor.media_file_ids is not None and len(cursor.media_file_ids) == 0:
+                cursor.exhausted = True
+                return
+        total = self.store.count()
+        k = min(total, max(needed, SEARCH_INITIAL_K, cursor.k * 2))
+        if k <= cursor.k:
+            cursor.exhausted = True
+            return
+
+        hits = self.store.query(cursor.query_embeddings, k, where=cursor.where, media_file_ids=cursor.media_file_ids)
+        cursor.k = k
+
+        # 转换为包含元数据和相似度得分的字典列表，结果已按距离升序排列，即得分从高到低
+        for id, distance, metadata in hits:
+            if id in cursor.seen:
+                continue
+            # 余弦距离 [0, 2] 转换为相似度得分 [0, 1]，距离越小得分越高
+            score = 1 - distance / 2
+            cursor.seen.add(id)
+            cursor.results.append({
+                'id': id,
                 'score': score,
                 'metadata': metadata
             })
-        
-         # 根据 score 值排序
-        formatted_results = sorted(formatted_results, key=lambda x: x['score'], reverse=True)
 
-        return formatted_results
+        if len(hits) < k or k >= total:
+            cursor.exhausted = True
+        log.debug(f"查询近邻 k={k} 已取回 {len(cursor.results)} 条结果")
+
+
+class QueryCursor:
+    """一次查询的结果游标，保存已取回的结果和当前的近邻数量"""
+    def __init__(self, query_embeddings: np.ndarray, version: int, media_filter: MediaFilter = None):
+        self.query_embeddings = query_embeddings
+        self.version = version
+        self.media_filter = media_filter
+        # 首次查询时确定的过滤方式：下推的元数据条件，或只扫描这些媒体文件的向量
+        self.where = None
+        self.media_file_ids = None
+        self.k = 0
+        self.results = []
+        self.seen = set()
+        self.exhausted = False
+        self.lock = threading.Lock()
@@ -1,14 +1,16 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QSystemTrayIcon, QMenu,
-                           QPushButton, QLineEdit, QLabel, QFileDialog, QScrollArea, QMessageBox, QProgressDialog,
-                           QDialog, QListWidget, QListWidgetItem)
-from PyQt6.QtCore import Qt
+                           QPushButton, QLineEdit, QLabel, QFileDialog, QMessageBox, QProgressDialog,
+                           QDialog, QListWidget, QListWidgetItem, QComboBox, QCheckBox, QDateEdit, QSpinBox)
+from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QIcon, QGuiApplication
 from src.core.indexer import Indexer
 from src.core.feature_extractor import FeatureExtractor
-from src.config import CURRENT_OS, WINDOW_TITLE, WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT, IMAGE_EXTENSIONS
-from src.database.models import FilePathDao, MediaFileDao
-from src.thread.workers import IndexingWorker, RefreshWorker, SearchWorker
-from src.gui.label import ImageLabel
+from src.config import CURRENT_OS, WINDOW_TITLE, WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT, IMAGE_EXTENSIONS, WATCH_ENABLED
+from src.database.models import FilePathDao
+from src.database.media_filter import MediaFilter
+from src.thread.workers import IndexingWorker, RefreshWorker, SearchWorker, WatchWorker
+from src.gui.result_view import ResultListModel, ResultListView
+from datetime import datetime
 import os
 import logging
 
@@ -43,6 +45,11 @@ class MainWindow(QMainWindow):
             
             # 初始化进度对话框
             self.progress_dialog = None
+
+            # 实时监听已索引文件夹
+            self.watch_worker = None
+            if WATCH_ENABLED and self.indexed_folders:
+                self.watch_btn.setChecked(True)
         except Exception as e:
             log.exception("Error in MainWindow initialization: ")
             QMessageBox.critical(
@@ -129,6 +136,9 @@ class MainWindow(QMainWindow):
         search_layout.addWidget(self.image_search_btn)
         
         main_layout.addLayout(search_layout)
+
+        # 过滤条件区域
+        self.create_filter_area(main_layout)
         
         # 工具栏区域
         toolbar_layout = QHBoxLayout()
@@ -145,6 +155,13 @@ class MainWindow(QMainWindow):
         self.refresh_btn.clicked.connect(self.refresh_indexes)
         self.refresh_btn.setEnabled(False) # 初始状态禁用
         toolbar_layout.addWidget(self.refresh_btn)
+
+        # 实时监听按钮
+        self.watch_btn = QPushButton("实时监听")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setToolTip("监听已索引文件夹，新增、修改、移动和删除的文件自动更新索引")
+        self.watch_btn.toggled.connect(self.toggle_watch)
+        toolbar_layout.addWidget(self.watch_btn)
         
         # 添加弹性空间
         toolbar_layout.addStretch()
@@ -157,6 +174,78 @@ class MainWindow(QMainWindow):
         # 状态栏
         self._show_status_bar_message("就绪")
 
+    def create_filter_area(self, main_layout):
+        """创建搜索过滤条件：所属文件夹、文件类型、拍摄时间与最小尺寸"""
+        filter_layout = QHBoxLayout()
+
+        filter_layout.addWidget(QLabel("文件夹:"))
+        self.folder_filter = QComboBox()
+        self.folder_filter.addItem("全部", None)
+        self.folder_filter.setMinimumWidth(200)
+        filter_layout.addWidget(self.folder_filter)
+
+        filter_layout.addWidget(QLabel("类型:"))
+        self.type_filter = QComboBox()
+        self.type_filter.addItem("全部", None)
+        self.type_filter.addItem("图片", 'image')
+        self.type_filter.addItem("视频", 'video')
+        filter_layout.addWidget(self.type_filter)
+
+        # 拍摄时间，勾选后按日期范围过滤
+        self.date_filter = QCheckBox("拍摄时间:")
+        filter_layout.addWidget(self.date_filter)
+        self.date_from = QDateEdit(QDate.currentDate().addYears(-1))
+        self.date_to = QDateEdit(QDate.currentDate())
+        for date_edit in (self.date_from, self.date_to):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("yyyy-MM-dd")
+            date_edit.setEnabled(False)
+            self.date_filter.toggled.connect(date_edit.setEnabled)
+        filter_layout.addWidget(self.date_from)
+        filter_layout.addWidget(QLabel("至"))
+        filter_layout.addWidget(self.date_to)
+
+        # 最小宽度与高度，0 表示不限
+        filter_layout.addWidget(QLabel("最小尺寸:"))
+        self.min_width_filter = QSpinBox()
+        self.min_height_filter = QSpinBox()
+        for spin_box in (self.min_width_filter, self.min_height_filter):
+            spin_box.setRange(0, 100000)
+            spin_box.setSingleStep(100)
+            spin_box.setSpecialValueText("不限")
+        filter_layout.addWidget(self.min_width_filter)
+        filter_layout.addWidget(QLabel("×"))
+        filter_layout.addWidget(self.min_height_filter)
+
+        filter_layout.addStretch()
+        main_layout.addLayout(filter_layout)
+
+    def _update_folder_filter(self):
+        """用已索引的文件夹更新文件夹过滤选项，保留当前的选择"""
+        current = self.folder_filter.currentData()
+        self.folder_filter.clear()
+        self.folder_filter.addItem("全部", None)
+        for folder in sorted(self.indexed_folders):
+            self.folder_filter.addItem(folder, folder)
+        if current is not None:
+            self.folder_filter.setCurrentIndex(max(0, self.folder_filter.findData(current)))
+
+    def _current_media_filter(self):
+        """界面上选择的过滤条件，没有选择任何条件时返回 None"""
+        captured_after = captured_before = None
+        if self.date_filter.isChecked():
+            captured_after = datetime.combine(self.date_from.date().toPyDate(), datetime.min.time())
+            captured_before = datetime.combine(self.date_to.date().toPyDate(), datetime.max.time())
+        media_filter = MediaFilter(
+            folder=self.folder_filter.currentData(),
+            file_type=self.type_filter.currentData(),
+            captured_after=captured_after,
+            captured_before=captured_before,
+            min_width=self.min_width_filter.value() or None,
+            min_height=self.min_height_filter.value() or None
+        )
+        return None if media_filter.is_empty() else media_filter
+
     def show_indexed_folders(self):
         """显示当前索引的文件夹"""
         self.load_indexed_folders()
@@ -212,46 +301,51 @@ class MainWindow(QMainWindow):
     def refresh_folder(self, folder):
         """指定文件夹刷新"""
         log.info(f"刷新文件夹: {folder}")
-        reply = QMessageBox.question(
-            self,
-            '提示',
-            f'是否要刷新索引文件夹？\n这将重新扫描文件夹中的变化。',
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-        if reply == QMessageBox.StandardButton.Yes:
-            self.indexed_folders = [folder]
-            self.refresh_indexe_folders()
+        full_scan = self._ask_refresh_mode(f'是否要刷新索引文件夹？\n这将重新扫描文件夹中的变化。')
+        if full_scan is not None:
+            self.refresh_indexe_folders(full_scan, [folder])
+
+    def _ask_refresh_mode(self, text: str):
+        """
+        询问刷新方式
+        :return: None 取消；False 快速刷新，跳过修改时间未变化的目录；True 完整校验所有文件
+        """
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Question)
+        box.setWindowTitle('提示')
+        box.setText(text)
+        box.setInformativeText('快速刷新会跳过没有变化的目录；完整校验会检查每个文件，可发现原地修改的文件。')
+        quick_btn = box.addButton('刷新', QMessageBox.ButtonRole.YesRole)
+        full_btn = box.addButton('完整校验', QMessageBox.ButtonRole.AcceptRole)
+        box.addButton('取消', QMessageBox.ButtonRole.RejectRole)
+        box.setDefaultButton(quick_btn)
+        box.exec()
+        if box.clickedButton() == quick_btn:
+            return False
+        if box.clickedButton() == full_btn:
+            return True
+        return None
 
 
     def create_results_area(self):
-        """创建优化的结果显示区域"""
-        # 创建滚动区域
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
-        
-        # 创建结果容器
-        self.results_widget = QWidget()
-        self.results_layout = QVBoxLayout(self.results_widget)
-        self.results_layout.setSpacing(10)
-        self.results_layout.setContentsMargins(10, 10, 10, 10)
-        self.results_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        
-        # 设置最小宽度以确保内容填充
-        self.results_widget.setMinimumWidth(self.scroll_area.viewport().width())
-        
-        self.scroll_area.setWidget(self.results_widget)
-        self.centralWidget().layout().addWidget(self.scroll_area)
-        
-        # 连接大小变化信号
-        self.scroll_area.viewport().installEventFilter(self)
-
-    def eventFilter(self, obj, event):
-        """处理事件过滤"""
-        if obj == self.scroll_area.viewport() and event.type() == event.Type.Resize:
-            self.results_widget.setMinimumWidth(self.scroll_area.viewport().width())
-        return super().eventFilter(obj, event)
+        """创建结果列表，只绘制可见的结果，不为每个结果创建控件"""
+        self.result_model = ResultListModel(self)
+        self.result_view = ResultListView()
+        self.result_view.setModel(self.result_model)
+        self.result_view.delegate.play_requested.connect(self.play_video_at_timestamp)
+        self.result_view.delegate.open_folder_requested.connect(self._open_folder)
+        self.result_view.delegate.open_file_requested.connect(self._open_file)
+        self.centralWidget().layout().addWidget(self.result_view)
+
+        # 滚动到底部时加载下一页
+        self.items_per_page = 20
+        self.current_page = 0
+        self.has_more_results = False
+        self.more_results_worker = None
+        # 被新的搜索替换、仍在运行的翻页线程，线程结束前保留引用
+        self._stale_workers = set()
+        self.search_filter = None
+        self.result_view.verticalScrollBar().valueChanged.connect(self.check_scroll_bottom)
 
     def load_indexed_folders(self):
         """从数据库加载已索引的文件夹"""
@@ -260,26 +354,23 @@ class MainWindow(QMainWindow):
 
         for file_path in folders:
             self.indexed_folders.add(file_path)
+        self._update_folder_filter()
         
         # 如果有已索引的文件夹，启用刷新按钮
         self.refresh_btn.setEnabled(len(self.indexed_folders) > 0)
 
     def refresh_indexes(self):
         """刷新所有已索引文件夹"""
-        reply = QMessageBox.question(
-            self,
-            '提示',
-            f'是否要刷新所有已索引文件夹？\n这将重新扫描所有文件夹中的变化。',
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-        if reply == QMessageBox.StandardButton.Yes:
+        full_scan = self._ask_refresh_mode(f'是否要刷新所有已索引文件夹？\n这将重新扫描所有文件夹中的变化。')
+        if full_scan is not None:
             self.load_indexed_folders()
-            self.refresh_indexe_folders()
+            self.refresh_indexe_folders(full_scan)
 
-    def refresh_indexe_folders(self):
-        """刷新所有已索引文件夹"""
+    def refresh_indexe_folders(self, full_scan: bool = False, folders: list = None):
+        """刷新指定的文件夹，未指定时刷新所有已索引文件夹"""
+        folders = list(self.indexed_folders) if folders is None else folders
         # 创建进度对话框
-        if not self.indexed_folders or len(self.indexed_folders) == 0:
+        if not folders:
             QMessageBox.information(self, "提示", "没有已索引的文件夹")
             return
         
@@ -287,7 +378,7 @@ class MainWindow(QMainWindow):
             "正在刷新索引...", 
             "取消", 
             0, 
-            len(self.indexed_folders), 
+            len(folders), 
             self
         )
         self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
@@ -296,7 +387,7 @@ class MainWindow(QMainWindow):
         self.progress_dialog.setCancelButtonText("取消")
         
         # 创建工作线程处理所有文件夹
-        self.refresh_worker = RefreshWorker(self.indexer, list(self.indexed_folders))
+        self.refresh_worker = RefreshWorker(self.indexer, folders, full_scan)
         self.refresh_worker.progress.connect(self.update_refresh_progress)
         self.refresh_worker.finished.connect(self.refresh_finished)
         self.refresh_worker.error.connect(self.indexing_error)
@@ -327,6 +418,7 @@ class MainWindow(QMainWindow):
             f"刷新完成\n"
             f"新增文件：{stats['added']}\n"
             f"更新文件：{stats['updated']}\n"
+            f"移动文件：{stats['moved']}\n"
             f"删除文件：{stats['removed']}"
         )
         QMessageBox.information(self, "完成", message)
@@ -357,21 +449,6 @@ class MainWindow(QMainWindow):
             log.exception(f"Error rebuilding search index:")
             QMessageBox.warning(self, "错误", "搜索索引重建失败，请重新运行程序")
             
-    def indexing_finished(self, stats: dict):
-        """索引完成处理"""
-        if hasattr(self, 'progress_dialog') and self.progress_dialog:
-            self.progress_dialog.close()
-        
-        # 显示统计信息
-        message = (
-            f"索引完成！\n"
-            f"处理文件：{stats['processed']}\n"
-            f"成功索引：{stats['success']}\n"
-            f"失败文件：{stats['failed']}\n"
-            f"删除文件：{stats['removed']}"
-        )
-        QMessageBox.information(self, "完成", message)
-
     def add_index_folder(self):
         """添加索引文件夹"""
         folder = QFileDialog.getExistingDirectory(self, "选择文件夹")
@@ -401,22 +478,84 @@ class MainWindow(QMainWindow):
             self.progress_dialog.show()
             self.index_worker.start()
 
-    def update_index_progress(self, current, total):
+    def update_index_progress(self, current, total, scanning=False):
         """更新进度对话框"""
         if self.progress_dialog:
-            progress = int((current / total) * 100)
-            self.progress_dialog.setLabelText(
-                f"正在索引文件... ({current}/{total})"
-            )
+            progress = int((current / total) * 100) if total > 0 else 0
+            if scanning:
+                # 扫描未完成时总数还会增加，不能到达 100% 触发自动关闭
+                progress = min(progress, 99)
+                self.progress_dialog.setLabelText(
+                    f"正在扫描并索引文件... ({current}/{total}+)"
+                )
+            else:
+                self.progress_dialog.setLabelText(
+                    f"正在索引文件... ({current}/{total})"
+                )
             self.progress_dialog.setValue(progress)
 
     def indexing_finished(self):
         """索引完成处理"""
         if self.progress_dialog:
             self.progress_dialog.close()
+
+        # 新添加的文件夹加入过滤选项
+        self.load_indexed_folders()
+
+        # 新添加的文件夹加入监听
+        if self.watch_btn.isChecked():
+            self.start_watch()
         
         QMessageBox.information(self, "完成", "索引建立完成！")
 
+    def toggle_watch(self, checked: bool):
+        """开启或关闭实时监听"""
+        if checked:
+            if FilePathDao.file_path_count() == 0:
+                QMessageBox.information(self, "提示", "没有已索引的文件夹")
+                self.watch_btn.setChecked(False)
+                return
+            self.start_watch()
+        else:
+            self.stop_watch()
+
+    def start_watch(self):
+        """监听所有已索引文件夹，已在监听时重新启动"""
+        self.stop_watch()
+        folders = FilePathDao.get_indexed_folders()
+        self.watch_worker = WatchWorker(self.indexer, folders)
+        self.watch_worker.indexed.connect(self.watch_indexed)
+        self.watch_worker.error.connect(self.watch_error)
+        self.watch_worker.start()
+        self._show_status_bar_message(f"正在监听 {len(folders)} 个文件夹", 3000)
+
+    def stop_watch(self):
+        """停止实时监听"""
+        if self.watch_worker is not None:
+            self.watch_worker.stop()
+            self.watch_worker.wait()
+            self.watch_worker = None
+
+    def watch_indexed(self, stats: dict):
+        """实时监听处理了一批变化"""
+        self._show_status_bar_message(
+            f"实时索引：新增 {stats['added']}，更新 {stats['updated']}，移动 {stats['moved']}，删除 {stats['removed']}",
+            5000
+        )
+
+    def watch_error(self, error_msg):
+        """实时监听错误处理"""
+        self.watch_worker = None
+        self.watch_btn.blockSignals(True)
+        self.watch_btn.setChecked(False)
+        self.watch_btn.blockSignals(False)
+        QMessageBox.warning(self, "错误", f"实时监听已停止：{error_msg}")
+
+    def closeEvent(self, event):
+        """关闭窗口前停止监听线程"""
+        self.stop_watch()
+        super().closeEvent(event)
+
     def indexing_error(self, error_msg):
         """索引错误处理"""
         if self.progress_dialog:
@@ -463,7 +602,11 @@ class MainWindow(QMainWindow):
             self.progress_dialog.setMinimumDuration(0)  # 立即显示
             
             # 创建搜索线程
-            self.search_worker = SearchWorker(query, 'text')
+            self.search_query = query
+            self.search_type = 'text'
+            # 过滤条件在翻页时沿用
+            self.search_filter = self._current_media_filter()
+            self.search_worker = SearchWorker(query, 'text', page_size=self.items_per_page, media_filter=self.search_filter)
             self.search_worker.finished.connect(self._search_finished)
             self.search_worker.error.connect(self._search_error)
             
@@ -511,7 +654,11 @@ class MainWindow(QMainWindow):
             self.progress_dialog.setMinimumDuration(0)  # 立即显示
             
             # 创建搜索线程
-            self.search_worker = SearchWorker(file_name, 'image')
+            self.search_query = file_name
+            self.search_type = 'image'
+            # 过滤条件在翻页时沿用
+            self.search_filter = self._current_media_filter()
+            self.search_worker = SearchWorker(file_name, 'image', page_size=self.items_per_page, media_filter=self.search_filter)
             self.search_worker.finished.connect(self._search_finished)
             self.search_worker.error.connect(self._search_error)
             
@@ -532,7 +679,10 @@ class MainWindow(QMainWindow):
         if self.progress_dialog:
             self.progress_dialog.close()
         if is_empty:
-            self._show_status_bar_message("请选择 ‘添加索引文件夹’ 添加文件到索引中")
+            if self.search_filter is not None:
+                self._show_status_bar_message("没有找到符合过滤条件的结果")
+            else:
+                self._show_status_bar_message("请选择 ‘添加索引文件夹’ 添加文件到索引中")
             return
         self.display_results(results)
 
@@ -548,165 +698,91 @@ class MainWindow(QMainWindow):
         self._show_status_bar_message("搜索失败", 5000)
 
     def display_results(self, results):
-        """优化的结果显示方法"""
+        """优化的结果显示方法，results 为第一页结果"""
         if not results or len(results) == 0:
             self._show_status_bar_message("没有找到匹配的结果")
             return
-        # 存储所有结果
-        self.all_results = results
-        self.current_page = 0
-        self.items_per_page = 20
+        self.current_page = 1
+        self.has_more_results = len(results) >= self.items_per_page
+        if self.more_results_worker is not None:
+            # 旧搜索的翻页线程可能仍在运行，保留引用直到线程结束，结果会被丢弃
+            self._stale_workers.add(self.more_results_worker)
+        self.more_results_worker = None
+        self.result_count = 0
         
-        # 清除现有结果
-        for i in reversed(range(self.results_layout.count())): 
-            widget = self.results_layout.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-
-        if not self.all_results:
-            no_results_label = QLabel("没有找到匹配的结果")
-            no_results_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            no_results_label.setStyleSheet("color: gray; padding: 20px;")
-            self.results_layout.addWidget(no_results_label)
-            return
+        # 清除现有结果，结果列表同时取消上一次搜索尚未完成的缩略图加载
+        self.result_model.clear()
+
+        self.add_result_cards(results)
 
-        # 显示前20条数据
-        self.load_more_results()
-        
-        # 连接滚动事件
-        self.scroll_area.verticalScrollBar().valueChanged.connect(self.check_scroll_bottom)
         # 回到顶部
-        self.scroll_area.verticalScrollBar().setValue(0)
-        self._show_status_bar_message(f"找到 {len(results)} 个结果")
+        self.result_view.scrollToTop()
+        self._show_status_bar_message(f"已加载 {self.result_count} 个结果")
 
     def check_scroll_bottom(self):
         """检查是否滚动到底部"""
-        scrollbar = self.scroll_area.verticalScrollBar()
+        scrollbar = self.result_view.verticalScrollBar()
         if scrollbar.value() == scrollbar.maximum():
             self.load_more_results()
 
     def load_more_results(self):
-        """加载更多结果"""
-        length = len(self.all_results)
-        start_index = self.current_page * self.items_per_page
-        if start_index >= length:
+        """在后台查询下一页结果"""
+        if not self.has_more_results or self.more_results_worker is not None:
+            return
+        self.more_results_worker = SearchWorker(
+            self.search_query,
+            self.search_type,
+            page_number=self.current_page + 1,
+            page_size=self.items_per_page,
+            media_filter=self.search_filter
+        )
+        self.more_results_worker.finished.connect(self._more_results_finished)
+        self.more_results_worker.error.connect(self._more_results_error)
+        self._show_status_bar_message("正在加载更多结果...")
+        self.more_results_worker.start()
+
+    def _more_results_finished(self, results, is_empty):
+        """下一页结果查询完成"""
+        if not self._release_more_results_worker(self.sender()):
+            # 已开始新的搜索，丢弃旧搜索的结果
             return
-        end_index = min((start_index + self.items_per_page), length)
-        results_to_display = self.all_results[start_index:end_index]
-        
-        for _index, item in enumerate(results_to_display):
-            score = item['score']
-            metadata = item['metadata']
-            media_file = MediaFileDao.get_media_files_by_id(metadata['id'])
-            if media_file and os.path.exists(media_file.file_path):
-                # 创建结果卡片
-                result_card = self.create_result_card(media_file, score, metadata)
-                self.results_layout.addWidget(result_card)
-        
         self.current_page += 1
-
-    def create_result_card(self, media_file, similarity, metadata):
-        """创建单个结果卡片"""
-        result_type = metadata['file_type']
-        card = QWidget()
-        # 设置宽度
-        card.setFixedWidth(WINDOW_MIN_WIDTH - 60)
-        card.setStyleSheet("""
-            QWidget {
-                padding: 10px;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-            }
-            QWidget:hover {
-                border-color: #999;
-            }
-        """)
-        
-        layout = QHBoxLayout(card)
-        layout.setSpacing(5)
-        layout.setContentsMargins(10, 10, 10, 10)
-        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)  # 设置布局居中对齐
-        
-        # 缩略图
-        if result_type == 'image':
-            thumbnail_path = media_file.file_path
+        self.has_more_results = len(results) >= self.items_per_page
+        self.add_result_cards(results)
+        self._show_status_bar_message(f"已加载 {self.result_count} 个结果")
+
+    def _more_results_error(self, error_msg):
+        """下一页结果查询失败"""
+        if self._release_more_results_worker(self.sender()):
+            self._search_error(error_msg)
+
+    def _release_more_results_worker(self, worker) -> bool:
+        """翻页线程发出结果后释放引用，返回是否是当前搜索的线程"""
+        # 结果信号是 run 的最后一步，等待线程退出后再释放引用，避免线程运行中被回收
+        worker.wait()
+        self._stale_workers.discard(worker)
+        if worker is not self.more_results_worker:
+            return False
+        self.more_results_worker = None
+        return True
+
+    def add_result_cards(self, results):
+        """把一页结果追加到结果列表，结果已在搜索线程中补全文件信息并检查文件是否存在"""
+        self.result_model.append_results([item for item in results if item['exists']])
+        self.result_count = self.result_model.rowCount()
+
+    def _open_file(self, path):
+        """在默认程序中打开图片"""
+        log.info(f"Opening file: {path}")
+        if CURRENT_OS == 'linux':
+            os.system(f'xdg-open "{path}"')
+        elif CURRENT_OS == 'windows':
+            os.startfile(path)
+        elif CURRENT_OS == 'macos':
+            os.system(f'open "{path}"')
         else:
-            thumbnail_path = metadata['frame_path']
-        
-        thumbnail = ImageLabel(thumbnail_path) # QLabel()
-        thumbnail.setAlignment(Qt.AlignmentFlag.AlignCenter)  # 设置标签居中对齐
-        # pixmap = QPixmap(thumbnail_path)
-        # if not pixmap.isNull():
-        #     scaled_pixmap = pixmap.scaled(
-        #         150, 150,
-        #         Qt.AspectRatioMode.KeepAspectRatio,
-        #         Qt.TransformationMode.SmoothTransformation
-        #     )
-        #     thumbnail.setPixmap(scaled_pixmap)
-        thumbnail.setFixedSize(150, 150)
-        layout.addWidget(thumbnail)
-        
-        # 信息区域
-        info_widget = QWidget()
-        info_layout = QVBoxLayout(info_widget)
-        
-        # 文件名和类型
-        filename = os.path.basename(media_file.file_path)
-        type_text = "图片" if result_type == 'image' else "视频"
-        name_label = QLabel(f"{filename} ({type_text})")
-        name_label.setStyleSheet("font-weight: bold;")
-        name_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
-        name_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        info_layout.addWidget(name_label)
-        
-        # 相似度
-        similarity_label = QLabel(f"相似度: {similarity:.2%}")
-        # similarity_label.setStyleSheet("color: #666;")
-        info_layout.addWidget(similarity_label)
-        
-        # 视频时间戳
-        if result_type == 'video' or result_type == 'video_frame':
-            timestamp = metadata['timestamp']
-            time_label = QLabel(f"时间: {timestamp:.2f}秒")
-            # time_label.setStyleSheet("color: #666;")
-            info_layout.addWidget(time_label)
-        
-        # 文件路径
-        path_label = QLabel(media_file.file_path)
-        # path_label.setStyleSheet("color: gray;")
-        path_label.setToolTip(media_file.file_path) # 设置工具提示
-        path_label.setWordWrap(False) # 禁止换行
-        path_label.setAlignment(Qt.AlignmentFlag.AlignLeft)
-        path_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        # path_label.setElideMode(Qt.TextElideMode.ElideRight)  # 隐藏末尾部分
-        info_layout.addWidget(path_label)
-        
-        layout.addWidget(info_widget, stretch=1)
-        
-        # 操作按钮
-        buttons_widget = QWidget()
-        buttons_layout = QVBoxLayout(buttons_widget)
-        buttons_layout.setSpacing(5)
-        
-        if result_type == 'video' or result_type == 'video_frame':
-            play_btn = QPushButton("播放片段")
-            play_btn.setIcon(QIcon.fromTheme("media-playback-start"))
-            play_btn.clicked.connect(
-                lambda: self.play_video_at_timestamp(media_file.file_path, metadata['timestamp'])
-            )
-            buttons_layout.addWidget(play_btn)
-        
-        open_folder_btn = QPushButton("打开文件夹")
-        open_folder_btn.setIcon(QIcon.fromTheme("folder"))
-        open_folder_btn.clicked.connect(
-            lambda: self._open_folder(media_file.file_path)
-        )
-        buttons_layout.addWidget(open_folder_btn)
-        
-        layout.addWidget(buttons_widget)
-        
-        return card
-    
+            raise ValueError("Unsupported OS")
+
     def _open_folder(self, path):
         log.info(f"Opening folder for: {path}")
         if CURRENT_OS == 'linux':
@@ -0,0 +1,265 @@
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QEvent, QPoint, QRect, QSize, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QPainter, QPalette, QPen
+from PyQt6.QtWidgets import QApplication, QListView, QStyle, QStyledItemDelegate, QStyleOptionButton
+from src.gui.thumbnail_loader import ThumbnailLoader, THUMBNAIL_DISPLAY_SIZE
+from typing import List
+import os
+import logging
+
+log = logging.getLogger(__name__)
+
+# 结果记录（SearchEngine 补全后的 dict）所在的数据角色
+RESULT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+# 结果卡片的外边距、内边距、行高与按钮尺寸
+_CARD_MARGIN = 5
+_CARD_PADDING = 10
+_ROW_HEIGHT = THUMBNAIL_DISPLAY_SIZE.height() + 2 * (_CARD_MARGIN + _CARD_PADDING)
+_BUTTON_SIZE = QSize(100, 30)
+_BUTTON_SPACING = 5
+
+
+class ResultListModel(QAbstractListModel):
+    """搜索结果列表模型，每行是一条 SearchEngine 补全后的结果记录"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._results = []
+        # 缩略图路径 → 使用它的行号，缩略图加载完成时只刷新这些行
+        self._rows_by_thumbnail = {}
+        ThumbnailLoader.instance().loaded.connect(self._on_thumbnail_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._results)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._results):
+            return None
+        result = self._results[index.row()]
+        if role == RESULT_ROLE:
+            return result
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(result['file_path'])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return result['file_path']
+        return None
+
+    def thumbnail_path(self, row: int) -> str:
+        return self._results[row]['thumbnail_path']
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._results = []
+        self._rows_by_thumbnail = {}
+        self.endResetModel()
+
+    def append_results(self, results: List[dict]) -> None:
+        """追加一页结果"""
+        if not results:
+            return
+        first = len(self._results)
+        self.beginInsertRows(QModelIndex(), first, first + len(results) - 1)
+        for row, result in enumerate(results, first):
+            self._results.append(result)
+            self._rows_by_thumbnail.setdefault(result['thumbnail_path'], []).append(row)
+        self.endInsertRows()
+
+    def _on_thumbnail_loaded(self, path: str) -> None:
+        for row in self._rows_by_thumbnail.get(path, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class ResultDelegate(QStyledItemDelegate):
+    """
+    绘制结果卡片：缩略图、文件名与类型、相似度、视频时间点、文件路径和操作按钮
+    只绘制可见的行，不为每个结果创建控件；按钮与缩略图的点击在 editorEvent 中处理。
+    """
+    open_file_requested = pyqtSignal(str)  # 点击缩略图，打开原图或帧图片
+    open_folder_requested = pyqtSignal(str)  # 打开文件所在文件夹
+    play_requested = pyqtSignal(str, float)  # 播放视频，时间点（秒）
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), _ROW_HEIGHT)
+
+    def _layout(self, rect: QRect, result: dict) -> tuple:
+        """卡片各部分的位置 (卡片, 缩略图, 文字区域, [(按钮名称, 文字, 位置), ...])"""
+        card = rect.adjusted(_CARD_MARGIN, _CARD_MARGIN, -_CARD_MARGIN, -_CARD_MARGIN)
+        thumbnail = QRect(card.left() + _CARD_PADDING, card.top() + _CARD_PADDING,
+                          THUMBNAIL_DISPLAY_SIZE.width(), THUMBNAIL_DISPLAY_SIZE.height())
+        buttons = []
+        if result['file_type'] == 'video':
+            buttons.append(('play', "播放片段"))
+        buttons.append(('folder', "打开文件夹"))
+        button_left = card.right() - _CARD_PADDING - _BUTTON_SIZE.width()
+        button_top = card.center().y() - (len(buttons) * (_BUTTON_SIZE.height() + _BUTTON_SPACING) - _BUTTON_SPACING) // 2
+        button_rects = [
+            (name, text, QRect(QPoint(button_left, button_top + i * (_BUTTON_SIZE.height() + _BUTTON_SPACING)), _BUTTON_SIZE))
+            for i, (name, text) in enumerate(buttons)
+        ]
+        text = QRect(QPoint(thumbnail.right() + 15, card.top() + _CARD_PADDING),
+                     QPoint(button_left - 15, card.bottom() - _CARD_PADDING))
+        return card, thumbnail, text, button_rects
+
+    def _lines(self, result: dict) -> List[tuple]:
+        """文字区域的各行 (文字, 是否加粗)"""
+        type_text = "图片" if result['file_type'] == 'image' else "视频"
+        lines = [
+            (f"{os.path.basename(result['file_path'])} ({type_text})", True),
+            (f"相似度: {result['score']:.2%}", False)
+        ]
+        if result['file_type'] == 'video':
+            lines.append((f"时间: {result['timestamp']:.2f}秒", False))
+            # 合并结果中同一视频的其他匹配时间点
+            other_frames = result['frames'][1:]
+            if other_frames:
+                lines.append(("其他片段: " + ", ".join(f"{frame['timestamp']:.2f}秒" for frame in other_frames), False))
+        lines.append((result['file_path'], False))
+        return lines
+
+    def paint(self, painter: QPainter, option, index):
+        result = index.data(RESULT_ROLE)
+        if result is None:
+            return
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        card, thumbnail_rect, text_rect, buttons = self._layout(option.rect, result)
+        hovered = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        painter.setPen(QPen(QColor('#999' if hovered else '#ddd')))
+        painter.drawRoundedRect(card, 5, 5)
+
+        # 缩略图，未加载完成时显示占位文字
+        loader = ThumbnailLoader.instance()
+        pixmap = loader.pixmap(result['thumbnail_path'])
+        if pixmap is not None:
+            target = QRect(QPoint(0, 0), pixmap.size())
+            target.moveCenter(thumbnail_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.setPen(QPen(QColor('#ccc')))
+            painter.drawRoundedRect(thumbnail_rect, 5, 5)
+            painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+            placeholder = "无法加载图片" if loader.is_failed(result['thumbnail_path']) else "加载中..."
+            painter.drawText(thumbnail_rect, Qt.AlignmentFlag.AlignCenter, placeholder)
+
+        # 文字，超出宽度的部分省略
+        painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+        y = text_rect.top()
+        for text, bold in self._lines(result):
+            font = QFont(option.font)
+            font.setBold(bold)
+            painter.setFont(font)
+            metrics = painter.fontMetrics()
+            elide = Qt.TextElideMode.ElideMiddle if text == result['file_path'] else Qt.TextElideMode.ElideRight
+            line_rect = QRect(text_rect.left(), y, text_rect.width(), metrics.height())
+            painter.drawText(line_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                             metrics.elidedText(text, elide, text_rect.width()))
+            y += metrics.height() + 6
+            if y > text_rect.bottom():
+                break
+
+        # 操作按钮使用当前样式绘制
+        style = option.widget.style() if option.widget is not None else QApplication.style()
+        for _, text, rect in buttons:
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = text
+            button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+            style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, option.widget)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        """处理缩略图与按钮的点击"""
+        if event.type() != QEvent.Type.MouseButtonRelease or event.button() != Qt.MouseButton.LeftButton:
+            return False
+        result = index.data(RESULT_ROLE)
+        if result is None:
+            return False
+        _, thumbnail_rect, _, buttons = self._layout(option.rect, result)
+        pos = event.position().toPoint()
+        if thumbnail_rect.contains(pos):
+            self.open_file_requested.emit(result['frame_path'] or result['file_path'])
+            return True
+        for name, _, rect in buttons:
+            if rect.contains(pos):
+                if name == 'play':
+                    self.play_requested.emit(result['file_path'], float(result['timestamp']))
+                else:
+                    self.open_folder_requested.emit(result['file_path'])
+                return True
+        return False
+
+
+class ResultListView(QListView):
+    """
+    虚拟化的搜索结果列表，只绘制可见的行，内存占用不随结果数量增长
+    滚动停止后为可见区域及上下各一屏内的结果请求缩略图，滚出该范围的请求被取消。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.delegate = ResultDelegate(self)
+        self.setItemDelegate(self.delegate)
+        self.setUniformItemSizes(True)
+        self.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QListView.SelectionMode.NoSelection)
+        self.setMouseTracking(True)
+        self.loader = ThumbnailLoader.instance()
+        self.loader.loaded.connect(self._on_thumbnail_loaded)
+        self.loader.cancelled_all.connect(self._on_cancelled_all)
+        # 本视图已请求、尚未加载完成的缩略图路径，请求由本视图取消
+        self._requested = set()
+        # 滚动时合并多次可见区域检查
+        self._thumbnail_timer = QTimer(self)
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(30)
+        self._thumbnail_timer.timeout.connect(self._update_visible_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(self._thumbnail_timer.start)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.modelReset.connect(self._on_model_reset)
+        model.rowsInserted.connect(self._thumbnail_timer.start)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._thumbnail_timer.start()
+
+    def _on_model_reset(self):
+        """新的结果替换旧结果，取消旧结果尚未完成的请求，已缓存的缩略图保留"""
+        for path in self._requested:
+            self.loader.cancel(path)
+        self._requested = set()
+
+    def _on_cancelled_all(self):
+        """请求已由加载器全部取消，不再重复取消"""
+        self._requested = set()
+        self._thumbnail_timer.start()
+
+    def _on_thumbnail_loaded(self, path: str):
+        self._requested.discard(path)
+
+    def _visible_rows(self) -> range:
+        """可见区域及上下各一屏内的行"""
+        rows = self.model().rowCount() if self.model() is not None else 0
+        if rows == 0:
+            return range(0)
+        x = self.viewport().width() // 2
+        first = self.indexAt(QPoint(x, 0)).row()
+        last = self.indexAt(QPoint(x, self.viewport().height() - 1)).row()
+        first = max(first, 0)
+        last = rows - 1 if last < 0 else last
+        span = last - first + 1
+        return range(max(0, first - span), min(rows, last + span + 1))
+
+    def _update_visible_thumbnails(self):
+        model = self.model()
+        wanted = {model.thumbnail_path(row) for row in self._visible_rows()}
+        for path in self._requested - wanted:
+            self.loader.cancel(path)
+        for path in wanted - self._requested:
+            if self.loader.pixmap(path) is None and not self.loader.is_failed(path):
+                self.loader.request(path)
+                self._requested.add(path)
+        self._requested &= wanted
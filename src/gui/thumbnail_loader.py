@@ -0,0 +1,160 @@
+from PyQt6.QtCore import QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPixmap
+from collections import OrderedDict
+from src.config import THUMBNAIL_MEMORY_CACHE_MB, THUMBNAIL_LOADER_THREADS
+import logging
+
+log = logging.getLogger(__name__)
+
+# 结果列表中缩略图的显示尺寸，缓存的 QPixmap 绘制时无需再缩放
+THUMBNAIL_DISPLAY_SIZE = QSize(150, 150)
+
+
+class _LoaderSignals(QObject):
+    """后台任务通过信号把结果送回界面线程"""
+    done = pyqtSignal(str, QImage, bool)  # 图片路径，缩放后的图片，是否已取消
+
+
+class _LoadTask(QRunnable):
+    """在线程池中解码并缩放一张图片"""
+
+    def __init__(self, path: str, size: QSize, signals: _LoaderSignals):
+        super().__init__()
+        # 由加载器持有引用，避免线程池删除后 Python 对象失效
+        self.setAutoDelete(False)
+        self.path = path
+        self.size = size
+        self.signals = signals
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            self.signals.done.emit(self.path, QImage(), True)
+            return
+        image = QImage()
+        try:
+            reader = QImageReader(self.path)
+            reader.setAutoTransform(True)
+            source_size = reader.size()
+            if source_size.isValid():
+                # JPEG 等格式可以直接按缩小的尺寸解码
+                reader.setScaledSize(source_size.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio))
+            image = reader.read()
+            if not image.isNull() and (image.width() > self.size.width() or image.height() > self.size.height()):
+                image = image.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        except Exception as e:
+            log.warning(f"加载缩略图失败 {self.path}: {e}")
+        self.signals.done.emit(self.path, image, False)
+
+
+class ThumbnailLoader(QObject):
+    """
+    异步缩略图加载器
+    图片在 QThreadPool 中解码为 QImage，完成后在界面线程转换为 QPixmap 并发出 loaded 信号；
+    缩放后的 QPixmap 按占用字节数做 LRU 缓存，多次搜索之间共用，已缓存的图片可以立即显示。
+    同一路径的多个请求合并为一个任务，所有请求都取消后，尚未开始的任务从线程池中移除。
+    只能在界面线程中使用。
+    """
+    _instance = None
+
+    loaded = pyqtSignal(str)  # 图片路径，加载完成或失败
+    cancelled_all = pyqtSignal()  # 所有请求已被 cancel_all 取消，请求方应清空自己记录的请求
+
+    @classmethod
+    def instance(cls) -> 'ThumbnailLoader':
+        """共用的加载器，缓存在多次搜索之间保留"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, size: QSize = THUMBNAIL_DISPLAY_SIZE, max_bytes: int = THUMBNAIL_MEMORY_CACHE_MB * 1024 * 1024,
+                 threads: int = THUMBNAIL_LOADER_THREADS):
+        super().__init__()
+        self.size = size
+        self.max_bytes = max_bytes
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(max(1, threads))
+        self._signals = _LoaderSignals()
+        self._signals.done.connect(self._on_done)
+        # 路径 → 缩放后的 QPixmap，按最近使用排序
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        # 加载失败的路径，避免反复尝试
+        self._failed = set()
+        # 路径 → [任务, 请求数]
+        self._pending = {}
+
+    def pixmap(self, path: str) -> QPixmap:
+        """已缓存的缩略图，未缓存时返回 None"""
+        pixmap = self._cache.get(path)
+        if pixmap is not None:
+            self._cache.move_to_end(path)
+        return pixmap
+
+    def is_failed(self, path: str) -> bool:
+        return path in self._failed
+
+    def request(self, path: str) -> None:
+        """请求加载缩略图，已缓存或加载失败时不做任何事，完成后发出 loaded 信号"""
+        if not path or path in self._cache or path in self._failed:
+            return
+        entry = self._pending.get(path)
+        if entry is not None:
+            entry[0].cancelled = False
+            entry[1] += 1
+            return
+        task = _LoadTask(path, self.size, self._signals)
+        self._pending[path] = [task, 1]
+        self._pool.start(task)
+
+    def cancel(self, path: str) -> None:
+        """取消一次请求，没有其他请求时放弃加载，例如结果已滚出可见区域"""
+        entry = self._pending.get(path)
+        if entry is None or entry[1] <= 0:
+            # 没有未取消的请求，重复取消不能使请求数变为负数
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        if self._pool.tryTake(entry[0]):
+            del self._pending[path]
+        else:
+            # 已经开始执行，结果仍会缓存
+            entry[0].cancelled = True
+
+    def cancel_all(self) -> None:
+        """取消所有请求，尚未开始的任务从线程池中移除，并通知请求方清空记录的请求"""
+        for path in list(self._pending):
+            if self._pending[path][1] > 0:
+                self._pending[path][1] = 1
+                self.cancel(path)
+        self.cancelled_all.emit()
+
+    def _on_done(self, path: str, image: QImage, cancelled: bool) -> None:
+        entry = self._pending.pop(path, None)
+        if cancelled:
+            # 开始执行前被取消，之后又有新的请求时重新加载
+            if entry is not None and entry[1] > 0:
+                self.request(path)
+                self._pending[path][1] = entry[1]
+            return
+        if image.isNull():
+            self._failed.add(path)
+        else:
+            self._put(path, QPixmap.fromImage(image))
+        self.loaded.emit(path)
+
+    def _put(self, path: str, pixmap: QPixmap) -> None:
+        """加入缓存，超过字节上限时淘汰最久未使用的缩略图"""
+        old = self._cache.pop(path, None)
+        if old is not None:
+            self._cache_bytes -= self._pixmap_bytes(old)
+        self._cache[path] = pixmap
+        self._cache_bytes += self._pixmap_bytes(pixmap)
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= self._pixmap_bytes(evicted)
+
+    @staticmethod
+    def _pixmap_bytes(pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth()) // 8
@@ -1,16 +1,26 @@
 from PyQt6.QtCore import QThread, pyqtSignal
 from src.core.search_engine import SearchEngine
 from src.core.file_scanner import FileScanner
-from src.database.models import FilePathDao, MediaFileDao, VideoFrameDao
-import concurrent.futures
+from src.core.indexer import FolderChanges
+from src.core.watcher import create_watcher
+from src.config import WATCH_DEBOUNCE_SECONDS, WATCH_MAX_DELAY_SECONDS
+from src.database.models import FilePathDao, MediaFileDao, DirStateDao
+from src.database.sqlite_db import SQLiteDB
+import itertools
 import logging
 import os
+import time
 
 log = logging.getLogger(__name__)
 
+# 扫描过程中发送进度信号的最小间隔（秒）
+_PROGRESS_INTERVAL = 0.2
+# 监听线程每次等待事件的最长时间（秒），同时决定停止监听的响应速度
+_WATCH_READ_TIMEOUT = 0.5
+
 class IndexingWorker(QThread):
     """后台索引线程"""
-    progress = pyqtSignal(int, int)  # 当前进度，总数
+    progress = pyqtSignal(int, int, bool)  # 当前进度，已发现的文件总数，是否仍在扫描
     finished = pyqtSignal(list)  # 完成信号，返回索引的文件列表
     error = pyqtSignal(str)  # 错误信号
 
@@ -18,6 +28,7 @@ class IndexingWorker(QThread):
         super().__init__()
         self.indexer = indexer
         self.folder = folder
+        self.pipeline = None
         self._stop_flag = False
 
     def run(self):
@@ -26,36 +37,35 @@ class IndexingWorker(QThread):
             # 添加索引路径
             FilePathDao.add_file_path(self.folder)
 
-            # 首先扫描所有文件
-            media_files = FileScanner.scan_directory(self.folder)
-            total_files = len(media_files)
-            indexed_files = []
+            # 边扫描边索引，总数随扫描进度增加
+            scanner = FileScanner.iter_directory(self.folder)
+            done_files = 0
+            last_emit = 0.0
+
+            def emit_progress():
+                self.progress.emit(done_files, scanner.found, not scanner.finished)
+
+            def scanned_files():
+                nonlocal last_emit
+                for file_path in scanner:
+                    now = time.monotonic()
+                    if now - last_emit >= _PROGRESS_INTERVAL:
+                        last_emit = now
+                        emit_progress()
+                    yield file_path
+                emit_progress()
 
             # 发送进度信号
-            self.progress.emit(0, total_files)
+            emit_progress()
 
-            max_worker = (os.cpu_count() or 1) + 4
+            def on_file_done(file_path, ok):
+                nonlocal done_files
+                done_files += 1
+                emit_progress()
 
-            # 使用线程池并行处理文件
-            with concurrent.futures.ThreadPoolExecutor(thread_name_prefix='IndexingWorker', max_workers=max_worker) as executor:
-                futures = {executor.submit(self.indexer.index_single_file, file_path): file_path for file_path in media_files}
-                for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-                    # 检查停止标志
-                    if self._stop_flag:
-                        # 取消未完成的任务
-                        for f in futures:
-                            f.cancel()
-                        break
-                    
-                    file_path = futures[future]
-                    try:
-                        if future.result():
-                            indexed_files.append(file_path)
-                    except Exception as e:
-                        log.exception(f"Error indexing file {file_path}:")
-
-                    # 发送进度信号
-                    self.progress.emit(i, total_files)
+            # 解码、特征提取、写库分阶段并行处理
+            self.pipeline = self.indexer.create_pipeline(on_file_done)
+            indexed_files = self.pipeline.run(scanned_files())
 
             if not self._stop_flag:
                 self.finished.emit(indexed_files)
@@ -65,6 +75,8 @@ class IndexingWorker(QThread):
     def stop(self):
         """停止索引"""
         self._stop_flag = True
+        if self.pipeline is not None:
+            self.pipeline.stop()
 
 class RefreshWorker(QThread):
     """后台刷新线程"""
@@ -72,10 +84,15 @@ class RefreshWorker(QThread):
     finished = pyqtSignal(dict)  # 完成信号，返回统计信息
     error = pyqtSignal(str)  # 错误信号
 
-    def __init__(self, indexer, folders):
+    def __init__(self, indexer, folders, full_scan: bool = False):
+        """
+        :param full_scan: 完整校验，列出所有目录并检查每个文件，不使用目录修改时间缓存
+        """
         super().__init__()
         self.indexer = indexer
         self.folders = folders
+        self.full_scan = full_scan
+        self.pipeline = None
         self._stop_flag = False
 
     def run(self):
@@ -83,76 +100,168 @@ class RefreshWorker(QThread):
             stats = {
                 'added': 0,    # 新增文件数
                 'updated': 0,  # 更新文件数
-                'removed': 0   # 删除文件数
+                'removed': 0,  # 删除文件数
+                'moved': 0     # 移动文件数
             }
             self._stop_flag = False
             
             for folder in self.folders:
                 if self._stop_flag:
                     break
-                # 获取文件夹中的所有文件
-                current_files = set(FileScanner.scan_directory(folder))
-                # 获取数据库中该文件夹的所有文件
-                db_files = set(MediaFileDao.get_media_files_by_folder(folder))
-                
-                # 计算需要添加、删除的文件
-                files_to_add = current_files - db_files
-                files_to_remove = db_files - current_files
-                
-                if (not files_to_add and not files_to_remove) or (len(files_to_add) == 0 and len(files_to_remove) == 0):
-                    continue
+                changes = FolderChanges()
+                total_files = 0
+                done_files = 0
+                failed_dirs = set()
+
+                def files_to_index(folder=folder, changes=changes):
+                    """边扫描边返回新增文件，扫描结束后处理删除、移动，再返回需要重新索引的修改文件"""
+                    nonlocal total_files
+                    for file_path in self.indexer.iter_folder_changes(folder, changes, self.full_scan):
+                        total_files += 1
+                        yield file_path
+                    if self._stop_flag:
+                        return
+                    self._apply_changes(changes, stats)
+                    total_files += len(changes.modified)
+                    yield from (mf.file_path for mf in changes.modified)
+
+                def on_file_done(file_path, ok, folder=folder):
+                    nonlocal done_files
+                    done_files += 1
+                    if not ok:
+                        failed_dirs.add(os.path.dirname(file_path))
+                    self.progress.emit(folder, done_files, total_files)
+
+                # 发现第一个需要索引的文件时才启动流水线，没有变化的文件夹不加载模型
+                files = files_to_index()
+                first_file = next(files, None)
+                if first_file is not None:
+                    self.pipeline = self.indexer.create_pipeline(on_file_done)
+                    indexed_files = set(self.pipeline.run(itertools.chain([first_file], files)))
+                    modified_files = {mf.file_path for mf in changes.modified}
+                    stats['updated'] += len(indexed_files & modified_files)
+                    stats['added'] += len(indexed_files - modified_files)
 
                 if self._stop_flag:
                     break
+                # 旧版本索引的记录补全搜索过滤使用的属性
+                self.indexer.backfill_media_info(folder)
+                # 完整处理后才保存目录状态；有文件索引失败的目录下次刷新时重新列出
+                DirStateDao.save_dir_states(folder, {
+                    dir_path: state for dir_path, state in changes.dir_states.items() if dir_path not in failed_dirs
+                })
 
-                # 删除不存在的文件记录
-                for file_path in files_to_remove:
-                    mf_list = MediaFileDao.get_media_files_by_file_path(file_path)
-                    if not mf_list:
-                        continue
-                    for mf in mf_list:
-                        if mf.file_type == 'video':
-                            vf_list = VideoFrameDao.get_video_frames_by_media_file_id(mf.id)
-                            for vf in vf_list:
-                                VideoFrameDao.delete_video_frame(vf)
-                            
-                        MediaFileDao.delete_media_file(mf)
-                            
-                    stats['removed'] += 1
-
-                # 添加新文件
-                total_files = len(files_to_add)
-                for i, file_path in enumerate(files_to_add, 1):
-                    if self.indexer.index_single_file(file_path):
-                        stats['added'] += 1
-                    self.progress.emit(folder, i, total_files)
-
+            SQLiteDB().flush()
             if not self._stop_flag:
                 self.finished.emit(stats)
         except Exception as e:
             log.exception("刷新索引异常")
             self.error.emit(str(e))
 
+    def _apply_changes(self, changes: FolderChanges, stats: dict) -> None:
+        """处理扫描结束后的删除与移动"""
+        self.indexer.apply_changes(changes)
+        stats['removed'] += len(changes.removed)
+        stats['moved'] += len(changes.moved)
+
     def stop(self):
         """停止索引"""
         self._stop_flag = True
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+class WatchWorker(QThread):
+    """后台监听已索引文件夹，合并短时间内的变化后增量索引"""
+    indexed = pyqtSignal(dict)  # 一批变化处理完成，返回统计信息
+    error = pyqtSignal(str)  # 错误信号
+
+    def __init__(self, indexer, folders):
+        super().__init__()
+        self.indexer = indexer
+        self.folders = folders
+        self.pipeline = None
+        self._stop_flag = False
+
+    def run(self):
+        try:
+            self._stop_flag = False
+            watcher = create_watcher(self.folders)
+        except Exception as e:
+            log.exception("创建文件夹监听失败")
+            self.error.emit(str(e))
+            return
+
+        try:
+            pending = set()
+            first_event = last_event = 0.0
+            while not self._stop_flag:
+                paths = watcher.read_events(_WATCH_READ_TIMEOUT)
+                now = time.monotonic()
+                if paths:
+                    if not pending:
+                        first_event = now
+                    pending.update(paths)
+                    last_event = now
+                # 安静一段时间或等待太久时处理合并后的变化
+                if pending and (now - last_event >= WATCH_DEBOUNCE_SECONDS or now - first_event >= WATCH_MAX_DELAY_SECONDS):
+                    self._process(pending)
+                    pending = set()
+        except Exception as e:
+            log.exception("监听文件夹异常")
+            self.error.emit(str(e))
+        finally:
+            watcher.close()
+
+    def _process(self, paths: set) -> None:
+        """增量处理一批变化的路径"""
+        changes = self.indexer.sync_paths(paths)
+        self.indexer.apply_changes(changes)
+        stats = {
+            'added': 0,
+            'updated': 0,
+            'removed': len(changes.removed),
+            'moved': len(changes.moved)
+        }
+        files_to_index = changes.added + [mf.file_path for mf in changes.modified]
+        if files_to_index and not self._stop_flag:
+            self.pipeline = self.indexer.create_pipeline()
+            indexed_files = set(self.pipeline.run(files_to_index))
+            self.pipeline = None
+            modified_files = {mf.file_path for mf in changes.modified}
+            stats['updated'] = len(indexed_files & modified_files)
+            stats['added'] = len(indexed_files - modified_files)
+        if any(stats.values()):
+            self.indexed.emit(stats)
+
+    def stop(self):
+        """停止监听"""
+        self._stop_flag = True
+        pipeline = self.pipeline
+        if pipeline is not None:
+            pipeline.stop()
 
 class SearchWorker(QThread):
     """后台搜索线程"""
     finished = pyqtSignal(list, bool)  # 完成信号，返回搜索结果
     error = pyqtSignal(str)  # 错误信号
 
-    def __init__(self, query, type):
+    def __init__(self, query, type, page_number: int = 1, page_size: int = 20, media_filter=None):
+        """
+        :param media_filter: 搜索过滤条件 MediaFilter，为空时不过滤
+        """
         super().__init__()
         self.query = query
         self.type = type
+        self.page_number = page_number
+        self.page_size = page_size
+        self.media_filter = media_filter
 
     def run(self):
         try:
             if self.type == 'image':
-                results = SearchEngine.image_search(self.query)
+                results = SearchEngine.image_search(self.query, page_number=self.page_number, page_size=self.page_size, media_filter=self.media_filter)
             elif self.type == 'text':
-                results = SearchEngine.text_search(self.query.strip())
+                results = SearchEngine.text_search(self.query.strip(), page_number=self.page_number, page_size=self.page_size, media_filter=self.media_filter)
             else:
                 results = None
             
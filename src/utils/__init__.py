@@ -1,8 +1,14 @@
 import os
 import time
-import random
+import hashlib
+import threading
 from src.config import MODEL_NAME
 
+# 雪花算法状态
+_id_lock = threading.Lock()
+_last_timestamp = 0
+_sequence = 0
+
 def check_model_files():
     """检查模型文件是否存在并完整"""
     required_files = ['config.json', 'pytorch_model.bin', 'clip_cn_vit-b-16.pt']
@@ -44,14 +50,45 @@ def delete_folder(folder_path: str):
             elif os.path.isdir(file_path):
                 delete_folder(file_path)
 
+def delete_files(file_paths):
+    """删除文件，不存在的文件忽略"""
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
 def generate_id() -> int:
     """雪花算法生成ID"""
-    # 获取当前时间戳（毫秒级）
-    timestamp = int(time.time() * 1000)
-    # 生成一个随机数
-    random_number = random.randint(0, 4095)  # 12位随机数
-    # 组合成唯一的ID
-    unique_id = (timestamp << 12) | random_number
-    return unique_id
-
+    global _last_timestamp, _sequence
+    with _id_lock:
+        # 获取当前时间戳（毫秒级）
+        timestamp = max(int(time.time() * 1000), _last_timestamp)
+        if timestamp == _last_timestamp:
+            # 同一毫秒内使用12位递增序号，用完后借用下一毫秒
+            _sequence = (_sequence + 1) & 4095
+            if _sequence == 0:
+                timestamp += 1
+        else:
+            _sequence = 0
+        _last_timestamp = timestamp
+        # 组合成唯一的ID
+        return (timestamp << 12) | _sequence
 
+def file_content_hash(file_path: str, sample_bytes: int = 0) -> str:
+    """
+    计算文件内容哈希（BLAKE2b）
+    :param sample_bytes: 大于 0 时只读取文件大小及头尾各 sample_bytes 字节，否则读取整个文件
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        hasher.update(str(size).encode())
+        if sample_bytes <= 0 or size <= sample_bytes * 2:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        else:
+            hasher.update(f.read(sample_bytes))
+            f.seek(-sample_bytes, os.SEEK_END)
+            hasher.update(f.read(sample_bytes))
+    return hasher.hexdigest()